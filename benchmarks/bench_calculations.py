@@ -0,0 +1,110 @@
+"""
+Micro-benchmarks for the physics in calculations.py and the map builders in
+simulation.py.
+"""
+import argparse
+import time
+
+import common  # noqa: F401  (puts src/ on sys.path)
+from common import latency_summary
+
+import numpy as np
+
+import calculations
+import simulation
+
+DIAMETER_M = 300.0
+VELOCITY_MS = 20_000.0
+LAT, LON = 30.0444, 31.2357
+
+
+def bench(fn, min_time_s=0.2, repeat=30):
+    """
+    Time fn() in ``repeat`` batches sized to take ~min_time_s/repeat each.
+
+    Returns:
+        dict: Per-call latency summary (from per-batch means) and ops/s.
+    """
+    # Calibrate the batch size
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time_s / repeat or number >= 1 << 20:
+            break
+        number *= 2
+
+    per_call = []
+    total_calls = 0
+    total_time = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        per_call.append(elapsed / number)
+        total_calls += number
+        total_time += elapsed
+
+    summary = latency_summary(per_call)
+    return {
+        "ops_per_s": total_calls / total_time,
+        "mean_us": summary["mean_ms"] * 1000,
+        "p50_us": summary["p50_ms"] * 1000,
+        "p99_us": summary["p99_ms"] * 1000,
+        "calls": total_calls,
+    }
+
+
+def run(min_time_s=0.2):
+    full = calculations.full_impact_calculation(DIAMETER_M, VELOCITY_MS)
+    radii = full["damage_radii_km"]
+    magnitude = full["earthquake_magnitude"]
+    energy = full["energy_joules"]
+    megatons = full["megatons_tnt"]
+
+    sweep_d = np.linspace(10, 5000, 10_000)
+    sweep_v = np.full(10_000, VELOCITY_MS)
+
+    def detailed_cold():
+        simulation.map_render_cache.clear()
+        simulation.generate_detailed_map_html(LAT, LON, radii, magnitude)
+
+    cases = {
+        "calculations.calculate_mass_and_energy":
+            lambda: calculations.calculate_mass_and_energy(DIAMETER_M, VELOCITY_MS),
+        "calculations.calculate_impact_effects":
+            lambda: calculations.calculate_impact_effects(energy, 2700, True),
+        "calculations.estimate_diameter_from_magnitude":
+            lambda: calculations.estimate_diameter_from_magnitude(22.0),
+        "calculations.calculate_risk_assessment":
+            lambda: calculations.calculate_risk_assessment(megatons, 0.02),
+        "calculations.calculate_damage_radii":
+            lambda: calculations.calculate_damage_radii(megatons),
+        "calculations.full_impact_calculation":
+            lambda: calculations.full_impact_calculation(DIAMETER_M, VELOCITY_MS, True),
+        "calculations.batch_impact_calculation[10k]":
+            lambda: calculations.batch_impact_calculation(sweep_d, sweep_v, True),
+        "simulation.build_impact_geometry":
+            lambda: simulation.build_impact_geometry(LAT, LON, radii, magnitude),
+        "simulation.generate_map_html":
+            lambda: simulation.generate_map_html(LAT, LON, radii),
+        "simulation.generate_detailed_map_html[cold]": detailed_cold,
+        "simulation.generate_detailed_map_html[warm]":
+            lambda: simulation.generate_detailed_map_html(LAT, LON, radii, magnitude),
+    }
+
+    results = {}
+    for name, fn in cases.items():
+        results[name] = bench(fn, min_time_s=min_time_s)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per benchmark")
+    args = parser.parse_args()
+    for name, stats in run(args.min_time).items():
+        print(f"{name:48s} {stats['mean_us']:12.2f} us  {stats['ops_per_s']:14.0f} ops/s")
@@ -0,0 +1,64 @@
+"""
+Enforce the server's cold-start budget.
+
+Imports the Flask app (src/run.py) in fresh interpreters with warm-up
+disabled and fails if the best import time exceeds the budget, or if any
+module that is meant to load lazily was imported.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from common import SRC_DIR
+
+# Modules that must not be imported just to start serving
+LAZY_MODULES = ("folium", "branca", "pandas", "requests", "shapely", "httpx", "plotly")
+
+DEFAULT_BUDGET_S = 0.5
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import run
+elapsed = time.perf_counter() - start
+print(json.dumps({"import_s": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def measure(runs=5):
+    """Import times (s) of ``run`` in fresh interpreters, plus lazy modules seen."""
+    env = {**os.environ, "STARTUP_WARMUP": "off"}
+    times = []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE],
+            cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        times.append(result["import_s"])
+        loaded.update(result["loaded"])
+    return times, sorted(loaded)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget", type=float, default=float(os.getenv("IMPORT_BUDGET_S", DEFAULT_BUDGET_S)),
+                        help="seconds allowed for the best import of run.py")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    times, loaded = measure(args.runs)
+    best = min(times)
+    print(f"import run: best {best * 1000:.0f} ms, worst {max(times) * 1000:.0f} ms over {len(times)} runs "
+          f"(budget {args.budget * 1000:.0f} ms)")
+    failed = False
+    if best > args.budget:
+        print("FAIL: import time over budget")
+        failed = True
+    if loaded:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(loaded)}")
+        failed = True
+    sys.exit(1 if failed else 0)
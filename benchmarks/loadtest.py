@@ -0,0 +1,187 @@
+"""
+End-to-end load generator for the Flask app in src/run.py.
+
+The JPL and OpenCage upstreams are replaced by a local stub server with a
+configurable latency; the app is served by werkzeug's threaded server in
+this process and driven by concurrent keep-alive HTTP clients.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import common
+from common import latency_summary
+from stub_upstream import StubUpstream
+
+DEFAULT_SIMULATION = {
+    "diameter": "0.3",
+    "velocity": "20",
+    "lat": "30.0444",
+    "long": "31.2357",
+}
+
+# Step between per-request impact points; wider than a simulation cache key
+# cell (SIMULATION_CACHE_COORD_DECIMALS) and a geocode store cell
+POINT_STEP_DEG = 0.01
+
+
+def varied_simulation(i, scenario=0, **overrides):
+    """
+    DEFAULT_SIMULATION moved to the i-th point of a grid, so it misses the
+    result cache. Each scenario gets its own block of 100 x 100 points, so
+    one scenario doesn't hit the geocode store cells another one filled.
+    """
+    i += 1 + scenario * 10_000  # point 0 is DEFAULT_SIMULATION itself, which the warm-up caches
+    return {
+        **DEFAULT_SIMULATION,
+        "lat": f"{float(DEFAULT_SIMULATION['lat']) + (i % 100) * POINT_STEP_DEG:.4f}",
+        "long": f"{float(DEFAULT_SIMULATION['long']) + (i // 100) * POINT_STEP_DEG:.4f}",
+        **overrides,
+    }
+
+
+def start_app(stub, geocoder_mode):
+    """
+    Import the Flask app pointed at the stub and serve it on a free port.
+
+    Upstream URLs are read at import time, so this must run before anything
+    else imports app/run. The geocode store, shared cache and job store go
+    to a scratch directory, so stub answers never reach the real ones.
+    """
+    os.environ.update(stub.env())
+    scratch = tempfile.mkdtemp(prefix="loadtest-")
+    os.environ["GEOCODE_CACHE_PATH"] = os.path.join(scratch, "geocode_cache.sqlite")
+    os.environ["SHARED_CACHE_PATH"] = os.path.join(scratch, "shared_cache.sqlite")
+    os.environ["JOB_STORE_PATH"] = os.path.join(scratch, "jobs.sqlite")
+    os.environ["GEOCODER_MODE"] = geocoder_mode
+    os.environ.setdefault("OPENCAGE_API_KEY", "benchmark")
+
+    from werkzeug.serving import make_server
+    import run
+
+    # Per-request access logs would dominate the measurement
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    server = make_server("127.0.0.1", 0, run.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def drive(port, method, path, body, requests, concurrency, headers=None):
+    """
+    Send ``requests`` requests over ``concurrency`` keep-alive connections.
+
+    ``body`` is a JSON body sent with every request, or a callable that
+    returns the body for request number i.
+
+    Returns:
+        dict: Throughput, latency summary, status counts and payload size.
+    """
+    def payload(i):
+        value = body(i) if callable(body) else body
+        return json.dumps(value).encode("utf-8") if value is not None else None
+
+    base_headers = {"Content-Type": "application/json", **(headers or {})}
+    counts = [requests // concurrency + (1 if i < requests % concurrency else 0)
+              for i in range(concurrency)]
+    # (first request number, count) per connection, so numbers are unique
+    per_worker = [(sum(counts[:i]), count) for i, count in enumerate(counts)]
+    latencies = []
+    statuses = {}
+    sizes = []
+    lock = threading.Lock()
+
+    def worker(share):
+        first, count = share
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        local_lat, local_status, local_sizes = [], {}, []
+        for i in range(first, first + count):
+            request_body = payload(i)
+            start = time.perf_counter()
+            conn.request(method, path, body=request_body, headers=base_headers)
+            response = conn.getresponse()
+            data = response.read()
+            local_lat.append(time.perf_counter() - start)
+            local_status[response.status] = local_status.get(response.status, 0) + 1
+            local_sizes.append(len(data))
+        conn.close()
+        with lock:
+            latencies.extend(local_lat)
+            sizes.extend(local_sizes)
+            for status, n in local_status.items():
+                statuses[status] = statuses.get(status, 0) + n
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, per_worker))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "method": method,
+        "path": path,
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "throughput_rps": requests / elapsed if elapsed else None,
+        "latency": latency_summary(latencies),
+        "status_counts": {str(k): v for k, v in sorted(statuses.items())},
+        "mean_response_bytes": sum(sizes) / len(sizes) if sizes else 0,
+    }
+
+
+def run(requests=200, concurrency=8, latency_ms=50, geocoder_mode="local", asteroids=200):
+    stub = StubUpstream(latency_s=latency_ms / 1000, asteroid_count=asteroids).start()
+    server = start_app(stub, geocoder_mode)
+    port = server.server_port
+    try:
+        # Warm-up: fills the asteroid list cache and the map skeleton
+        drive(port, "GET", "/api/get_asteroid_list", None, 1, 1)
+        drive(port, "POST", "/api/run_simulation", DEFAULT_SIMULATION, 1, 1)
+
+        # Every simulation request uses a new impact point, so these measure
+        # the full path; cache_hit repeats the warmed-up body instead
+        scenarios = {
+            "get_asteroid_list": drive(
+                port, "GET", "/api/get_asteroid_list", None, requests, concurrency),
+            "run_simulation[html]": drive(
+                port, "POST", "/api/run_simulation", varied_simulation, requests, concurrency),
+            "run_simulation[geometry]": drive(
+                port, "POST", "/api/run_simulation",
+                lambda i: varied_simulation(i, scenario=1, response_mode="geometry"), requests, concurrency),
+            "run_simulation[cache_hit]": drive(
+                port, "POST", "/api/run_simulation", DEFAULT_SIMULATION, requests, concurrency),
+        }
+    finally:
+        server.shutdown()
+        stub.stop()
+
+    return {
+        "config": {
+            "requests": requests,
+            "concurrency": concurrency,
+            "upstream_latency_ms": latency_ms,
+            "geocoder_mode": geocoder_mode,
+            "asteroids": asteroids,
+        },
+        "upstream_requests": dict(stub.requests),
+        "scenarios": scenarios,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--geocoder-mode", choices=("local", "remote"), default="local")
+    parser.add_argument("--asteroids", type=int, default=200)
+    args = parser.parse_args()
+    report = run(args.requests, args.concurrency, args.latency_ms, args.geocoder_mode, args.asteroids)
+    report["peak_rss_mb"] = common.peak_rss_mb()
+    print(json.dumps(report, indent=2))
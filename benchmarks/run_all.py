@@ -0,0 +1,62 @@
+"""
+Run the micro-benchmarks and the load test and write one JSON report.
+
+With --baseline, compares against an earlier report and exits non-zero if
+any micro-benchmark mean or load-test p95 got slower than the tolerance.
+"""
+import argparse
+import json
+import sys
+
+import common
+import bench_calculations
+import loadtest
+
+
+def find_regressions(report, baseline, tolerance):
+    regressions = []
+    for name, stats in report.get("micro", {}).items():
+        old = baseline.get("micro", {}).get(name)
+        if old and stats["mean_us"] > old["mean_us"] * (1 + tolerance):
+            regressions.append(f"{name}: mean {old['mean_us']:.2f} -> {stats['mean_us']:.2f} us")
+    for name, stats in report.get("load", {}).get("scenarios", {}).items():
+        old = baseline.get("load", {}).get("scenarios", {}).get(name)
+        if old and stats["latency"]["p95_ms"] > old["latency"]["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {old['latency']['p95_ms']:.2f} -> {stats['latency']['p95_ms']:.2f} ms"
+            )
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", default="bench_report.json")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per micro-benchmark")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=50, help="stub upstream latency")
+    parser.add_argument("--geocoder-mode", choices=("local", "remote"), default="local")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    report = {"environment": common.environment()}
+    report["micro"] = bench_calculations.run(args.min_time)
+    if not args.skip_load:
+        report["load"] = loadtest.run(
+            args.requests, args.concurrency, args.latency_ms, args.geocoder_mode
+        )
+    report["peak_rss_mb"] = common.peak_rss_mb()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
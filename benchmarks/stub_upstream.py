@@ -0,0 +1,117 @@
+"""
+Local stand-ins for the JPL close-approach API and the OpenCage geocoder.
+
+Every response is delayed by a configurable latency so the load test can
+model slow upstreams without touching the network.
+"""
+import argparse
+import json
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def make_cad_payload(count=200):
+    """A CAD API response with ``count`` synthetic close approaches."""
+    fields = ["des", "orbit_id", "jd", "cd", "dist", "dist_min", "dist_max",
+              "v_rel", "v_inf", "t_sigma_f", "h"]
+    data = []
+    for i in range(count):
+        data.append([
+            f"2099 T{i:03d}", "1", "2461000.5", "2099-Jan-01 00:00",
+            f"{0.01 + 0.04 * (i % 50) / 50:.4f}", "0.01", "0.05",
+            f"{5 + i % 25:.2f}", f"{5 + i % 25:.2f}", "< 00:01",
+            f"{18 + (i % 100) / 10:.1f}",
+        ])
+    return {"signature": {"source": "stub", "version": "1.5"}, "count": str(count),
+            "fields": fields, "data": data}
+
+
+class StubUpstream():
+    """
+    Threaded HTTP server answering /cad.api and /geocode/v1/json.
+
+    Args:
+        latency_s (float): Delay added to every response.
+        port (int): Port to bind, 0 picks a free one.
+        asteroid_count (int): Rows in the CAD response.
+    """
+
+    def __init__(self, latency_s=0.05, port=0, asteroid_count=200):
+        self.latency_s = latency_s
+        self.requests = {"cad": 0, "geocode": 0}
+        cad_body = json.dumps(make_cad_payload(asteroid_count)).encode("utf-8")
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; without this,
+                # Nagle plus delayed ACKs add ~40 ms to every keep-alive reply
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_GET(self):
+                time.sleep(stub.latency_s)
+                if self.path.startswith("/cad.api"):
+                    stub.requests["cad"] += 1
+                    body = cad_body
+                elif self.path.startswith("/geocode/v1/json"):
+                    stub.requests["geocode"] += 1
+                    # Alternate land and ocean answers
+                    on_land = stub.requests["geocode"] % 2 == 0
+                    components = {"country": "Stubland"} if on_land else {"body_of_water": "Stub Ocean"}
+                    body = json.dumps({"results": [{"components": components}]}).encode("utf-8")
+                else:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """Environment variables pointing the app at this stub."""
+        return {
+            "JPL_CAD_URL": self.base_url + "/cad.api",
+            "OPENCAGE_URL": self.base_url + "/geocode/v1/json",
+        }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--asteroids", type=int, default=200)
+    args = parser.parse_args()
+    stub = StubUpstream(args.latency_ms / 1000, args.port, args.asteroids)
+    print(f"Stub upstream on {stub.base_url}")
+    for key, value in stub.env().items():
+        print(f"  export {key}={value}")
+    stub.server.serve_forever()
@@ -1,47 +1,267 @@
 
-from bottle import response
 import json
 import os
-import requests
 import math
-from calculations import full_impact_calculation
-from simulation import generate_map_html, generate_detailed_map_html
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from calculations import (
+    full_impact_calculation,
+    calculate_mass_and_energy,
+    batch_impact_calculation,
+    calculate_risk_assessment,
+    DEFAULT_OCEAN_DEPTH_M
+)
+from simulation import generate_map_html, generate_detailed_map_html, generate_overlay_map_html, build_impact_geometry, map_render_cache
+from simulation import warm_up as warm_up_maps
+from geocode_store import get_geocode_store
+from cache import LRUCache, TTLCache, JsonPayload
+from shared_cache import StoreError, get_shared_store
+from montecarlo import run_monte_carlo
+import upstream
+import metrics
+from catalog import get_catalog, normalize_name
+from streaming import StreamSummary, ndjson_stream
+from exposure import estimate_exposure, get_population_raster
+from tsunami import estimate_tsunami, get_bathymetry
+from heatmap import DEFAULT_CELL_DEG, DEFAULT_MAX_ZOOM, MAX_ZOOM_LIMIT, MIN_CELL_DEG, build_heatmap, find_heatmap
+from jobs import (
+    FINISHED_STATES,
+    JOB_KINDS,
+    QUEUED,
+    RUNNING,
+    JobError,
+    get_job_manager,
+    job_max_queued,
+    open_event_stream
+)
+from deflection import assess_deflection, feasibility_grid, kinetic_impactor_delta_v, DART_BETA, EARTH_RADIUS_KM
 # For local development: load environment variables from a .env file.
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Without a key the server still starts; remote geocoding is just disabled
 api_key = os.getenv("OPENCAGE_API_KEY")
 if not api_key:
-    raise ValueError("❌ Missing OPENCAGE_API_KEY in .env file")
+    print("Warning: OPENCAGE_API_KEY is not set, remote geocoding is disabled")
 
 
 pv = 0.15
 D = 1329
 
+# "local" answers land/ocean from the bundled landmask, "remote" uses OpenCage
+geocoder_mode = os.getenv("GEOCODER_MODE", "local").strip().lower()
+
+# Heavy modules (folium, requests, shapely) and data files load on first use.
+# "background" also preloads them in a thread right after startup, "eager"
+# preloads them before Api() returns, "off" leaves everything to first use.
+startup_warmup = os.getenv("STARTUP_WARMUP", "background").strip().lower()
+
+# The CAD close-approach list changes a few times a day at most
+asteroid_cache_ttl = float(os.getenv("ASTEROID_CACHE_TTL", "3600"))
+asteroid_cache_stale = float(os.getenv("ASTEROID_CACHE_STALE", "86400"))
+
+# run_simulation result cache. Inputs are canonicalized before anything is
+# computed: H, diameter and velocity to SIMULATION_CACHE_DIGITS significant
+# digits, lat/long to SIMULATION_CACHE_COORD_DECIMALS places (5 is ~1 m).
+# SIMULATION_CACHE_MAX_BYTES=0 turns the cache off.
+simulation_cache_max_bytes = int(os.getenv("SIMULATION_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+simulation_cache_ttl = float(os.getenv("SIMULATION_CACHE_TTL", "3600"))
+simulation_cache_digits = int(os.getenv("SIMULATION_CACHE_DIGITS", "6"))
+simulation_cache_coord_decimals = int(os.getenv("SIMULATION_CACHE_COORD_DECIMALS", "5"))
+
+# Monte Carlo limits; workers=None lets the pool use every core
+monte_carlo_max_trials = int(os.getenv("MONTE_CARLO_MAX_TRIALS", "10000000"))
+monte_carlo_workers = int(os.getenv("MONTE_CARLO_WORKERS")) if os.getenv("MONTE_CARLO_WORKERS") else None
+
+# Catalog scoring: sortable fields and page size limit
+catalog_sort_fields = ("risk_score", "megatons_tnt", "diameter_m", "dist_au")
+catalog_max_per_page = 500
+
+# Scenario sets: variants per request, and threads for the per-location and
+# per-impact work (geocoding, maps, exposure)
+scenario_max_variants = int(os.getenv("SCENARIO_MAX_VARIANTS", "50"))
+scenario_workers = int(os.getenv("SCENARIO_WORKERS", "8"))
+
+# Deflection sweeps: largest grid side
+deflection_max_steps = 256
+
+# Heatmap tile sets: process count for sweeps (None uses every core), and
+# whether a request builds a missing set itself instead of queueing a job
+heatmap_workers = int(os.getenv("HEATMAP_WORKERS")) if os.getenv("HEATMAP_WORKERS") else None
+heatmap_build_on_request = os.getenv("HEATMAP_BUILD_ON_REQUEST", "0").strip().lower() in ("1", "true", "yes")
+
 webPath = os.path.abspath("web")
 
+# Entries are zlib-compressed response bodies
+simulation_cache = LRUCache(max_bytes=simulation_cache_max_bytes, ttl=simulation_cache_ttl)
+
+metrics.registry.add_collector(metrics.lru_cache_collector("map_render", map_render_cache))
+metrics.registry.add_collector(metrics.lru_cache_collector("simulation_result", simulation_cache))
+
+class InputError(Exception):
+    """Simulation inputs are missing or invalid."""
+
+
+class AsteroidListError(Exception):
+    """The NASA close-approach API returned no usable asteroid list."""
+
+
 class Api():
+    def __init__(self):
+        self._land_mask = None
+        self._geocode_store = None
+        self._geocoders_ready = False
+        self._init_lock = threading.Lock()
+        self.warm = threading.Event()
+
+        # Columnar catalog snapshot, memory-mapped; None until one is ingested
+        self.catalog = None
+        try:
+            self.catalog = get_catalog()
+        except Exception as e:
+            print(f"Warning: Could not load catalog snapshot: {str(e)}")
+
+        self.asteroid_cache = TTLCache(
+            ttl=asteroid_cache_ttl,
+            stale_ttl=asteroid_cache_stale,
+            maxsize=8
+        )
+
+        if startup_warmup == "eager":
+            self.warm_up()
+        elif startup_warmup == "background":
+            threading.Thread(target=self.warm_up, name="warm-up", daemon=True).start()
+
+    def _init_geocoders(self):
+        # Deferred until the first land/ocean check (or the warm-up thread)
+        with self._init_lock:
+            if self._geocoders_ready:
+                return
+            if geocoder_mode != "remote" or not api_key:
+                if geocoder_mode == "remote":
+                    print("Warning: GEOCODER_MODE=remote needs OPENCAGE_API_KEY, using the landmask")
+                try:
+                    from landmask import get_land_mask
+
+                    self._land_mask = get_land_mask()
+                except Exception as e:
+                    print(f"Warning: Could not load landmask, falling back to OpenCage: {str(e)}")
+
+            # Remember remote geocoder answers on a geohash grid across restarts;
+            # with the landmask, the remote geocoder still settles coastal points
+            if api_key:
+                try:
+                    self._geocode_store = get_geocode_store()
+                except Exception as e:
+                    print(f"Warning: Could not open geocode store: {str(e)}")
+            self._geocoders_ready = True
+
+    @property
+    def land_mask(self):
+        if not self._geocoders_ready:
+            self._init_geocoders()
+        return self._land_mask
+
+    @property
+    def geocode_store(self):
+        if not self._geocoders_ready:
+            self._init_geocoders()
+        return self._geocode_store
+
+    def warm_up(self):
+        """
+        Load everything the first requests would otherwise pay for.
+
+        Safe to call from a background thread; each step is also done lazily
+        on first use, so a failure here only costs that first request.
+        """
+        steps = (
+            ("geocoders", self._init_geocoders),
+            ("http session", upstream.get_session),
+            ("map skeleton", warm_up_maps),
+            ("population raster", get_population_raster),
+            ("bathymetry", get_bathymetry),
+        )
+        for name, step in steps:
+            try:
+                step()
+            except Exception as e:
+                print(f"Warning: Warm-up step '{name}' failed: {str(e)}")
+        self.warm.set()
+
     def get_asteroid_list(self):
-        url = "https://ssd-api.jpl.nasa.gov/cad.api"
-        params = {
-            "dist-min": "0.01",
-            "dist-max": "0.05",
-            "nea": "true",
-        }
-        response = requests.get(url, params=params)
-        if response.status_code != 200:
-            return json.dumps({"error": f"Failed to fetch asteroid list: {response.status_code}"})
+        return self.get_asteroid_list_payload().text()
+
+    def get_asteroid_list_payload(self, loader=None):
+        """
+        Cached asteroid list as a pre-serialized JsonPayload.
+
+        Upstream failures are returned as an error payload and never cached.
+        ``loader`` replaces the default synchronous upstream fetch on a miss;
+        its result still goes through the shared store.
+        """
+        try:
+            with metrics.stage("get_asteroid_list", "cache"):
+                payload, state = self.asteroid_cache.get_or_load("cad", lambda: self._load_asteroid_list(loader))
+            metrics.cache_lookups.inc(cache="asteroid_list", result=state)
+            return payload
+        except AsteroidListError as e:
+            return JsonPayload(json.dumps({"error": str(e)}))
+        except Exception as e:
+            return JsonPayload(json.dumps({"error": f"Failed to fetch asteroid list: {str(e)}"}))
+
+    def _load_asteroid_list(self, fetch=None):
+        """Shared-store copy of the list, fetched with ``fetch()`` (a JsonPayload) on a miss."""
+        fetch = fetch or self._load_asteroid_list_direct
+        store = get_shared_store()
+        if store is not None:
+            try:
+                # One worker fetches from JPL, the others pick up its copy
+                body = store.get_or_load("asteroid_list", "cad", lambda: fetch().body, ttl=asteroid_cache_ttl)
+            except StoreError as e:
+                print(f"Warning: Shared asteroid list cache failed: {str(e)}")
+            else:
+                return JsonPayload(body, data=json.loads(body))
+        return fetch()
+
+    def _load_asteroid_list_direct(self):
+        asteroid_info = self.fetch_asteroid_list()
+        with metrics.stage("get_asteroid_list", "serialize"):
+            return JsonPayload(json.dumps(asteroid_info), data=asteroid_info)
+
+    def fetch_asteroid_list(self):
+        with metrics.stage("get_asteroid_list", "upstream_fetch"):
+            response = upstream.get(
+                "jpl",
+                upstream.JPL_CAD_URL,
+                params=upstream.CAD_PARAMS,
+                timeout=upstream.jpl_timeout()
+            )
+            if response.status_code != 200:
+                raise AsteroidListError(f"Failed to fetch asteroid list: {response.status_code}")
+            data = response.json()
+
+        with metrics.stage("get_asteroid_list", "parse"):
+            return self.parse_asteroid_list(data)
 
-        data = response.json()
+    def parse_asteroid_list(self, data):
+        """
+        Extract {name, h, v_inf, dist} records from a CAD API response.
 
+        Raises:
+            AsteroidListError: If the response has no data table.
+        """
         if "data" not in data or "fields" not in data:
-            return json.dumps({"error": "No asteroid data found in NASA API response."})
+            raise AsteroidListError("No asteroid data found in NASA API response.")
 
         fields = data["fields"]
         des_index = fields.index("des")
         h_index = fields.index("h")
         v_inf_index = fields.index("v_inf")
+        dist_index = fields.index("dist") if "dist" in fields else None
 
         asteroid_info = []
         for item in data["data"]:
@@ -49,23 +269,78 @@ class Api():
                 asteroid_info.append({
                     "name": item[des_index],
                     "h": item[h_index],
-                    "v_inf": item[v_inf_index]
+                    "v_inf": item[v_inf_index],
+                    "dist": item[dist_index] if dist_index is not None else None
                 })
 
 
-        return json.dumps(asteroid_info)
+        return asteroid_info
 
     def check_land_or_water(self,lat,lon,api_key):
         """
         land or water by long and lat 
         """
-        url = f"https://api.opencagedata.com/geocode/v1/json?q={lat}+{lon}&key={api_key}"
-        response = requests.get(url)
+        if self.land_mask is not None:
+            result = self.land_mask.check(lat, lon)
+            if not result.get("coastal") or not api_key:
+                return result
+            # Too close to the coarse coastline to trust; keep the landmask
+            # answer only if the remote geocoder has none
+            try:
+                remote = self.check_land_or_water_stored(lat, lon, api_key)
+            except Exception as e:
+                print(f"Warning: Remote geocoder failed for a coastal point: {str(e)}")
+                return result
+            return remote if "is_ocean" in remote else result
+        return self.check_land_or_water_stored(lat, lon, api_key)
 
-        if response.status_code != 200:
-            return {"status": "error", "message": f"API request failed: {response.status_code}"}
-        
-        data = response.json()
+    def check_land_or_water_stored(self, lat, lon, api_key):
+        """Remote answer through the persistent geocode store."""
+        cached = self.get_stored_geocode(lat, lon)
+        if cached is not None:
+            return cached
+        result = self.check_land_or_water_remote(lat, lon, api_key)
+        self.store_geocode(lat, lon, result)
+        return result
+
+    def get_stored_geocode(self, lat, lon):
+        """Answer from the persistent geocode store, or None on a miss."""
+        if self.geocode_store is None:
+            return None
+        try:
+            cached = self.geocode_store.get(lat, lon)
+        except Exception as e:
+            print(f"Warning: Geocode store lookup failed: {str(e)}")
+            return None
+        metrics.cache_lookups.inc(cache="geocode", result="hit" if cached is not None else "miss")
+        return cached
+
+    def store_geocode(self, lat, lon, result):
+        if self.geocode_store is None:
+            return
+        try:
+            self.geocode_store.put(lat, lon, result)
+        except Exception as e:
+            print(f"Warning: Could not store geocode result: {str(e)}")
+
+    def check_land_or_water_remote(self,lat,lon,api_key):
+        """
+        land or water by long and lat using the OpenCage geocoder
+        """
+        if not api_key:
+            return {"status": "error", "message": "Remote geocoding is disabled: OPENCAGE_API_KEY is not set"}
+        response = upstream.get(
+            "opencage",
+            upstream.OPENCAGE_URL,
+            params=upstream.opencage_params(lat, lon, api_key),
+            timeout=upstream.opencage_timeout()
+        )
+        data = response.json() if response.status_code == 200 else None
+        return self.parse_geocode_response(response.status_code, data)
+
+    def parse_geocode_response(self, status_code, data):
+        if status_code != 200:
+            return {"status": "error", "message": f"API request failed: {status_code}"}
 
         if not data["results"]:
             return {"status": "unknown", "message": "No results from API"}
@@ -81,6 +356,70 @@ class Api():
                 "is_ocean": True
             }
 
+    def parse_impact_inputs(
+        self,
+        asteroid_name=None,
+        diameter=None,
+        velocity=None,
+        lat=None,
+        long=None,
+        h_value=None
+    ):
+        """
+        Clean and validate the raw simulation inputs.
+
+        Raises:
+            InputError: With the message to return to the client.
+
+        Returns:
+            dict: lat, long, diameter_m, velocity_ms and h_value (None unless
+            the diameter was derived from the magnitude).
+        """
+        # Clean and validate input parameters
+        asteroid_name = asteroid_name.replace(" ", "").strip() if asteroid_name else None
+
+        # Set default values if not provided
+        try:
+            lat = float(lat) if lat not in (None, "") else 0.0
+            long = float(long) if long not in (None, "") else 0.0
+        except (ValueError, TypeError) as e:
+            raise InputError(f"Invalid numeric input: {str(e)}")
+
+        # Validate coordinates
+        if not (-90 <= lat <= 90 and -180 <= long <= 180):
+            raise InputError("Invalid coordinates. Latitude must be between -90 and 90, Longitude between -180 and 180")
+
+        h_value_float = None
+        # Calculate diameter and velocity based on input parameters
+        if asteroid_name and h_value not in (None, "") and velocity not in (None, ""):
+            # Calculate diameter from magnitude (H value)
+            try:
+                h_value_float = float(h_value)
+                velocity_float = float(velocity)
+                actual_diameter_km = 1329 / math.sqrt(pv) * (10 ** (-0.2 * h_value_float))
+                actual_diameter_m = actual_diameter_km * 1000
+                actual_velocity_ms = velocity_float * 1000  # Convert km/s to m/s
+            except (ValueError, TypeError) as e:
+                raise InputError(f"Invalid numeric input: {str(e)}")
+
+        elif (not asteroid_name) and (diameter not in (None, "")) and (velocity not in (None, "")):
+            # Use user-provided diameter and velocity
+            try:
+                actual_diameter_m = float(diameter) * 1000  # Convert km to m
+                actual_velocity_ms = float(velocity) * 1000  # Convert km/s to m/s
+            except (ValueError, TypeError) as e:
+                raise InputError(f"Invalid numeric input: {str(e)}")
+        else:
+            raise InputError("Missing required parameters. Need either (asteroid_name, h_value, velocity) or (diameter, velocity).")
+
+        return {
+            "lat": lat,
+            "long": long,
+            "diameter_m": actual_diameter_m,
+            "velocity_ms": actual_velocity_ms,
+            "h_value": h_value_float
+        }
+
     def run_simulation(
         self,
         asteroid_name=None,
@@ -89,79 +428,1106 @@ class Api():
         lat=None,
         long=None,
         h_value=None,
-        v_inf_value=None
+        v_inf_value=None,
+        response_mode=None
     ):  
+        """
+        Run a single impact simulation.
+
+        response_mode "geometry" returns the map as a compact map_geometry
+        payload (center, zones, earthquake rings) for the client to draw,
+        instead of a server-rendered folium map_html document.
+
+        Repeated inputs are answered from the result cache; see
+        run_simulation_cached.
+        """
+        body, _ = self.run_simulation_cached(asteroid_name, diameter, velocity, lat, long, h_value, response_mode)
+        return body
+
+    def run_simulation_cached(
+        self,
+        asteroid_name=None,
+        diameter=None,
+        velocity=None,
+        lat=None,
+        long=None,
+        h_value=None,
+        response_mode=None
+    ):
+        """
+        run_simulation plus the result cache status.
+
+        Returns:
+            tuple: (JSON body, "hit", "miss" or "bypass"). Inputs that can't
+            be canonicalized bypass the cache and get run_simulation's error.
+        """
+        key, canonical = self.simulation_cache_key(asteroid_name, diameter, velocity, lat, long, h_value, response_mode)
+        if key is None:
+            body, _ = self._run_simulation(asteroid_name, diameter, velocity, lat, long, h_value, response_mode)
+            return body, "bypass"
+        body = self.get_cached_simulation(key)
+        if body is not None:
+            return body, "hit"
+        body, cacheable = self._run_simulation(response_mode=response_mode, **canonical)
+        if cacheable:
+            self.store_simulation(key, body)
+        return body, "miss"
+
+    def simulation_cache_key(
+        self,
+        asteroid_name=None,
+        diameter=None,
+        velocity=None,
+        lat=None,
+        long=None,
+        h_value=None,
+        response_mode=None
+    ):
+        """
+        Canonical run_simulation inputs and the result cache key built from them.
+
+        The name is normalized as in the catalog, H, diameter and velocity
+        are rounded to simulation_cache_digits significant digits and lat/long
+        to simulation_cache_coord_decimals places. The simulation is then run
+        on these values, so a cached response is exactly what a fresh run of
+        the same key returns.
+
+        Returns:
+            tuple: (key, canonical inputs), or (None, None) when the cache is
+            off or an input is not numeric.
+        """
+        if simulation_cache_max_bytes <= 0 or response_mode not in (None, "", "html", "geometry"):
+            return None, None
+
+        def significant(value):
+            if value in (None, ""):
+                return None
+            return float(f"{float(value):.{simulation_cache_digits}g}")
+
+        def coordinate(value):
+            if value in (None, ""):
+                return None
+            return round(float(value), simulation_cache_coord_decimals) + 0.0
+
         try:
-            # Clean and validate input parameters
-            asteroid_name = asteroid_name.replace(" ", "").strip() if asteroid_name else None
-            
-            # Set default values if not provided
-            lat = float(lat) if lat not in (None, "") else 0.0
-            long = float(long) if long not in (None, "") else 0.0
-            
-            # Validate coordinates
-            if not (-90 <= lat <= 90 and -180 <= long <= 180):
-                return json.dumps({"error": "Invalid coordinates. Latitude must be between -90 and 90, Longitude between -180 and 180"})
-    
-            # Calculate diameter and velocity based on input parameters
-            if asteroid_name and h_value not in (None, "") and velocity not in (None, ""):
-                # Calculate diameter from magnitude (H value)
-                try:
-                    h_value_float = float(h_value)
-                    velocity_float = float(velocity)
-                    actual_diameter_km = 1329 / math.sqrt(pv) * (10 ** (-0.2 * h_value_float))
-                    actual_diameter_m = actual_diameter_km * 1000
-                    actual_velocity_ms = velocity_float * 1000  # Convert km/s to m/s
-                except (ValueError, TypeError) as e:
-                    return json.dumps({"error": f"Invalid numeric input: {str(e)}"})
-                    
-            elif (not asteroid_name) and (diameter not in (None, "")) and (velocity not in (None, "")):
-                # Use user-provided diameter and velocity
-                try:
-                    actual_diameter_m = float(diameter) * 1000  # Convert km to m
-                    actual_velocity_ms = float(velocity) * 1000  # Convert km/s to m/s
-                except (ValueError, TypeError) as e:
-                    return json.dumps({"error": f"Invalid numeric input: {str(e)}"})
-            else:
-                return json.dumps({"error": "Missing required parameters. Need either (asteroid_name, h_value, velocity) or (diameter, velocity)."})
-    
+            canonical = {
+                "asteroid_name": normalize_name(str(asteroid_name)) if asteroid_name else None,
+                "diameter": significant(diameter),
+                "velocity": significant(velocity),
+                "lat": coordinate(lat),
+                "long": coordinate(long),
+                "h_value": significant(h_value)
+            }
+        except (ValueError, TypeError):
+            return None, None
+        if not all(math.isfinite(value) for value in canonical.values() if isinstance(value, float)):
+            return None, None
+        key = tuple(canonical.values()) + (response_mode or "html",)
+        return key, canonical
+
+    def get_cached_simulation(self, key):
+        stored = simulation_cache.get(key)
+        metrics.cache_lookups.inc(cache="simulation_result", result="hit" if stored is not None else "miss")
+        return zlib.decompress(stored).decode("utf-8") if stored is not None else None
+
+    def store_simulation(self, key, body):
+        simulation_cache.set(key, zlib.compress(body.encode("utf-8"), 1))
+
+    def _run_simulation(
+        self,
+        asteroid_name=None,
+        diameter=None,
+        velocity=None,
+        lat=None,
+        long=None,
+        h_value=None,
+        response_mode=None
+    ):
+        """
+        Uncached run_simulation.
+
+        Returns:
+            tuple: (JSON body, cacheable). Errors and runs where the land/ocean
+            status could not be determined are not cacheable.
+        """
+        try:
+            if response_mode not in (None, "", "html", "geometry"):
+                return json.dumps({"error": "Invalid response_mode. Use 'html' or 'geometry'."}), False
+
+            try:
+                with metrics.stage("run_simulation", "validate"):
+                    inputs = self.parse_impact_inputs(asteroid_name, diameter, velocity, lat, long, h_value)
+            except InputError as e:
+                return json.dumps({"error": str(e)}), False
+            lat = inputs["lat"]
+            long = inputs["long"]
+            actual_diameter_m = inputs["diameter_m"]
+            actual_velocity_ms = inputs["velocity_ms"]
+
             # Determine if impact is in ocean or on land
             try:
-                location_status = self.check_land_or_water(lat, long, api_key)
+                with metrics.stage("run_simulation", "geocode"):
+                    location_status = self.check_land_or_water(lat, long, api_key)
                 is_ocean = location_status.get("is_ocean", False)
+                geocoded = "error" not in location_status
             except Exception as e:
                 print(f"Warning: Could not determine land/water status: {str(e)}")
                 is_ocean = False  # Default to land if we can't determine
+                geocoded = False
 
             # Calculate impact effects
             try:
-                impact_results = full_impact_calculation(
-                    diameter_m=actual_diameter_m,
-                    velocity_ms=actual_velocity_ms,
-                    is_ocean=is_ocean
-                )
-                
-                # Generate map with damage zones
-                map_html = generate_detailed_map_html(
-                    latitude=lat,
-                    longitude=long,
-                    damage_radii_dict=impact_results.get("damage_radii_km", {}),
-                    earthquake_magnitude=impact_results.get("earthquake_magnitude", 0)
-                )
+                with metrics.stage("run_simulation", "physics"):
+                    impact_results = full_impact_calculation(
+                        diameter_m=actual_diameter_m,
+                        velocity_ms=actual_velocity_ms,
+                        is_ocean=is_ocean,
+                        ocean_depth_m=self.ocean_depth_at(lat, long) if is_ocean else DEFAULT_OCEAN_DEPTH_M
+                    )
+
+                with metrics.stage("run_simulation", "map_" + (response_mode or "html")):
+                    map_fields = self.build_map_fields(lat, long, impact_results, response_mode)
+
+                with metrics.stage("run_simulation", "exposure"):
+                    exposure_fields = self.build_exposure_fields(lat, long, impact_results)
+
+                with metrics.stage("run_simulation", "tsunami"):
+                    tsunami_fields = self.build_tsunami_fields(lat, long, impact_results)
 
                 # Compile final results
                 final_results = {
                     **impact_results,
-                    "map_html": map_html,
+                    **map_fields,
+                    **exposure_fields,
+                    **tsunami_fields,
                     "is_ocean": is_ocean,
                     "status": "success"
                 }
-                return json.dumps(final_results)
+                return json.dumps(final_results), geocoded
                 
             except Exception as e:
-                return json.dumps({"error": f"Error in impact calculation: {str(e)}"})
+                return json.dumps({"error": f"Error in impact calculation: {str(e)}"}), False
                 
 #
 
         except Exception as e:
-            return json.dumps({"error": str(e)})
\ No newline at end of file
+            return json.dumps({"error": str(e)}), False
+
+    def build_map_fields(self, lat, long, impact_results, response_mode=None):
+        """
+        Map part of a simulation response: map_geometry or map_html.
+        """
+        if response_mode == "geometry":
+            # Let the client draw the zones on its own Leaflet map
+            return {
+                "map_geometry": build_impact_geometry(
+                    latitude=lat,
+                    longitude=long,
+                    damage_radii_dict=impact_results.get("damage_radii_km", {}),
+                    earthquake_magnitude=impact_results.get("earthquake_magnitude", 0)
+                )
+            }
+        # Generate map with damage zones
+        return {
+            "map_html": generate_detailed_map_html(
+                latitude=lat,
+                longitude=long,
+                damage_radii_dict=impact_results.get("damage_radii_km", {}),
+                earthquake_magnitude=impact_results.get("earthquake_magnitude", 0)
+            )
+        }
+
+    def build_exposure_fields(self, lat, long, impact_results):
+        """
+        Population exposure part of a simulation response.
+
+        Empty unless a population raster is configured (POPULATION_RASTER_PATH).
+        """
+        raster = get_population_raster()
+        if raster is None:
+            return {}
+        return {
+            "population_exposure": estimate_exposure(
+                raster, lat, long, impact_results.get("damage_radii_km", {})
+            )
+        }
+
+    def ocean_depth_at(self, lat, long):
+        """
+        Water depth at an ocean impact point.
+
+        From the bathymetry grid (BATHYMETRY_PATH) when one is configured and
+        has water there, otherwise the DEFAULT_OCEAN_DEPTH_M assumption.
+        """
+        grid = get_bathymetry()
+        depth = grid.depth_at(lat, long) if grid is not None else None
+        return depth if depth is not None else DEFAULT_OCEAN_DEPTH_M
+
+    def build_tsunami_fields(self, lat, long, impact_results):
+        """
+        Tsunami part of a simulation response: coastline run-up and inundation rings.
+
+        Empty for land impacts, and unless a bathymetry grid is configured
+        (BATHYMETRY_PATH) with water at the impact point.
+        """
+        grid = get_bathymetry()
+        if grid is None or not impact_results.get("is_ocean_impact"):
+            return {}
+        tsunami = estimate_tsunami(grid, lat, long, impact_results.get("crater_diameter_km"))
+        return {"tsunami": tsunami} if tsunami is not None else {}
+
+    def run_scenarios(self, variants=None, base=None, response_mode=None):
+        """
+        Run a set of simulation variants and return them as one result.
+
+        Each variant takes the run_simulation inputs plus an optional label;
+        inputs it leaves out come from ``base`` (e.g. one impactor in base
+        and a lat/long per variant). Work shared between variants is done
+        once: every distinct location is geocoded once, every distinct
+        (diameter, velocity, ocean) impact is computed once, and every
+        distinct impact at a location gets one map, one exposure estimate
+        and one tsunami estimate. Geocoding, maps, exposure and tsunamis run
+        concurrently.
+
+        response_mode "overlay" (the default) draws all variants on a single
+        top-level map_html; "html" and "geometry" give each variant its own
+        map as run_simulation does; "none" skips maps. An invalid variant
+        gets an error entry without failing the others.
+        """
+        try:
+            response_mode = response_mode or "overlay"
+            if response_mode not in ("overlay", "html", "geometry", "none"):
+                return json.dumps({"error": "Invalid response_mode. Use 'overlay', 'html', 'geometry' or 'none'."})
+            if not isinstance(variants, list) or not variants:
+                return json.dumps({"error": "variants must be a non-empty list"})
+            if len(variants) > scenario_max_variants:
+                return json.dumps({"error": f"At most {scenario_max_variants} variants per request"})
+            base = base if isinstance(base, dict) else {}
+
+            scenarios = []
+            with metrics.stage("run_scenarios", "validate"):
+                for index, variant in enumerate(variants):
+                    if not isinstance(variant, dict):
+                        scenarios.append({"index": index, "error": "Each variant must be an object"})
+                        continue
+                    args = {**base, **variant}
+                    label = str(args.get("label") or args.get("asteroid_name") or f"Scenario {index + 1}")
+                    try:
+                        inputs = self.parse_impact_inputs(
+                            args.get("asteroid_name"),
+                            args.get("diameter"),
+                            args.get("velocity"),
+                            args.get("lat"),
+                            args.get("long"),
+                            args.get("h_value")
+                        )
+                    except InputError as e:
+                        scenarios.append({"index": index, "label": label, "error": str(e)})
+                        continue
+                    scenarios.append({"index": index, "label": label, "inputs": inputs})
+            valid = [scenario for scenario in scenarios if "inputs" in scenario]
+
+            with ThreadPoolExecutor(max_workers=scenario_workers) as pool:
+                locations = list(dict.fromkeys((s["inputs"]["lat"], s["inputs"]["long"]) for s in valid))
+                with metrics.stage("run_scenarios", "geocode"):
+                    is_ocean = dict(zip(locations, pool.map(lambda location: self._is_ocean(*location), locations)))
+
+                # One physics run per distinct impactor, surface and water depth
+                impacts = {}
+                with metrics.stage("run_scenarios", "physics"):
+                    for scenario in valid:
+                        inputs = scenario["inputs"]
+                        ocean = is_ocean[(inputs["lat"], inputs["long"])]
+                        depth = self.ocean_depth_at(inputs["lat"], inputs["long"]) if ocean else DEFAULT_OCEAN_DEPTH_M
+                        key = (inputs["diameter_m"], inputs["velocity_ms"], ocean, depth)
+                        scenario["impact_key"] = key
+                        if key not in impacts:
+                            try:
+                                impacts[key] = full_impact_calculation(
+                                    diameter_m=key[0], velocity_ms=key[1], is_ocean=ocean, ocean_depth_m=depth
+                                )
+                            except Exception as e:
+                                impacts[key] = e
+
+                # One map, exposure and tsunami estimate per distinct impact at a location
+                sites = {}
+                for scenario in valid:
+                    impact_results = impacts[scenario["impact_key"]]
+                    if isinstance(impact_results, Exception):
+                        continue
+                    site = (scenario["inputs"]["lat"], scenario["inputs"]["long"], scenario["impact_key"])
+                    scenario["site"] = site
+                    if site not in sites:
+                        sites[site] = pool.submit(self._scenario_site_fields, site[0], site[1], impact_results, response_mode)
+
+                results = []
+                for scenario in scenarios:
+                    entry = {"index": scenario["index"]}
+                    if "label" in scenario:
+                        entry["label"] = scenario["label"]
+                    if "error" in scenario:
+                        results.append({**entry, "error": scenario["error"]})
+                        continue
+                    impact_results = impacts[scenario["impact_key"]]
+                    if isinstance(impact_results, Exception):
+                        results.append({**entry, "error": f"Error in impact calculation: {str(impact_results)}"})
+                        continue
+                    try:
+                        site_fields = sites[scenario["site"]].result()
+                    except Exception as e:
+                        results.append({**entry, "error": f"Error in impact calculation: {str(e)}"})
+                        continue
+                    results.append({
+                        **entry,
+                        **impact_results,
+                        **site_fields,
+                        "is_ocean": scenario["impact_key"][2],
+                        "status": "success"
+                    })
+
+            response = {
+                "scenarios": results,
+                "shared": {
+                    "variants": len(scenarios),
+                    "valid": len(valid),
+                    "locations": len(locations),
+                    "impacts": len(impacts),
+                    "sites": len(sites)
+                }
+            }
+            if response_mode == "overlay":
+                with metrics.stage("run_scenarios", "map_overlay"):
+                    response["map_html"] = generate_overlay_map_html([
+                        {
+                            "label": item["label"],
+                            "latitude": scenario["inputs"]["lat"],
+                            "longitude": scenario["inputs"]["long"],
+                            "damage_radii_dict": item.get("damage_radii_km", {}),
+                            "earthquake_magnitude": item.get("earthquake_magnitude", 0)
+                        }
+                        for scenario, item in zip(scenarios, results) if item.get("status") == "success"
+                    ])
+            response["status"] = "success"
+            return json.dumps(response)
+
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    def _is_ocean(self, lat, long):
+        try:
+            return self.check_land_or_water(lat, long, api_key).get("is_ocean", False)
+        except Exception as e:
+            print(f"Warning: Could not determine land/water status: {str(e)}")
+            return False
+
+    def _scenario_site_fields(self, lat, long, impact_results, response_mode):
+        fields = {}
+        if response_mode in ("html", "geometry"):
+            with metrics.stage("run_scenarios", "map_" + response_mode):
+                fields.update(self.build_map_fields(lat, long, impact_results, response_mode))
+        with metrics.stage("run_scenarios", "exposure"):
+            fields.update(self.build_exposure_fields(lat, long, impact_results))
+        with metrics.stage("run_scenarios", "tsunami"):
+            fields.update(self.build_tsunami_fields(lat, long, impact_results))
+        return fields
+
+    def run_monte_carlo(
+        self,
+        asteroid_name=None,
+        diameter=None,
+        velocity=None,
+        lat=None,
+        long=None,
+        h_value=None,
+        trials=None,
+        seed=None,
+        progress=None
+    ):
+        """
+        Percentile bands for the impact outcome under input uncertainty.
+
+        Takes the same inputs as run_simulation plus the number of trials and
+        the sampling seed. No map is rendered. ``progress(fraction, message)``
+        is called as trials complete (used by jobs).
+        """
+        try:
+            try:
+                inputs = self.parse_impact_inputs(asteroid_name, diameter, velocity, lat, long, h_value)
+                n_trials = int(trials) if trials not in (None, "") else 100_000
+                seed = int(seed) if seed not in (None, "") else 0
+            except InputError as e:
+                return json.dumps({"error": str(e)})
+            except (ValueError, TypeError) as e:
+                return json.dumps({"error": f"Invalid numeric input: {str(e)}"})
+
+            if not (0 < n_trials <= monte_carlo_max_trials):
+                return json.dumps({"error": f"trials must be between 1 and {monte_carlo_max_trials}"})
+
+            try:
+                location_status = self.check_land_or_water(inputs["lat"], inputs["long"], api_key)
+                is_ocean = location_status.get("is_ocean", False)
+            except Exception as e:
+                print(f"Warning: Could not determine land/water status: {str(e)}")
+                is_ocean = False
+
+            result = run_monte_carlo(
+                velocity_ms=inputs["velocity_ms"],
+                h_magnitude=inputs["h_value"],
+                diameter_m=inputs["diameter_m"],
+                is_ocean=is_ocean,
+                ocean_depth_m=self.ocean_depth_at(inputs["lat"], inputs["long"]) if is_ocean else DEFAULT_OCEAN_DEPTH_M,
+                n_trials=n_trials,
+                seed=seed,
+                workers=monte_carlo_workers,
+                progress=progress
+            )
+            return json.dumps({**result, "status": "success"})
+
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    def score_asteroid_catalog(
+        self,
+        sort="risk_score",
+        page=1,
+        per_page=50,
+        is_ocean=False,
+        include_map=False,
+        lat=None,
+        long=None
+    ):
+        """
+        Score every object in the close-approach list in one pass.
+
+        Diameter comes from H, energy from v_inf, then damage radii and the
+        risk assessment are computed for the whole catalog with the batch
+        engine. Results are ranked by ``sort`` (descending, except dist_au)
+        and paginated. Maps are only rendered when include_map is set, and
+        only for the objects on the requested page.
+        """
+        try:
+            try:
+                sort, page, per_page, lat, long = self.parse_catalog_args(sort, page, per_page, lat, long)
+            except InputError as e:
+                return json.dumps({"error": str(e)})
+
+            payload = self.get_asteroid_list_payload()
+            if payload.data is None:
+                # Error payloads carry no records; pass the error through
+                return payload.text()
+
+            scored = self.score_asteroids(payload.data, is_ocean=is_ocean)
+            reverse = sort != "dist_au"
+            missing = float("-inf") if reverse else float("inf")
+            scored.sort(
+                key=lambda item: item[sort] if item[sort] is not None else missing,
+                reverse=reverse
+            )
+            for rank, item in enumerate(scored, start=1):
+                item["rank"] = rank
+
+            total = len(scored)
+            start = (page - 1) * per_page
+            results = scored[start:start + per_page]
+
+            if include_map:
+                for item in results:
+                    item["map_html"] = generate_detailed_map_html(
+                        latitude=lat,
+                        longitude=long,
+                        damage_radii_dict=item["damage_radii_km"],
+                        earthquake_magnitude=item["earthquake_magnitude"] or 0
+                    )
+
+            return json.dumps({
+                "total": total,
+                "page": page,
+                "per_page": per_page,
+                "pages": math.ceil(total / per_page) if total else 0,
+                "sort": sort,
+                "is_ocean": bool(is_ocean),
+                "results": results,
+                "status": "success"
+            })
+
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    def parse_catalog_args(self, sort=None, page=None, per_page=None, lat=None, long=None):
+        """
+        Validate catalog scoring arguments.
+
+        Raises:
+            InputError: With the message to return to the client.
+
+        Returns:
+            tuple: (sort, page, per_page, lat, long) with defaults applied.
+        """
+        try:
+            page = int(page) if page not in (None, "") else 1
+            per_page = int(per_page) if per_page not in (None, "") else 50
+            lat = float(lat) if lat not in (None, "") else 0.0
+            long = float(long) if long not in (None, "") else 0.0
+        except (ValueError, TypeError) as e:
+            raise InputError(f"Invalid numeric input: {str(e)}")
+        sort = sort or "risk_score"
+        if sort not in catalog_sort_fields:
+            raise InputError(f"Invalid sort field. Use one of: {', '.join(catalog_sort_fields)}")
+        if page < 1 or not (1 <= per_page <= catalog_max_per_page):
+            raise InputError(f"page must be >= 1 and per_page between 1 and {catalog_max_per_page}")
+        return sort, page, per_page, lat, long
+
+    def stream_asteroid_catalog(
+        self,
+        sort=None,
+        is_ocean=False,
+        include_map=False,
+        lat=None,
+        long=None,
+        chunk_size=256
+    ):
+        """
+        Score the whole catalog as an NDJSON stream, one line per asteroid.
+
+        Same record shape as score_asteroid_catalog, without pagination.
+        With no ``sort`` (or "catalog"), records come in catalog order and
+        are scored and written ``chunk_size`` at a time, so the first line
+        goes out after one chunk. With a sort field, the catalog is scored
+        once into flat arrays, ranked, and records are built from those
+        arrays in rank order. Ends with a summary trailer.
+
+        Yields:
+            bytes: NDJSON lines (see streaming.ndjson_stream).
+        """
+        summary = StreamSummary(
+            numeric_fields=("megatons_tnt", "diameter_m", "risk_score"),
+            count_fields=("risk_level",)
+        )
+        return ndjson_stream(
+            self._iter_catalog_records(sort, is_ocean, include_map, lat, long, chunk_size),
+            summary
+        )
+
+    def _iter_catalog_records(self, sort, is_ocean, include_map, lat, long, chunk_size):
+        ranked = sort not in (None, "", "catalog")
+        sort, _, _, lat, long = self.parse_catalog_args(sort if ranked else None, None, None, lat, long)
+        payload = self.get_asteroid_list_payload()
+        if payload.data is None:
+            raise AsteroidListError(json.loads(payload.body).get("error", "No asteroid list available"))
+        asteroids = payload.data
+
+        if ranked:
+            columns = self._score_columns(asteroids, is_ocean)
+            reverse = sort != "dist_au"
+            keys = np.where(np.isfinite(columns[sort]), columns[sort], -np.inf if reverse else np.inf)
+            # Stable, like list.sort(reverse=True): ties keep catalog order
+            order = np.argsort(-keys if reverse else keys, kind="stable")
+            chunks = (
+                (asteroids, columns, order[start:start + chunk_size])
+                for start in range(0, len(order), chunk_size)
+            )
+        else:
+            chunks = (
+                (chunk, self._score_columns(chunk, is_ocean), range(len(chunk)))
+                for chunk in (asteroids[start:start + chunk_size] for start in range(0, len(asteroids), chunk_size))
+            )
+
+        rank = 0
+        for chunk, columns, rows in chunks:
+            for item in self._scored_records(chunk, columns, rows):
+                if ranked:
+                    rank += 1
+                    item["rank"] = rank
+                if include_map:
+                    item["map_html"] = generate_detailed_map_html(
+                        latitude=lat,
+                        longitude=long,
+                        damage_radii_dict=item["damage_radii_km"],
+                        earthquake_magnitude=item["earthquake_magnitude"] or 0
+                    )
+                yield item
+
+    def score_asteroids(self, asteroids, is_ocean=False):
+        """
+        Impact and risk figures for a list of {name, h, v_inf, dist} records.
+
+        Returns:
+            list: One dict per asteroid; NaN results are reported as None.
+        """
+        if not asteroids:
+            return []
+        return self._scored_records(asteroids, self._score_columns(asteroids, is_ocean), range(len(asteroids)))
+
+    def _score_columns(self, asteroids, is_ocean=False):
+        """
+        Batch figures for a list of asteroids as flat arrays.
+
+        Adds h, v_inf, dist_au and risk_score columns to the
+        batch_impact_calculation result; missing values are NaN.
+        """
+        h = np.array([float(a["h"]) for a in asteroids], dtype=np.float64)
+        v_inf_kms = np.array([float(a["v_inf"]) for a in asteroids], dtype=np.float64)
+        dist_au = np.array([
+            float(a["dist"]) if a.get("dist") not in (None, "") else np.nan for a in asteroids
+        ], dtype=np.float64)
+        diameter_m = D / math.sqrt(pv) * (10 ** (-0.2 * h)) * 1000
+        columns = batch_impact_calculation(diameter_m, v_inf_kms * 1000, is_ocean)
+        # Same expression as calculate_risk_assessment, where it applies
+        scorable = np.isfinite(columns["megatons_tnt"]) & ~np.isnan(dist_au) & (dist_au != 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            risk_score = np.where(scorable, columns["megatons_tnt"] / (dist_au * 100), np.nan)
+        return {**columns, "h": h, "v_inf": v_inf_kms, "dist_au": dist_au, "risk_score": risk_score}
+
+    def _scored_records(self, asteroids, columns, rows):
+        """Record dicts for the given row indexes of asteroids and their _score_columns arrays."""
+        radius_keys = (
+            "total_destruction_km",
+            "severe_damage_km",
+            "moderate_damage_km",
+            "window_breakage_km",
+            "light_damage_km"
+        )
+        scored = []
+        for i in rows:
+            asteroid = asteroids[i]
+            megatons = _finite_or_none(columns["megatons_tnt"][i])
+            dist_au = float(asteroid["dist"]) if asteroid.get("dist") not in (None, "") else None
+            if megatons is not None and dist_au:
+                risk = calculate_risk_assessment(megatons, dist_au)
+            else:
+                risk = {"risk_score": None, "risk_level": None}
+            scored.append({
+                "name": asteroid["name"],
+                "h": float(columns["h"][i]),
+                "v_inf": float(columns["v_inf"][i]),
+                "dist_au": dist_au,
+                "diameter_m": float(columns["diameter_m"][i]),
+                "energy_joules": _finite_or_none(columns["energy_joules"][i]),
+                "megatons_tnt": megatons,
+                "crater_diameter_km": _finite_or_none(columns["crater_diameter_km"][i]),
+                "earthquake_magnitude": _finite_or_none(columns["earthquake_magnitude"][i]),
+                "tsunami_height_m": _finite_or_none(columns["tsunami_height_m"][i]),
+                "damage_radii_km": {
+                    key: _finite_or_none(columns[key][i]) for key in radius_keys
+                },
+                **risk
+            })
+        return scored
+
+    def quick_estimate(self, diameter=None, velocity=None, h_value=None, is_ocean=False):
+        """
+        Impact figures without geocoding or a map, for slider UIs.
+
+        Same units as run_simulation (diameter in km, velocity in km/s).
+        """
+        try:
+            try:
+                velocity_ms = float(velocity) * 1000
+                diameter_m = float(diameter) * 1000 if diameter not in (None, "") else None
+                h_magnitude = float(h_value) if h_value not in (None, "") else None
+            except (ValueError, TypeError) as e:
+                return json.dumps({"error": f"Invalid numeric input: {str(e)}"})
+            if diameter_m is None and h_magnitude is None:
+                return json.dumps({"error": "Missing required parameters. Need velocity and either diameter or h_value."})
+            if diameter_m is None:
+                diameter_m = D / math.sqrt(pv) * (10 ** (-0.2 * h_magnitude)) * 1000
+
+            exact = full_impact_calculation(diameter_m=diameter_m, velocity_ms=velocity_ms, is_ocean=is_ocean)
+            return json.dumps({**exact, "source": "exact", "status": "success"})
+
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    def query_catalog(self, top=None, min_diameter_m=None, max_diameter_m=None, prefix=None, limit=None):
+        """
+        Indexed queries on the local catalog snapshot; never touches the network.
+
+        Exactly one query kind is used: ``prefix`` (designation prefix), a
+        diameter range in meters, or otherwise the ``top`` N by impact energy.
+        ``limit`` caps the rows returned (at most catalog_max_per_page).
+        """
+        try:
+            if self.catalog is None:
+                return json.dumps({"error": "No catalog snapshot. Run 'python catalog.py ingest' or 'python catalog.py fetch'."})
+            try:
+                top = int(top) if top not in (None, "") else None
+                limit = int(limit) if limit not in (None, "") else None
+                min_diameter_m = float(min_diameter_m) if min_diameter_m not in (None, "") else None
+                max_diameter_m = float(max_diameter_m) if max_diameter_m not in (None, "") else None
+            except (ValueError, TypeError) as e:
+                return json.dumps({"error": f"Invalid numeric input: {str(e)}"})
+
+            if limit is None:
+                limit = top if top is not None else 50
+            if not (1 <= limit <= catalog_max_per_page):
+                return json.dumps({"error": f"limit must be between 1 and {catalog_max_per_page}"})
+
+            if prefix:
+                query = "prefix"
+                results = self.catalog.name_prefix(prefix, limit=limit)
+            elif min_diameter_m is not None or max_diameter_m is not None:
+                query = "diameter_range"
+                results = self.catalog.diameter_range(min_diameter_m, max_diameter_m, limit=limit)
+            else:
+                query = "top_energy"
+                results = self.catalog.top_by_energy(limit)
+
+            return json.dumps({
+                "query": query,
+                "version": self.catalog.version,
+                "fetched_at": self.catalog.manifest["fetched_at"],
+                "count": len(results),
+                "results": results,
+                "status": "success"
+            })
+
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+
+    def parse_deflection_inputs(
+        self,
+        asteroid_name=None,
+        diameter=None,
+        velocity=None,
+        h_value=None,
+        v_inf_value=None
+    ):
+        """
+        Resolve the asteroid for a deflection run or a heatmap.
+
+        A catalog designation alone is looked up in the local snapshot for
+        its H and v_inf; otherwise the run_simulation inputs are used, with
+        v_inf_value (km/s) taking precedence over velocity as the encounter
+        speed.
+
+        Raises:
+            InputError: With the message to return to the client.
+
+        Returns:
+            dict: name, h_value, diameter_m, v_inf_kms and mass_kg.
+        """
+        if asteroid_name and h_value in (None, "") and velocity in (None, "") and v_inf_value in (None, ""):
+            if self.catalog is None:
+                raise InputError("No catalog snapshot to look up the asteroid. Give h_value and velocity instead.")
+            key = normalize_name(asteroid_name)
+            matches = [
+                record for record in self.catalog.name_prefix(asteroid_name, limit=catalog_max_per_page)
+                if normalize_name(record["name"]) == key
+            ]
+            if not matches:
+                raise InputError(f"Asteroid {asteroid_name} is not in the catalog snapshot")
+            h_value = matches[0]["h"]
+            velocity = matches[0]["v_inf_kms"]
+        if velocity in (None, ""):
+            velocity = v_inf_value
+        inputs = self.parse_impact_inputs(asteroid_name, diameter, velocity, None, None, h_value)
+        try:
+            v_inf_kms = float(v_inf_value) if v_inf_value not in (None, "") else inputs["velocity_ms"] / 1000
+        except (ValueError, TypeError) as e:
+            raise InputError(f"Invalid numeric input: {str(e)}")
+        if not math.isfinite(inputs["diameter_m"]) or not math.isfinite(v_inf_kms):
+            raise InputError("diameter and v_inf must be finite numbers")
+        if v_inf_kms <= 0:
+            raise InputError("v_inf must be positive")
+        return {
+            "name": asteroid_name,
+            "h_value": inputs["h_value"],
+            "diameter_m": inputs["diameter_m"],
+            "v_inf_kms": v_inf_kms,
+            "mass_kg": calculate_mass_and_energy(inputs["diameter_m"], inputs["velocity_ms"])["mass_kg"]
+        }
+
+    def run_deflection(
+        self,
+        asteroid_name=None,
+        diameter=None,
+        velocity=None,
+        h_value=None,
+        v_inf_value=None,
+        delta_v=None,
+        lead_time=None,
+        impactor_mass=None,
+        impactor_speed=None,
+        beta=None,
+        nominal_miss=None
+    ):
+        """
+        Whether a kinetic impactor deflects an Earth-bound asteroid.
+
+        The push is either ``delta_v`` (mm/s, along-track) or derived from
+        ``impactor_mass`` (kg), ``impactor_speed`` (km/s) and the momentum
+        enhancement ``beta`` (default DART's 3.6). ``lead_time`` is in days
+        before the encounter; ``nominal_miss`` is the undeflected B-plane
+        miss distance in km (default 0, a direct hit). See deflection.py for
+        the encounter model.
+        """
+        try:
+            try:
+                asteroid = self.parse_deflection_inputs(asteroid_name, diameter, velocity, h_value, v_inf_value)
+                lead_time_days = float(lead_time) if lead_time not in (None, "") else None
+                nominal_b_km = float(nominal_miss) if nominal_miss not in (None, "") else 0.0
+                if delta_v not in (None, ""):
+                    delta_v_ms = float(delta_v) / 1000
+                elif impactor_mass not in (None, "") and impactor_speed not in (None, ""):
+                    delta_v_ms = kinetic_impactor_delta_v(
+                        asteroid["mass_kg"],
+                        float(impactor_mass),
+                        float(impactor_speed) * 1000,
+                        float(beta) if beta not in (None, "") else DART_BETA
+                    )
+                else:
+                    raise InputError("Missing deflection parameters. Need delta_v or (impactor_mass, impactor_speed).")
+            except InputError as e:
+                return json.dumps({"error": str(e)})
+            except (ValueError, TypeError) as e:
+                return json.dumps({"error": f"Invalid numeric input: {str(e)}"})
+
+            if lead_time_days is None or lead_time_days <= 0:
+                return json.dumps({"error": "lead_time must be a positive number of days"})
+            if not all(math.isfinite(value) for value in (lead_time_days, delta_v_ms, nominal_b_km)):
+                return json.dumps({"error": "lead_time, delta_v and nominal_miss must be finite numbers"})
+            if delta_v_ms < 0 or nominal_b_km < 0:
+                return json.dumps({"error": "delta_v and nominal_miss must not be negative"})
+
+            outcome = assess_deflection(asteroid["v_inf_kms"], delta_v_ms, lead_time_days, nominal_b_km)
+            minimum_delta_v_ms = outcome.pop("minimum_delta_v_ms")
+            return json.dumps({
+                "asteroid": asteroid,
+                "delta_v_mm_s": delta_v_ms * 1000,
+                "lead_time_days": lead_time_days,
+                "nominal_miss_km": nominal_b_km,
+                **outcome,
+                "minimum_delta_v_mm_s": minimum_delta_v_ms * 1000,
+                "status": "success"
+            })
+
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    def deflection_sweep(
+        self,
+        asteroid_name=None,
+        diameter=None,
+        velocity=None,
+        h_value=None,
+        v_inf_value=None,
+        nominal_miss=None,
+        steps=None
+    ):
+        """
+        Feasibility heatmap over lead time × Δv for one asteroid.
+
+        Both axes are log-spaced (deflection.DELTA_V_RANGE_MS and
+        LEAD_TIME_RANGE_DAYS) with ``steps`` points each. miss_earth_radii
+        has one row per lead time; clears marks the cells that miss Earth.
+        """
+        try:
+            try:
+                asteroid = self.parse_deflection_inputs(asteroid_name, diameter, velocity, h_value, v_inf_value)
+                nominal_b_km = float(nominal_miss) if nominal_miss not in (None, "") else 0.0
+                steps = int(steps) if steps not in (None, "") else 64
+            except InputError as e:
+                return json.dumps({"error": str(e)})
+            except (ValueError, TypeError) as e:
+                return json.dumps({"error": f"Invalid numeric input: {str(e)}"})
+            if not (2 <= steps <= deflection_max_steps):
+                return json.dumps({"error": f"steps must be between 2 and {deflection_max_steps}"})
+            if not math.isfinite(nominal_b_km) or nominal_b_km < 0:
+                return json.dumps({"error": "nominal_miss must be a finite, non-negative number"})
+
+            grid = feasibility_grid(asteroid["v_inf_kms"], nominal_b_km=nominal_b_km, shape=(steps, steps))
+            return json.dumps({
+                "asteroid": asteroid,
+                "nominal_miss_km": nominal_b_km,
+                "capture_radius_km": grid["capture_radius_km"],
+                "delta_v_mm_s": (grid["delta_v_ms"] * 1000).tolist(),
+                "lead_time_days": grid["lead_time_days"].tolist(),
+                "miss_earth_radii": np.round(grid["miss_km"] / EARTH_RADIUS_KM, 4).tolist(),
+                "clears": grid["clears"].astype(np.uint8).tolist(),
+                "minimum_delta_v_mm_s": (grid["minimum_delta_v_ms"] * 1000).tolist(),
+                "status": "success"
+            })
+
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    def get_heatmap(
+        self,
+        asteroid_name=None,
+        diameter=None,
+        velocity=None,
+        h_value=None,
+        v_inf_value=None,
+        resolution=None,
+        max_zoom=None,
+        build=False,
+        progress=None
+    ):
+        """
+        Global impact-risk tile set for one impactor.
+
+        The impactor is resolved as for run_deflection, and its encounter
+        speed is used as the impact speed. Tile sets live in the on-disk
+        tile cache (heatmap.py) and are served as static files. With
+        ``build`` set, a missing set is queued as a "heatmap" job (returned
+        as ``job``, shared with an identical queued or running one), or
+        built here if HEATMAP_BUILD_ON_REQUEST is set; ready is false until
+        it exists. ``progress(fraction, message)`` follows a build (used by
+        jobs, which always build here).
+        """
+        try:
+            try:
+                asteroid = self.parse_deflection_inputs(asteroid_name, diameter, velocity, h_value, v_inf_value)
+                cell_deg = float(resolution) if resolution not in (None, "") else DEFAULT_CELL_DEG
+                max_zoom = int(max_zoom) if max_zoom not in (None, "") else DEFAULT_MAX_ZOOM
+            except InputError as e:
+                return json.dumps({"error": str(e)})
+            except (ValueError, TypeError) as e:
+                return json.dumps({"error": f"Invalid numeric input: {str(e)}"})
+            if not (cell_deg >= MIN_CELL_DEG and abs(180 / cell_deg - round(180 / cell_deg)) < 1e-9):
+                return json.dumps({"error": f"resolution must divide 180 degrees and be at least {MIN_CELL_DEG}"})
+            if not (0 <= max_zoom <= MAX_ZOOM_LIMIT):
+                return json.dumps({"error": f"max_zoom must be between 0 and {MAX_ZOOM_LIMIT}"})
+
+            diameter_m = asteroid["diameter_m"]
+            velocity_ms = asteroid["v_inf_kms"] * 1000
+            key, manifest = find_heatmap(diameter_m, velocity_ms, cell_deg, max_zoom)
+            if manifest is None and build and heatmap_build_on_request:
+                with metrics.stage("heatmap", "build"):
+                    manifest = build_heatmap(
+                        diameter_m, velocity_ms, cell_deg, max_zoom, workers=heatmap_workers, progress=progress
+                    )
+            elif manifest is None and build:
+                params = {
+                    "asteroid_name": asteroid_name, "diameter": diameter, "velocity": velocity, "h_value": h_value,
+                    "v_inf_value": v_inf_value, "resolution": resolution, "max_zoom": max_zoom
+                }
+                try:
+                    job = self._heatmap_job({name: value for name, value in params.items() if value is not None})
+                except JobError as e:
+                    return json.dumps({"error": str(e)})
+                return json.dumps({"asteroid": asteroid, "key": key, "ready": False, "job": job, "status": "success"})
+            if manifest is None:
+                return json.dumps({"asteroid": asteroid, "key": key, "ready": False, "status": "success"})
+            return json.dumps({
+                "asteroid": asteroid,
+                **manifest,
+                "ready": True,
+                "tile_urls": {
+                    layer: f"/heatmaps/{manifest['key']}/{layer}/{{z}}/{{x}}/{{y}}.png"
+                    for layer in manifest["layers"]
+                },
+                "status": "success"
+            })
+
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    def _heatmap_job(self, params):
+        """Queue a heatmap build, or return the queued or running job with the same params."""
+        manager = get_job_manager()
+        for state in (QUEUED, RUNNING):
+            for job in manager.store.list(state, job_max_queued):
+                if job["kind"] == "heatmap" and job["params"] == params:
+                    return job
+        return manager.submit("heatmap", params)
+
+    def submit_job(self, kind=None, params=None, priority=None, timeout_s=None):
+        """
+        Queue a long-running computation and return its job record at once.
+
+        ``kind`` picks the Api method (see jobs.JOB_KINDS) and ``params`` are
+        its inputs. Jobs run on the bounded job process pool in their
+        priority lane ("interactive" or "batch", by default the kind's) and
+        are stopped after ``timeout_s``. Poll get_job, follow
+        stream_job_events or fetch get_job_result once it has finished.
+        """
+        try:
+            try:
+                job = get_job_manager().submit(kind, params, priority, timeout_s)
+            except JobError as e:
+                return json.dumps({"error": str(e)})
+            except (ValueError, TypeError) as e:
+                return json.dumps({"error": f"Invalid numeric input: {str(e)}"})
+            return json.dumps({"job": job, "status": "success"})
+
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    def get_job(self, job_id):
+        """Job record: state, progress (0-1), message, error and timestamps."""
+        try:
+            job = get_job_manager().store.get(job_id)
+            if job is None:
+                return json.dumps({"error": f"Unknown job {job_id}"})
+            return json.dumps({"job": job, "status": "success"})
+
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    def list_jobs(self, state=None, limit=None):
+        """Most recent jobs first, optionally only those in one state."""
+        try:
+            try:
+                limit = int(limit) if limit not in (None, "") else 50
+            except (ValueError, TypeError) as e:
+                return json.dumps({"error": f"Invalid numeric input: {str(e)}"})
+            if not (1 <= limit <= 500):
+                return json.dumps({"error": "limit must be between 1 and 500"})
+            states = ("queued", "running") + FINISHED_STATES
+            if state not in (None, "") and state not in states:
+                return json.dumps({"error": f"state must be one of: {', '.join(states)}"})
+            jobs = get_job_manager().store.list(state or None, limit)
+            return json.dumps({"jobs": jobs, "kinds": list(JOB_KINDS), "status": "success"})
+
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    def get_job_result(self, job_id):
+        """
+        The stored result of a finished job, exactly as the job's Api method
+        returned it (so a failed job's result carries its own error).
+        """
+        try:
+            row = get_job_manager().store.result(job_id)
+            if row is None:
+                return json.dumps({"error": f"Unknown job {job_id}"})
+            state, result = row
+            if result is None:
+                return json.dumps({"error": f"Job {job_id} has no result (state: {state})", "state": state})
+            return bytes(result).decode("utf-8")
+
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    def cancel_job(self, job_id):
+        """Cancel a queued or running job; finished jobs are left as they are."""
+        try:
+            state = get_job_manager().store.cancel(job_id)
+            if state is None:
+                return json.dumps({"error": f"Unknown job {job_id}"})
+            # A running job stops at its supervisor's next check
+            return json.dumps({
+                "job_id": job_id,
+                "state": state,
+                "cancel_requested": state == "running",
+                "status": "success"
+            })
+
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+
+    def stream_job_events(self, job_id):
+        """
+        Server-sent events following a job until it finishes (see
+        jobs.JobEvents), or None when this worker already serves
+        JOB_MAX_EVENT_STREAMS blocking streams.
+        """
+        return open_event_stream(get_job_manager().store, job_id)
+
+
+def _finite_or_none(value):
+    """Convert a NumPy scalar to float, mapping NaN/inf to None for JSON."""
+    value = float(value)
+    return value if math.isfinite(value) else None
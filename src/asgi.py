@@ -0,0 +1,377 @@
+import asyncio
+import functools
+import json
+import os
+import re
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import AsteroidListError, InputError, api_key
+from calculations import full_impact_calculation
+from cache import JsonPayload
+import encoding
+from run import app as flask_app, api_handler
+from upstream import AsyncUpstream
+from jobs import JobEvents, SSE_POLL_S, get_job_manager
+import metrics
+
+JOB_EVENTS_PATH = re.compile(r"^/api/jobs/([^/]+)/events$")
+
+
+class AsyncApi():
+    """
+    asyncio counterpart of Api for the two upstream-bound routes.
+
+    Upstream calls go through one pooled AsyncUpstream client per event loop.
+    Parsing, caching and the physics are shared with the synchronous Api.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self.upstream = None
+
+    def _client(self):
+        # Must be called from the event loop the client will live on
+        if self.upstream is None:
+            self.upstream = AsyncUpstream()
+        return self.upstream
+
+    async def aclose(self):
+        if self.upstream is not None:
+            await self.upstream.aclose()
+            self.upstream = None
+
+    async def _fetch_asteroid_list(self):
+        status_code, data = await self._client().fetch_cad()
+        if status_code != 200:
+            raise AsteroidListError(f"Failed to fetch asteroid list: {status_code}")
+        asteroid_info = self.api.parse_asteroid_list(data)
+        return JsonPayload(json.dumps(asteroid_info), data=asteroid_info)
+
+    async def get_asteroid_list_payload(self):
+        """
+        Cached asteroid list; a miss is fetched with the async client.
+
+        The shared TTL cache keeps its singleflight guarantee, so concurrent
+        requests from both the async and the sync path share one fetch.
+        """
+        loop = asyncio.get_running_loop()
+
+        def loader():
+            return asyncio.run_coroutine_threadsafe(self._fetch_asteroid_list(), loop).result()
+
+        return await loop.run_in_executor(None, self.api.get_asteroid_list_payload, loader)
+
+    async def check_land_or_water(self, lat, lon):
+        if self.api.land_mask is not None:
+            result = self.api.land_mask.check(lat, lon)
+            if not result.get("coastal") or not api_key:
+                return result
+            # Same coastal fallback as Api.check_land_or_water
+            try:
+                remote = await self._check_land_or_water_stored(lat, lon)
+            except Exception as e:
+                print(f"Warning: Remote geocoder failed for a coastal point: {str(e)}")
+                return result
+            return remote if "is_ocean" in remote else result
+        if not api_key:
+            return self.api.check_land_or_water_remote(lat, lon, api_key)
+        return await self._check_land_or_water_stored(lat, lon)
+
+    async def _check_land_or_water_stored(self, lat, lon):
+        cached = self.api.get_stored_geocode(lat, lon)
+        if cached is not None:
+            return cached
+        status_code, data = await self._client().geocode(lat, lon, api_key)
+        result = self.api.parse_geocode_response(status_code, data)
+        self.api.store_geocode(lat, lon, result)
+        return result
+
+    async def _is_ocean(self, lat, lon):
+        """(is_ocean, geocoded); geocoded is False when the status is a fallback."""
+        try:
+            with metrics.stage("run_simulation", "geocode"):
+                location_status = await self.check_land_or_water(lat, lon)
+            return location_status.get("is_ocean", False), "error" not in location_status
+        except Exception as e:
+            print(f"Warning: Could not determine land/water status: {str(e)}")
+            return False, False  # Default to land if we can't determine
+
+    async def run_simulation(self, data):
+        body, _ = await self.run_simulation_cached(data)
+        return body
+
+    async def run_simulation_cached(self, data):
+        """
+        Same result cache as Api.run_simulation_cached; a miss runs the
+        overlapped pipeline on the canonicalized inputs.
+
+        Returns:
+            tuple: (JSON body, "hit", "miss" or "bypass").
+        """
+        args = {name: data.get(name) for name in ("asteroid_name", "diameter", "velocity", "lat", "long", "h_value")}
+        key, canonical = self.api.simulation_cache_key(response_mode=data.get('response_mode'), **args)
+        if key is None:
+            body, _ = await self._run_simulation(data)
+            return body, "bypass"
+        body = self.api.get_cached_simulation(key)
+        if body is not None:
+            return body, "hit"
+        body, cacheable = await self._run_simulation({**data, **canonical})
+        if cacheable:
+            self.api.store_simulation(key, body)
+        return body, "miss"
+
+    async def _run_simulation(self, data):
+        """
+        Same contract as Api._run_simulation, with geocoding overlapped.
+
+        Land/ocean only changes the tsunami term, so the physics and map run
+        in a worker thread while the geocode is in flight; the ocean variant
+        of the (microsecond) physics, and the bathymetry tsunami estimate,
+        are computed only if needed.
+        """
+        try:
+            response_mode = data.get('response_mode')
+            if response_mode not in (None, "", "html", "geometry"):
+                return json.dumps({"error": "Invalid response_mode. Use 'html' or 'geometry'."}), False
+
+            try:
+                with metrics.stage("run_simulation", "validate"):
+                    inputs = self.api.parse_impact_inputs(
+                        data.get('asteroid_name'),
+                        data.get('diameter'),
+                        data.get('velocity'),
+                        data.get('lat'),
+                        data.get('long'),
+                        data.get('h_value')
+                    )
+            except InputError as e:
+                return json.dumps({"error": str(e)}), False
+            lat = inputs["lat"]
+            long = inputs["long"]
+
+            geocode = asyncio.ensure_future(self._is_ocean(lat, long))
+
+            def compute():
+                with metrics.stage("run_simulation", "physics"):
+                    impact_results = full_impact_calculation(
+                        diameter_m=inputs["diameter_m"],
+                        velocity_ms=inputs["velocity_ms"],
+                        is_ocean=False
+                    )
+                with metrics.stage("run_simulation", "map_" + (response_mode or "html")):
+                    map_fields = self.api.build_map_fields(lat, long, impact_results, response_mode)
+                with metrics.stage("run_simulation", "exposure"):
+                    map_fields.update(self.api.build_exposure_fields(lat, long, impact_results))
+                return impact_results, map_fields
+
+            try:
+                loop = asyncio.get_running_loop()
+                try:
+                    impact_results, map_fields = await loop.run_in_executor(None, compute)
+                except Exception:
+                    geocode.cancel()
+                    raise
+                is_ocean, geocoded = await geocode
+                if is_ocean:
+                    impact_results = full_impact_calculation(
+                        diameter_m=inputs["diameter_m"],
+                        velocity_ms=inputs["velocity_ms"],
+                        is_ocean=True,
+                        ocean_depth_m=self.api.ocean_depth_at(lat, long)
+                    )
+
+                    def tsunami():
+                        with metrics.stage("run_simulation", "tsunami"):
+                            return self.api.build_tsunami_fields(lat, long, impact_results)
+
+                    map_fields.update(await loop.run_in_executor(None, tsunami))
+
+                final_results = {
+                    **impact_results,
+                    **map_fields,
+                    "is_ocean": is_ocean,
+                    "status": "success"
+                }
+                return json.dumps(final_results), geocoded
+
+            except Exception as e:
+                return json.dumps({"error": f"Error in impact calculation: {str(e)}"}), False
+
+        except Exception as e:
+            return json.dumps({"error": str(e)}), False
+
+
+class AsgiApp():
+    """
+    ASGI entry point: upstream-bound API routes are served natively async,
+    everything else (static files, the other API routes) by the Flask app.
+    """
+
+    def __init__(self, wsgi_app, api):
+        self.pipeline = AsyncApi(api)
+        self.fallback = WsgiToAsgi(wsgi_app)
+        self.routes = {
+            ("GET", "/api/get_asteroid_list"): self.get_asteroid_list,
+            ("POST", "/api/run_simulation"): self.run_simulation,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        handler = None
+        route = scope.get("path")
+        if scope["type"] == "http":
+            handler = self.routes.get((scope["method"], scope["path"]))
+            match = JOB_EVENTS_PATH.match(scope["path"]) if scope["method"] == "GET" else None
+            if match is not None:
+                # Served here so a subscriber costs no thread for the job's lifetime
+                handler = functools.partial(self.job_events, job_id=match.group(1))
+                route = "/api/jobs/<job_id>/events"
+        if handler is None:
+            await self.fallback(scope, receive, send)
+            return
+
+        # Flask's request hooks don't see the native routes; record them here
+        start = time.perf_counter()
+        sent = {"status": 500, "bytes": 0}
+
+        async def send_and_record(message):
+            if message["type"] == "http.response.start":
+                sent["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                sent["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await handler(scope, receive, send_and_record)
+        finally:
+            metrics.request_seconds.observe(
+                time.perf_counter() - start,
+                route=route,
+                method=scope["method"],
+                status=sent["status"]
+            )
+            metrics.response_bytes.observe(sent["bytes"], route=route)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.pipeline.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def get_asteroid_list(self, scope, receive, send):
+        payload = await self.pipeline.get_asteroid_list_payload()
+        headers = {
+            "Content-Type": "application/json",
+            "ETag": payload.etag,
+            "Cache-Control": "no-cache"
+        }
+        if_none_match = _header(scope, b"if-none-match")
+        if if_none_match and payload.etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            await _respond(send, 304, b"", headers)
+            return
+        await _respond(send, 200, *_negotiate(scope, payload.body, headers, payload.variants))
+
+    async def run_simulation(self, scope, receive, send):
+        body = await _read_body(receive)
+        try:
+            data = json.loads(body or b"null")
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            await _respond(send, 400, json.dumps({"error": "Request body must be a JSON object"}).encode("utf-8"),
+                           {"Content-Type": "application/json"})
+            return
+        result, cache_status = await self.pipeline.run_simulation_cached(data)
+        await _respond(send, 200, *_negotiate(scope, result.encode("utf-8"),
+                                              {"Content-Type": "application/json", "X-Cache": cache_status.upper()}))
+
+    async def job_events(self, scope, receive, send, job_id):
+        loop = asyncio.get_running_loop()
+        events = JobEvents(get_job_manager().store, job_id)
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"access-control-allow-origin", b"*"),
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no")
+            ]})
+            await send({"type": "http.response.body", "body": JobEvents.RETRY, "more_body": True})
+            while not disconnected.is_set():
+                message, finished = await loop.run_in_executor(None, events.poll)
+                if message is not None:
+                    await send({"type": "http.response.body", "body": message, "more_body": True})
+                if finished:
+                    break
+                try:
+                    await asyncio.wait_for(disconnected.wait(), SSE_POLL_S)
+                except asyncio.TimeoutError:
+                    pass
+            if not disconnected.is_set():
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            watcher.cancel()
+
+
+def _header(scope, name):
+    for key, value in scope.get("headers", []):
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _negotiate(scope, body, headers, variants=None):
+    # Same content negotiation as run.negotiate_encoding
+    encoded, extra = encoding.negotiate(body, _header(scope, b"accept"), _header(scope, b"accept-encoding"), variants)
+    headers = {**headers, **extra}
+    if encoded is not body and "ETag" in headers:
+        headers["ETag"] = encoding.weak_etag(headers["ETag"])
+    return encoded, headers
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _respond(send, status, body, headers):
+    # Match flask_cors' default policy on the natively served routes
+    raw_headers = [(b"access-control-allow-origin", b"*")]
+    raw_headers += [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+    raw_headers.append((b"content-length", str(len(body)).encode("latin-1")))
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+app = AsgiApp(flask_app, api_handler)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(
+        app,
+        host=os.getenv("HOST", "127.0.0.1"),
+        port=int(os.getenv("PORT", "5000")),
+        timeout_keep_alive=int(os.getenv("KEEPALIVE_TIMEOUT", "5"))
+    )
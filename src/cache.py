@@ -0,0 +1,242 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheEntry():
+    """A cached value together with the time it was stored."""
+
+    def __init__(self, value, stored_at):
+        self.value = value
+        self.stored_at = stored_at
+
+    def age(self, now=None):
+        return (now if now is not None else time.monotonic()) - self.stored_at
+
+
+class TTLCache():
+    """
+    Bounded TTL cache with stale-while-revalidate and singleflight loading.
+
+    - Entries younger than ``ttl`` are served as-is.
+    - Entries older than ``ttl`` but within ``ttl + stale_ttl`` are served
+      immediately while one background thread refreshes them.
+    - Missing or fully expired entries are loaded synchronously; concurrent
+      callers for the same key wait on the single in-flight load instead of
+      starting their own.
+
+    Args:
+        ttl (float): Seconds an entry is considered fresh.
+        stale_ttl (float): Extra seconds a stale entry may still be served.
+        maxsize (int): Maximum number of keys kept (least recently used go first).
+    """
+
+    def __init__(self, ttl, stale_ttl=0, maxsize=128):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key if it is still servable, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.age() >= self.ttl + self.stale_ttl:
+                return None
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def invalidate(self, key=None):
+        """Drop one key, or every key when called without arguments."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def get_or_load(self, key, loader):
+        """
+        Return the value for key, calling loader() at most once concurrently.
+
+        Args:
+            key (hashable): Cache key.
+            loader (callable): Zero-argument function producing the value.
+                Exceptions are propagated to every waiting caller and nothing
+                is cached, unless a stale value can be served instead.
+
+        Returns:
+            tuple: (value, state) where state is "fresh", "stale" or "miss".
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = entry.age()
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    return entry.value, "fresh"
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    if key not in self._inflight:
+                        self._inflight[key] = _Flight()
+                        threading.Thread(
+                            target=self._load, args=(key, loader), daemon=True
+                        ).start()
+                    return entry.value, "stale"
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if leader:
+            self._load(key, loader)
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value, "miss"
+
+    def _load(self, key, loader):
+        flight = self._inflight[key]
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+        with self._lock:
+            if flight.error is None:
+                self._store(key, flight.value)
+            self._inflight.pop(key, None)
+        flight.done.set()
+
+    def _store(self, key, value):
+        self._entries[key] = CacheEntry(value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class _Flight():
+    """State shared by every caller waiting on the same upstream load."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class JsonPayload():
+    """
+    Pre-serialized JSON response body with a strong ETag.
+
+    ``data`` optionally keeps the decoded object so callers that need the
+    values don't have to parse the body again. ``variants`` memoizes the
+    compressed / MessagePack forms of the body (see encoding.negotiate).
+    """
+
+    def __init__(self, body, data=None):
+        self.data = data
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+        self.variants = {}
+
+    def text(self):
+        return self.body.decode("utf-8")
+
+
+class LRUCache():
+    """
+    Thread-safe LRU cache bounded by the total size of its values.
+
+    Args:
+        max_bytes (int): Budget for the summed size of all cached values.
+        sizeof (callable): Returns the size of a value in bytes. Defaults to
+            len(), which suits str/bytes values.
+        max_entries (int): Optional cap on the number of entries.
+        ttl (float): Optional lifetime of an entry in seconds; expired
+            entries count as misses and are dropped when looked up.
+    """
+
+    def __init__(self, max_bytes, sizeof=len, max_entries=None, ttl=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sizeof = sizeof
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            if item[2] is not None and item[2] <= time.monotonic():
+                del self._entries[key]
+                self.current_bytes -= item[1]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            # Never let one oversized value flush the whole cache
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._entries[key] = (value, size, expires_at)
+            self.current_bytes += size
+            while self._entries and (
+                self.current_bytes > self.max_bytes
+                or (self.max_entries is not None and len(self._entries) > self.max_entries)
+            ):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def __len__(self):
+        return len(self._entries)
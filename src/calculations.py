@@ -1,5 +1,10 @@
 import math
 
+import numpy as np
+
+# Ocean depth assumed for tsunami heights when no bathymetry is available
+DEFAULT_OCEAN_DEPTH_M = 4000
+
 def calculate_mass_and_energy(actual_diameter_m, actual_velocity_ms):
     """
     Calculate the mass and kinetic energy of the asteroid.
@@ -35,7 +40,8 @@ def calculate_mass_and_energy(actual_diameter_m, actual_velocity_ms):
     }
 
 
-def calculate_impact_effects(kinetic_energy_joules, impact_density, is_ocean=False):
+def calculate_impact_effects(kinetic_energy_joules, impact_density, is_ocean=False,
+                             ocean_depth_m=DEFAULT_OCEAN_DEPTH_M):
     """
     Calculate asteroid impact effects.
 
@@ -43,6 +49,7 @@ def calculate_impact_effects(kinetic_energy_joules, impact_density, is_ocean=Fal
         kinetic_energy_joules (float): Impact energy in joules.
         impact_density (float): Density of impact site (kg/m³).
         is_ocean (bool): True if the impact is in an ocean.
+        ocean_depth_m (float): Water depth at the impact point (see tsunami.py).
 
     Returns:
         dict: Dictionary containing crater size, depth, earthquake magnitude, etc.
@@ -61,7 +68,6 @@ def calculate_impact_effects(kinetic_energy_joules, impact_density, is_ocean=Fal
     # Tsunami height if impact occurs in the ocean
     tsunami_height_m = None
     if is_ocean:
-        ocean_depth_m = 4000
         tsunami_height_m = 0.8 * math.sqrt(kinetic_energy_joules) / (ocean_depth_m ** 0.75)
 
     # Earthquake magnitude (Richter scale approximation)
@@ -132,7 +138,8 @@ def calculate_damage_radii(energy_megatons):
         "window_breakage_km": window_breakage,
         "light_damage_km": window_breakage  # alias
     }
-def full_impact_calculation(diameter_m, velocity_ms, is_ocean=False, impact_density=2700):
+def full_impact_calculation(diameter_m, velocity_ms, is_ocean=False, impact_density=2700,
+                            ocean_depth_m=DEFAULT_OCEAN_DEPTH_M):
     """
     Perform full asteroid impact calculations.
     """
@@ -143,7 +150,8 @@ def full_impact_calculation(diameter_m, velocity_ms, is_ocean=False, impact_dens
     impact_effects = calculate_impact_effects(
         mass_energy["energy_joules"],
         impact_density,
-        is_ocean
+        is_ocean,
+        ocean_depth_m
     )
 
     # Damage radii
@@ -156,4 +164,113 @@ def full_impact_calculation(diameter_m, velocity_ms, is_ocean=False, impact_dens
         "damage_radii_km": damage_radii
     }
 
-    return results
\ No newline at end of file
+    return results
+
+
+# Column order of the batch result; mirrors the keys of full_impact_calculation
+BATCH_COLUMNS = (
+    "diameter_m",
+    "velocity_ms",
+    "mass_kg",
+    "energy_joules",
+    "density_kg_m3",
+    "radius_m",
+    "volume_m3",
+    "megatons_tnt",
+    "crater_diameter_km",
+    "crater_depth_km",
+    "earthquake_magnitude",
+    "tsunami_height_m",
+    "is_ocean_impact",
+    "total_destruction_km",
+    "severe_damage_km",
+    "moderate_damage_km",
+    "window_breakage_km",
+    "light_damage_km",
+)
+
+
+def batch_impact_calculation(diameter_m, velocity_ms, is_ocean=False, impact_density=2700,
+                             density_kg_m3=2600, as_dataframe=False, ocean_depth_m=DEFAULT_OCEAN_DEPTH_M):
+    """
+    Vectorized full_impact_calculation over arrays of impactors.
+
+    Inputs are broadcast against each other, so a scalar velocity can be
+    combined with an array of diameters and so on. Values the scalar path
+    reports as None (tsunami height on land, damage radii for zero energy)
+    are NaN here.
+
+    Args:
+        diameter_m (array-like): Diameters in meters.
+        velocity_ms (array-like): Velocities in m/s.
+        is_ocean (array-like of bool): True where the impact is in an ocean.
+        impact_density (float): Density of impact site (kg/m³), unused by the
+            current model but kept for parity with the scalar path.
+        density_kg_m3 (array-like): Asteroid density (kg/m³). Defaults to the
+            fixed C-type value used by calculate_mass_and_energy.
+        as_dataframe (bool): Return a pandas DataFrame instead of a dict.
+        ocean_depth_m (array-like): Water depth at the impact points.
+
+    Returns:
+        dict or pandas.DataFrame: One flat column per result field.
+    """
+    diameter_m, velocity_ms, is_ocean, density, ocean_depth_m = np.broadcast_arrays(
+        np.asarray(diameter_m, dtype=np.float64),
+        np.asarray(velocity_ms, dtype=np.float64),
+        np.asarray(is_ocean, dtype=bool),
+        np.asarray(density_kg_m3, dtype=np.float64),
+        np.asarray(ocean_depth_m, dtype=np.float64)
+    )
+    diameter_m = diameter_m.ravel()
+    velocity_ms = velocity_ms.ravel()
+    is_ocean = is_ocean.ravel()
+    density = density.ravel()
+    ocean_depth_m = ocean_depth_m.ravel()
+
+    # Mass and energy (same operation order as calculate_mass_and_energy)
+    radius_m = diameter_m / 2
+    volume_m3 = (4 / 3) * math.pi * (radius_m ** 3)
+    mass_kg = density * volume_m3
+    energy_joules = 0.5 * mass_kg * (velocity_ms ** 2)
+
+    # Impact effects (same formulas as calculate_impact_effects)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        megatons_tnt = energy_joules / 4.184e15
+        crater_diameter_km = 1.161 * ((energy_joules / 1e15) ** 0.294)
+        crater_depth_km = 0.2 * crater_diameter_km
+        tsunami_height_m = np.where(
+            is_ocean,
+            0.8 * np.sqrt(energy_joules) / (ocean_depth_m ** 0.75),
+            np.nan
+        )
+        earthquake_magnitude = 0.67 * np.log10(energy_joules) - 5.87
+
+        # Damage radii (same coefficients as calculate_damage_radii)
+        cube_root = np.where(megatons_tnt > 0, megatons_tnt ** (1 / 3), np.nan)
+    window_breakage = 0.34 * cube_root
+
+    columns = {
+        "diameter_m": diameter_m,
+        "velocity_ms": velocity_ms,
+        "mass_kg": mass_kg,
+        "energy_joules": energy_joules,
+        "density_kg_m3": density.copy(),
+        "radius_m": radius_m,
+        "volume_m3": volume_m3,
+        "megatons_tnt": megatons_tnt,
+        "crater_diameter_km": crater_diameter_km,
+        "crater_depth_km": crater_depth_km,
+        "earthquake_magnitude": earthquake_magnitude,
+        "tsunami_height_m": tsunami_height_m,
+        "is_ocean_impact": is_ocean.copy(),
+        "total_destruction_km": 0.042 * cube_root,
+        "severe_damage_km": 0.084 * cube_root,
+        "moderate_damage_km": 0.17 * cube_root,
+        "window_breakage_km": window_breakage,
+        "light_damage_km": window_breakage.copy(),  # alias
+    }
+
+    if as_dataframe:
+        import pandas as pd
+        return pd.DataFrame(columns, columns=list(BATCH_COLUMNS))
+    return columns
@@ -0,0 +1,313 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import time
+
+import numpy as np
+
+from calculations import batch_impact_calculation
+
+DEFAULT_CATALOG_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "catalog"
+)
+DEFAULT_FIXTURE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "cad_fixture.json"
+)
+
+# Same conversion as Api.parse_impact_inputs
+pv = 0.15
+D = 1329
+
+# Snapshot versions kept on disk; older ones are pruned after each ingest
+KEEP_VERSIONS = 3
+
+CATALOG_COLUMNS = (
+    "name",
+    "h",
+    "v_inf_kms",
+    "dist_au",
+    "diameter_m",
+    "energy_joules",
+    "megatons_tnt",
+)
+
+# Precomputed sort orders backing the indexed queries
+INDEX_ARRAYS = (
+    "energy_order",       # row ids by energy, descending
+    "diameter_order",     # row ids by diameter, ascending
+    "diameter_sorted",    # diameter_m[diameter_order]
+    "name_order",         # row ids by normalized name
+    "name_key_sorted",    # normalized names in name_order
+)
+
+
+def normalize_name(name):
+    """Designation key used for prefix search: upper case, no spaces."""
+    return name.replace(" ", "").upper()
+
+
+def extract_columns(data):
+    """
+    Columnar view of a CAD API response.
+
+    Rows without H or v_inf are dropped, as in Api.parse_asteroid_list.
+
+    Returns:
+        dict: One numpy array per entry in CATALOG_COLUMNS.
+    """
+    if "data" not in data or "fields" not in data:
+        raise ValueError("No asteroid data found in CAD response.")
+    fields = data["fields"]
+    des_index = fields.index("des")
+    h_index = fields.index("h")
+    v_inf_index = fields.index("v_inf")
+    dist_index = fields.index("dist") if "dist" in fields else None
+
+    rows = [
+        item for item in data["data"]
+        if item[h_index] not in (None, "") and item[v_inf_index] not in (None, "")
+    ]
+    names = [item[des_index] for item in rows]
+    h = np.array([float(item[h_index]) for item in rows], dtype=np.float64)
+    v_inf_kms = np.array([float(item[v_inf_index]) for item in rows], dtype=np.float64)
+    dist_au = np.array([
+        float(item[dist_index]) if dist_index is not None and item[dist_index] not in (None, "") else np.nan
+        for item in rows
+    ], dtype=np.float64)
+
+    diameter_m = D / math.sqrt(pv) * (10 ** (-0.2 * h)) * 1000
+    batch = batch_impact_calculation(diameter_m, v_inf_kms * 1000)
+    width = max((len(name) for name in names), default=1)
+    return {
+        "name": np.array(names, dtype=f"<U{width}"),
+        "h": h,
+        "v_inf_kms": v_inf_kms,
+        "dist_au": dist_au,
+        "diameter_m": diameter_m,
+        "energy_joules": batch["energy_joules"],
+        "megatons_tnt": batch["megatons_tnt"],
+    }
+
+
+def build_indexes(columns):
+    """Sort orders for the indexed queries; NaN energies sort last."""
+    energy = columns["energy_joules"]
+    energy_order = np.argsort(np.where(np.isnan(energy), -np.inf, -energy), kind="stable")
+    diameter_order = np.argsort(columns["diameter_m"], kind="stable")
+    name_keys = np.array([normalize_name(name) for name in columns["name"].tolist()],
+                         dtype=columns["name"].dtype)
+    name_order = np.argsort(name_keys, kind="stable")
+    return {
+        "energy_order": energy_order,
+        "diameter_order": diameter_order,
+        "diameter_sorted": columns["diameter_m"][diameter_order],
+        "name_order": name_order,
+        "name_key_sorted": name_keys[name_order],
+    }
+
+
+def write_snapshot(data, catalog_dir=DEFAULT_CATALOG_DIR, fetched_at=None, source=None):
+    """
+    Ingest a CAD response into a new versioned snapshot directory.
+
+    Each column and index is a separate .npy file so the server can
+    memory-map them. The CURRENT file is switched to the new version with an
+    atomic rename, so a running reader never sees a half-written snapshot.
+
+    Args:
+        data (dict): Decoded CAD API response.
+        catalog_dir (str): Directory holding all snapshot versions.
+        fetched_at (float): Unix time the data was fetched (default now).
+        source (str): Free-form origin recorded in the manifest.
+
+    Returns:
+        str: Path of the new snapshot directory.
+    """
+    fetched_at = time.time() if fetched_at is None else fetched_at
+    version = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(fetched_at))
+    columns = extract_columns(data)
+    indexes = build_indexes(columns)
+
+    os.makedirs(catalog_dir, exist_ok=True)
+    version_dir = os.path.join(catalog_dir, version)
+    tmp_dir = version_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, array in {**columns, **indexes}.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+    manifest = {
+        "version": version,
+        "fetched_at": fetched_at,
+        "ingested_at": time.time(),
+        "source": source,
+        "signature": data.get("signature"),
+        "rows": int(len(columns["name"])),
+        "columns": list(CATALOG_COLUMNS),
+        "indexes": list(INDEX_ARRAYS),
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.replace(tmp_dir, version_dir)
+
+    pointer_tmp = os.path.join(catalog_dir, "CURRENT.tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(catalog_dir, "CURRENT"))
+    _prune(catalog_dir, keep=KEEP_VERSIONS, current=version)
+    return version_dir
+
+
+def _ingested_at(version_dir):
+    # Older snapshots have no ingested_at; their directory mtime is close enough
+    try:
+        with open(os.path.join(version_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            return json.load(f)["ingested_at"]
+    except (OSError, ValueError, KeyError):
+        return os.path.getmtime(version_dir)
+
+
+def _prune(catalog_dir, keep, current):
+    """
+    Delete all but the ``keep`` most recently ingested versions.
+
+    Versions are named after their fetch time, so a backfilled older dump
+    sorts first by name; ordering by ingest time keeps it, and the version
+    CURRENT points to is never deleted.
+    """
+    versions = sorted(
+        (entry for entry in os.listdir(catalog_dir)
+         if os.path.isdir(os.path.join(catalog_dir, entry)) and not entry.endswith(".tmp")),
+        key=lambda entry: _ingested_at(os.path.join(catalog_dir, entry))
+    )
+    for old in versions[:-keep]:
+        if old != current:
+            shutil.rmtree(os.path.join(catalog_dir, old), ignore_errors=True)
+
+
+class CatalogSnapshot():
+    """
+    Memory-mapped, read-only asteroid catalog with precomputed indexes.
+
+    Row ids index every column; queries return lists of record dicts in
+    the shape of Api.get_asteroid_list entries plus the derived fields.
+    """
+
+    def __init__(self, arrays, manifest, path=None):
+        self.arrays = arrays
+        self.manifest = manifest
+        self.path = path
+        self.version = manifest["version"]
+
+    @classmethod
+    def load(cls, catalog_dir=DEFAULT_CATALOG_DIR, version=None):
+        """
+        Memory-map one snapshot version (default: the one named in CURRENT).
+
+        Raises:
+            FileNotFoundError: If no snapshot has been written yet.
+        """
+        if version is None:
+            with open(os.path.join(catalog_dir, "CURRENT"), "r", encoding="utf-8") as f:
+                version = f.read().strip()
+        path = os.path.join(catalog_dir, version)
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in manifest["columns"] + manifest["indexes"]
+        }
+        return cls(arrays, manifest, path)
+
+    def __len__(self):
+        return self.manifest["rows"]
+
+    def records(self, row_ids):
+        """Record dicts for the given row ids, in order; NaN becomes None."""
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        picked = {name: self.arrays[name][row_ids] for name in CATALOG_COLUMNS}
+        records = []
+        for i in range(len(row_ids)):
+            record = {"name": str(picked["name"][i])}
+            for name in CATALOG_COLUMNS[1:]:
+                value = float(picked[name][i])
+                record[name] = value if math.isfinite(value) else None
+            records.append(record)
+        return records
+
+    def top_by_energy(self, n=10):
+        return self.records(self.arrays["energy_order"][:max(int(n), 0)])
+
+    def diameter_range(self, min_m=None, max_m=None, limit=None):
+        """Objects with min_m <= diameter <= max_m, smallest first."""
+        sorted_d = self.arrays["diameter_sorted"]
+        lo = 0 if min_m is None else int(np.searchsorted(sorted_d, min_m, side="left"))
+        hi = len(sorted_d) if max_m is None else int(np.searchsorted(sorted_d, max_m, side="right"))
+        if limit is not None:
+            hi = min(hi, lo + int(limit))
+        return self.records(self.arrays["diameter_order"][lo:max(hi, lo)])
+
+    def name_prefix(self, prefix, limit=None):
+        """Objects whose designation starts with prefix (case and spaces ignored)."""
+        keys = self.arrays["name_key_sorted"]
+        key = normalize_name(prefix)
+        lo = int(np.searchsorted(keys, key, side="left"))
+        hi = int(np.searchsorted(keys, key + "\U0010ffff", side="left"))
+        if limit is not None:
+            hi = min(hi, lo + int(limit))
+        return self.records(self.arrays["name_order"][lo:max(hi, lo)])
+
+
+_catalog = None
+
+
+def get_catalog(catalog_dir=None):
+    """
+    Return the process-wide snapshot, or None if none has been ingested.
+
+    Call reload_catalog() after ingesting to pick up a new version.
+    """
+    global _catalog
+    if _catalog is None:
+        try:
+            _catalog = CatalogSnapshot.load(catalog_dir or os.getenv("CATALOG_DIR") or DEFAULT_CATALOG_DIR)
+        except FileNotFoundError:
+            return None
+    return _catalog
+
+
+def reload_catalog(catalog_dir=None):
+    global _catalog
+    _catalog = None
+    return get_catalog(catalog_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build and inspect asteroid catalog snapshots.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="build a snapshot from a CAD JSON dump")
+    ingest_parser.add_argument("file", nargs="?", default=DEFAULT_FIXTURE_PATH)
+    subparsers.add_parser("fetch", help="fetch the CAD list from JPL and build a snapshot")
+    subparsers.add_parser("info", help="describe the current snapshot")
+    parser.add_argument("--dir", default=os.getenv("CATALOG_DIR") or DEFAULT_CATALOG_DIR)
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        with open(args.file, "r", encoding="utf-8") as f:
+            cad = json.load(f)
+        path = write_snapshot(cad, args.dir, fetched_at=os.path.getmtime(args.file), source=os.path.abspath(args.file))
+        print(f"Wrote {path}")
+    elif args.command == "fetch":
+        import upstream
+
+        response = upstream.get("jpl", upstream.JPL_CAD_URL, params=upstream.CAD_PARAMS, timeout=upstream.jpl_timeout())
+        response.raise_for_status()
+        path = write_snapshot(response.json(), args.dir, source=upstream.JPL_CAD_URL)
+        print(f"Wrote {path}")
+
+    snapshot = CatalogSnapshot.load(args.dir)
+    print(f"Version {snapshot.version}: {len(snapshot)} objects")
+    for record in snapshot.top_by_energy(5):
+        print(f"  {record['name']:14s} {record['diameter_m']:10.1f} m {record['megatons_tnt']:14.1f} Mt")
@@ -0,0 +1,305 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+# Simplified encounter model
+# --------------------------
+# The asteroid is taken to be on a circular 1 AU heliocentric orbit that
+# crosses Earth's at the node, inclined just enough to give the catalog's
+# v_inf. A kinetic impactor pushes it along-track lead_time before the
+# encounter; the linearized two-body (Hill/Clohessy-Wiltshire) solution gives
+# the resulting along-track and radial offsets at the encounter, which are
+# projected onto the B-plane (the plane through Earth normal to v_inf). Earth
+# is hit if the B-plane miss distance is inside the gravitationally focused
+# capture radius of the geocentric hyperbola.
+
+GM_SUN = 1.32712440018e20       # m^3/s^2
+GM_EARTH = 3.986004418e14       # m^3/s^2
+AU_M = 1.495978707e11
+EARTH_RADIUS_KM = 6371.0
+DAY_S = 86400.0
+
+# Mean motion and speed of the reference (Earth) orbit
+MEAN_MOTION = math.sqrt(GM_SUN / AU_M ** 3)   # rad/s
+EARTH_ORBITAL_SPEED_KMS = math.sqrt(GM_SUN / AU_M) / 1000
+
+# Momentum enhancement measured for DART (Cheng et al. 2023)
+DART_BETA = 3.6
+
+# Bounds of the default feasibility sweep
+DELTA_V_RANGE_MS = (1e-5, 1.0)        # 0.01 mm/s to 1 m/s, log-spaced
+LEAD_TIME_RANGE_DAYS = (1.0, 7300.0)  # a day to 20 years, log-spaced
+DEFAULT_SWEEP_SHAPE = (96, 96)        # (lead times, delta-vs)
+
+
+def b_plane_factor(v_inf_kms):
+    """
+    Fraction of an along-track offset that lies in the B-plane.
+
+    For a 1 AU orbit crossing Earth's at inclination i, v_inf = 2 v_E sin(i/2)
+    and the angle between the asteroid's velocity and v_inf is 90° - i/2.
+    """
+    ratio = np.asarray(v_inf_kms, dtype=np.float64) / (2 * EARTH_ORBITAL_SPEED_KMS)
+    return np.sqrt(np.clip(1 - ratio ** 2, 0.0, 1.0))
+
+
+def capture_radius_km(v_inf_kms):
+    """B-plane radius inside which the hyperbolic approach hits Earth."""
+    v_inf_ms = np.asarray(v_inf_kms, dtype=np.float64) * 1000
+    v_esc_sq = 2 * GM_EARTH / (EARTH_RADIUS_KM * 1000)
+    return EARTH_RADIUS_KM * np.sqrt(1 + v_esc_sq / v_inf_ms ** 2)
+
+
+def perigee_km(b_km, v_inf_kms):
+    """Closest approach distance (from Earth's center) of the hyperbola with impact parameter b."""
+    b_m = np.asarray(b_km, dtype=np.float64) * 1000
+    v_inf_ms = np.asarray(v_inf_kms, dtype=np.float64) * 1000
+    a = GM_EARTH / v_inf_ms ** 2   # semi-major axis magnitude
+    return a * (np.sqrt(1 + (b_m / a) ** 2) - 1) / 1000
+
+
+def deflection_offset_km(delta_v_ms, lead_time_days):
+    """
+    Position offset at encounter from an along-track push lead_time earlier.
+
+    Linearized two-body motion about the 1 AU reference orbit. The along-track
+    term grows as -3 Δv t (the orbital period change), the radial one
+    oscillates with amplitude 4 Δv / n.
+
+    Returns:
+        tuple: (along_track_km, radial_km), broadcast over the inputs.
+    """
+    delta_v_ms = np.asarray(delta_v_ms, dtype=np.float64)
+    nt = MEAN_MOTION * np.asarray(lead_time_days, dtype=np.float64) * DAY_S
+    along = delta_v_ms / MEAN_MOTION * (4 * np.sin(nt) - 3 * nt)
+    radial = 2 * delta_v_ms / MEAN_MOTION * (1 - np.cos(nt))
+    return along / 1000, radial / 1000
+
+
+def miss_distance_km(delta_v_ms, lead_time_days, v_inf_kms, nominal_b_km=0.0):
+    """
+    B-plane miss distance after the deflection.
+
+    nominal_b_km is the undeflected miss distance; the push is assumed to
+    move the asteroid away from Earth's center along the same axis.
+    """
+    along, radial = deflection_offset_km(delta_v_ms, lead_time_days)
+    zeta = nominal_b_km + b_plane_factor(v_inf_kms) * np.abs(along)
+    return np.hypot(zeta, radial)
+
+
+def minimum_delta_v_ms(lead_time_days, v_inf_kms, nominal_b_km=0.0, margin=1.0):
+    """
+    Smallest along-track Δv that clears margin × the capture radius.
+
+    Miss distance is linear in Δv per axis, so this is the positive root of a
+    quadratic; 0 where the nominal trajectory already clears.
+    """
+    along, radial = deflection_offset_km(1.0, lead_time_days)
+    a_coef = b_plane_factor(v_inf_kms) * np.abs(along)
+    target = margin * capture_radius_km(v_inf_kms)
+    qa = a_coef ** 2 + radial ** 2
+    qb = 2 * nominal_b_km * a_coef
+    qc = nominal_b_km ** 2 - target ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        root = (-qb + np.sqrt(qb ** 2 - 4 * qa * qc)) / (2 * qa)
+    return np.where(qc <= 0, root, 0.0)
+
+
+def kinetic_impactor_delta_v(asteroid_mass_kg, impactor_mass_kg, impactor_speed_ms, beta=DART_BETA):
+    """Δv (m/s) given to the asteroid by a kinetic impactor with momentum enhancement beta."""
+    return beta * impactor_mass_kg * impactor_speed_ms / asteroid_mass_kg
+
+
+def assess_deflection(v_inf_kms, delta_v_ms, lead_time_days, nominal_b_km=0.0, margin=1.0):
+    """
+    Outcome of one deflection attempt.
+
+    Returns:
+        dict: Capture radius, miss distance, perigee altitude, whether the
+        asteroid clears margin × the capture radius, and the minimum Δv that
+        would clear it with the same lead time. Distances in km.
+    """
+    capture = float(capture_radius_km(v_inf_kms))
+    miss = float(miss_distance_km(delta_v_ms, lead_time_days, v_inf_kms, nominal_b_km))
+    along, radial = deflection_offset_km(delta_v_ms, lead_time_days)
+    return {
+        "capture_radius_km": capture,
+        "miss_distance_km": miss,
+        "along_track_offset_km": float(along),
+        "radial_offset_km": float(radial),
+        "perigee_altitude_km": float(perigee_km(miss, v_inf_kms)) - EARTH_RADIUS_KM,
+        "miss_earth_radii": miss / EARTH_RADIUS_KM,
+        "clears_earth": miss > margin * capture,
+        "minimum_delta_v_ms": float(minimum_delta_v_ms(lead_time_days, v_inf_kms, nominal_b_km, margin))
+    }
+
+
+def feasibility_grid(v_inf_kms, delta_v_ms=None, lead_time_days=None, nominal_b_km=0.0, margin=1.0,
+                     shape=DEFAULT_SWEEP_SHAPE):
+    """
+    Miss distance over a lead time × Δv grid, in one vectorized pass.
+
+    Args:
+        v_inf_kms (float): Encounter velocity in km/s.
+        delta_v_ms (array): Δv axis in m/s (default log-spaced DELTA_V_RANGE_MS).
+        lead_time_days (array): Lead time axis in days (default log-spaced
+            LEAD_TIME_RANGE_DAYS).
+        shape (tuple): (lead times, delta-vs) for the default axes.
+
+    Returns:
+        dict: The axes, miss_km and clears with one row per lead time, and
+        the minimum Δv per lead time.
+    """
+    if delta_v_ms is None:
+        delta_v_ms = np.geomspace(*DELTA_V_RANGE_MS, shape[1])
+    if lead_time_days is None:
+        lead_time_days = np.geomspace(*LEAD_TIME_RANGE_DAYS, shape[0])
+    delta_v_ms = np.asarray(delta_v_ms, dtype=np.float64)
+    lead_time_days = np.asarray(lead_time_days, dtype=np.float64)
+
+    miss = miss_distance_km(delta_v_ms[np.newaxis, :], lead_time_days[:, np.newaxis], v_inf_kms, nominal_b_km)
+    capture = float(capture_radius_km(v_inf_kms))
+    return {
+        "delta_v_ms": delta_v_ms,
+        "lead_time_days": lead_time_days,
+        "capture_radius_km": capture,
+        "miss_km": miss,
+        "clears": miss > margin * capture,
+        "minimum_delta_v_ms": minimum_delta_v_ms(lead_time_days, v_inf_kms, nominal_b_km, margin)
+    }
+
+
+def propagate_two_body(r, v, mu, dt, steps):
+    """
+    Fixed-step RK4 for many independent two-body trajectories at once.
+
+    Args:
+        r, v (ndarray): (N, 3) positions (m) and velocities (m/s).
+        mu (float): Gravitational parameter of the central body.
+        dt (ndarray): (N,) step size per trajectory, in seconds.
+        steps (int): Number of steps.
+
+    Returns:
+        tuple: Final (r, v).
+    """
+    dt = np.asarray(dt, dtype=np.float64)[:, np.newaxis]
+
+    def accel(pos):
+        dist = np.linalg.norm(pos, axis=1, keepdims=True)
+        return -mu * pos / dist ** 3
+
+    for _ in range(steps):
+        k1r, k1v = v, accel(r)
+        k2r, k2v = v + 0.5 * dt * k1v, accel(r + 0.5 * dt * k1r)
+        k3r, k3v = v + 0.5 * dt * k2v, accel(r + 0.5 * dt * k2r)
+        k4r, k4v = v + dt * k3v, accel(r + dt * k3r)
+        r = r + dt / 6 * (k1r + 2 * k2r + 2 * k3r + k4r)
+        v = v + dt / 6 * (k1v + 2 * k2v + 2 * k3v + k4v)
+    return r, v
+
+
+def integrate_offset_km(delta_v_ms, lead_time_days, steps_per_orbit=1000):
+    """
+    Along-track and radial offsets from numerically integrated heliocentric orbits.
+
+    The deflected and undeflected circular orbits are propagated side by
+    side; used to check deflection_offset_km.
+    """
+    delta_v_ms = np.asarray(delta_v_ms, dtype=np.float64)
+    lead_s = np.asarray(lead_time_days, dtype=np.float64) * DAY_S
+    n = len(delta_v_ms)
+    v_circ = math.sqrt(GM_SUN / AU_M)
+    r0 = np.tile([AU_M, 0.0, 0.0], (2 * n, 1))
+    v0 = np.tile([0.0, v_circ, 0.0], (2 * n, 1))
+    v0[n:, 1] += delta_v_ms
+    period = 2 * math.pi / MEAN_MOTION
+    steps = int(math.ceil(steps_per_orbit * lead_s.max() / period))
+    r, _ = propagate_two_body(r0, v0, GM_SUN, np.concatenate([lead_s, lead_s]) / steps, steps)
+    ref, moved = r[:n], r[n:]
+    radial_dir = ref / np.linalg.norm(ref, axis=1, keepdims=True)
+    along_dir = np.stack([-radial_dir[:, 1], radial_dir[:, 0], np.zeros(n)], axis=1)
+    diff = moved - ref
+    return np.sum(diff * along_dir, axis=1) / 1000, np.sum(diff * radial_dir, axis=1) / 1000
+
+
+def integrate_perigee_km(b_km, v_inf_kms, start_km=500_000.0, eta=0.002, max_steps=20_000):
+    """
+    Closest approach of geocentric flybys, integrated numerically.
+
+    Each trajectory starts start_km out with the energy and angular momentum
+    of the hyperbola (b, v_inf) and is stepped with dt = eta * r / v until it
+    turns outward; used to check perigee_km.
+    """
+    b_m = np.asarray(b_km, dtype=np.float64) * 1000
+    v_inf_ms = np.broadcast_to(np.asarray(v_inf_kms, dtype=np.float64) * 1000, b_m.shape)
+    start_m = start_km * 1000
+    v_start = np.sqrt(v_inf_ms ** 2 + 2 * GM_EARTH / start_m)
+    # Offset chosen so that |r x v| = b v_inf
+    offset = b_m * v_inf_ms / v_start
+    r = np.stack([-np.sqrt(start_m ** 2 - offset ** 2), offset, np.zeros_like(b_m)], axis=1)
+    v = np.stack([v_start, np.zeros_like(b_m), np.zeros_like(b_m)], axis=1)
+    closest = np.linalg.norm(r, axis=1)
+    active = np.ones(len(b_m), dtype=bool)
+    for _ in range(max_steps):
+        if not active.any():
+            break
+        dt = np.where(active, eta * np.linalg.norm(r, axis=1) / np.linalg.norm(v, axis=1), 0.0)
+        r, v = propagate_two_body(r, v, GM_EARTH, dt, 1)
+        closest = np.minimum(closest, np.linalg.norm(r, axis=1))
+        active &= np.sum(r * v, axis=1) < 0
+    return closest / 1000
+
+
+def measure_error(samples=64, seed=0):
+    """
+    Max relative error of the closed forms against the numerical integrators.
+
+    Offset errors are relative to the total offset, since the radial term
+    passes through zero once per orbit.
+
+    Returns:
+        dict: along_track, radial (offsets) and perigee.
+    """
+    rng = np.random.default_rng(seed)
+    delta_v = 10 ** rng.uniform(-4, -1, samples)
+    lead = 10 ** rng.uniform(1, math.log10(3650), samples)
+    along, radial = deflection_offset_km(delta_v, lead)
+    along_num, radial_num = integrate_offset_km(delta_v, lead)
+
+    v_inf = rng.uniform(3, 40, samples)
+    b = capture_radius_km(v_inf) * rng.uniform(0.2, 5, samples)
+    perigee_num = integrate_perigee_km(b, v_inf)
+    total = np.hypot(along, radial)
+    return {
+        "along_track": float(np.max(np.abs(along_num - along) / total)),
+        "radial": float(np.max(np.abs(radial_num - radial) / total)),
+        "perigee": float(np.max(np.abs(perigee_num / perigee_km(b, v_inf) - 1))),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Kinetic-impactor deflection model.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("check", help="compare the closed forms with numerical integration")
+    sweep_parser = subparsers.add_parser("sweep", help="time a feasibility sweep")
+    sweep_parser.add_argument("--v-inf", type=float, default=15.0, help="km/s")
+    sweep_parser.add_argument("--size", type=int, default=DEFAULT_SWEEP_SHAPE[0])
+    args = parser.parse_args()
+    if args.command == "sweep" and args.size < 2:
+        sweep_parser.error("--size must be at least 2")
+
+    if args.command == "check":
+        for name, error in measure_error().items():
+            print(f"  {name:12s} max relative error {error:.2e}")
+    else:
+        start = time.perf_counter()
+        grid = feasibility_grid(args.v_inf, shape=(args.size, args.size))
+        elapsed = time.perf_counter() - start
+        print(f"{args.size}x{args.size} sweep in {elapsed * 1000:.2f} ms, "
+              f"capture radius {grid['capture_radius_km']:.0f} km")
+        step = max(1, args.size // 8)
+        for lead, dv in zip(grid["lead_time_days"][::step], grid["minimum_delta_v_ms"][::step]):
+            print(f"  lead {lead:8.1f} d: minimum Δv {dv * 1000:10.3f} mm/s")
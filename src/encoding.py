@@ -0,0 +1,110 @@
+import gzip
+import json
+import os
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+# Optional codecs: without them the API simply never offers br / msgpack
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MIMETYPE = "application/msgpack"
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, "application/x-msgpack")
+
+# Bodies below this size go out as-is; compression would barely help
+compress_min_bytes = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+gzip_level = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+brotli_quality = int(os.getenv("RESPONSE_BROTLI_QUALITY", "5"))
+
+VARY = "Accept, Accept-Encoding"
+
+
+def content_codings():
+    """Content-Encodings the server can produce, preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_coding(accept_encoding):
+    """
+    Best Content-Encoding for an Accept-Encoding header, or None for identity.
+    """
+    if not accept_encoding:
+        return None
+    accepted = parse_accept_header(accept_encoding)
+    best = accepted.best_match(content_codings() + ("identity",), default="identity")
+    return None if best == "identity" else best
+
+
+def wants_msgpack(accept):
+    """True if the Accept header prefers MessagePack over JSON."""
+    if msgpack is None or not accept:
+        return False
+    accepted = parse_accept_header(accept, MIMEAccept)
+    return accepted.best_match(("application/json",) + MSGPACK_MIMETYPES) in MSGPACK_MIMETYPES
+
+
+def compress(body, coding):
+    if coding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    # mtime=0 keeps the output, and so any ETag derived from it, stable
+    return gzip.compress(body, gzip_level, mtime=0)
+
+
+def negotiate(body, accept=None, accept_encoding=None, variants=None):
+    """
+    Encode a JSON response body the way the client asked for.
+
+    MessagePack (application/msgpack) replaces JSON when the Accept header
+    prefers it; numbers go out as native ints and float64. The result is
+    then gzip- or brotli-compressed when accepted and the body is at least
+    compress_min_bytes long.
+
+    Args:
+        body (bytes): The JSON body.
+        accept (str): Accept request header.
+        accept_encoding (str): Accept-Encoding request header.
+        variants (dict): Optional memo of encoded bodies, for payloads that
+            are served many times (e.g. JsonPayload.variants).
+
+    Returns:
+        tuple: (body, headers) where headers holds the Content-Type and
+        Content-Encoding to set, if they changed, plus Vary.
+    """
+    use_msgpack = wants_msgpack(accept)
+    coding = choose_coding(accept_encoding)
+    if coding is not None and len(body) < compress_min_bytes and not use_msgpack:
+        coding = None
+    headers = {"Vary": VARY}
+    if not use_msgpack and coding is None:
+        return body, headers
+
+    key = (use_msgpack, coding)
+    if variants is not None and key in variants:
+        encoded, coding = variants[key]
+    else:
+        encoded = body
+        if use_msgpack:
+            encoded = msgpack.packb(json.loads(body), use_bin_type=True)
+            if len(encoded) < compress_min_bytes:
+                coding = None
+        if coding is not None:
+            encoded = compress(encoded, coding)
+        if variants is not None:
+            variants[key] = (encoded, coding)
+    if use_msgpack:
+        headers["Content-Type"] = MSGPACK_MIMETYPE
+    if coding is not None:
+        headers["Content-Encoding"] = coding
+    return encoded, headers
+
+
+def weak_etag(etag):
+    """An ETag that stays valid across encodings of the same content (RFC 9110 8.8.1)."""
+    return etag if etag.startswith("W/") else "W/" + etag
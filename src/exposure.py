@@ -0,0 +1,353 @@
+import argparse
+import math
+import os
+import threading
+
+import numpy as np
+
+from geogrid import EARTH_RADIUS_KM, KM_PER_DEGREE, GeoGrid, convert_geotiff as convert_grid, write_grid
+
+# Damage rings, innermost first, as keyed in calculate_damage_radii
+EXPOSURE_ZONES = (
+    ("total_destruction", "total_destruction_km"),
+    ("severe_damage", "severe_damage_km"),
+    ("moderate_damage", "moderate_damage_km"),
+    ("window_breakage", "window_breakage_km"),
+)
+
+# Share of the people in each ring who are killed or injured, as a
+# (low, high) band. Rough figures in line with the overpressure scaling
+# behind the damage radii; they are planning-grade, not predictions.
+CASUALTY_RATES = {
+    "total_destruction": (0.90, 1.00),
+    "severe_damage": (0.50, 0.90),
+    "moderate_damage": (0.10, 0.40),
+    "window_breakage": (0.01, 0.05),
+}
+
+# Upper bound on distance evaluations per query; the raster is block-summed
+# (large rings) or sampled below cell size (small rings) to stay under it
+SAMPLE_BUDGET = 1_000_000
+# Resolution targets: a quarter of the narrowest ring, and at least 200
+# samples across the outermost radius
+SAMPLES_PER_RING_WIDTH = 4
+SAMPLES_PER_RADIUS = 200
+# disc_populations: latitude samples per cell height when the radius is
+# about one cell (fewer for larger radii)
+SUBROWS_PER_CELL = 4
+
+
+class PopulationRaster(GeoGrid):
+    """
+    Memory-mapped population count grid on a regular lat/lon raster.
+
+    Cell values are people per cell (e.g. GPW or WorldPop "population
+    count" products); NaN and negative no-data values count as zero. Row 0
+    is the northern edge. See geogrid.GeoGrid for the arguments.
+    """
+
+    def _read(self, r0, r1, c0, c1):
+        if 0 <= c0 and c1 <= self.cols:
+            window = np.asarray(self.grid[r0:r1, c0:c1], dtype=np.float64)
+        else:
+            # Crosses the antimeridian on a global raster
+            window = np.asarray(self.grid[r0:r1].take(np.arange(c0, c1), axis=1, mode="wrap"), dtype=np.float64)
+        return np.where(window > 0, window, 0.0)
+
+    def ring_populations(self, lat, lon, radii_km):
+        """
+        Population in each ring between consecutive radii around a point.
+
+        Distances are great-circle distances to cell centers. The haversine
+        term separates into a per-row and a per-column factor, so each query
+        is one outer product and one binning pass over a window sized to
+        the outermost ring.
+
+        Args:
+            lat (float): Center latitude.
+            lon (float): Center longitude.
+            radii_km (sequence): Ascending outer radii; ring i covers
+                radii_km[i-1] <= d < radii_km[i] (the first starts at 0).
+
+        Returns:
+            numpy.ndarray: People in each ring.
+        """
+        radii = np.asarray(radii_km, dtype=np.float64)
+        result = np.zeros(len(radii))
+        if len(radii) == 0 or not radii[-1] > 0:
+            return result
+        outer = float(radii[-1])
+
+        (lat_lo, lat_hi, lon_lo, lon_hi), (r0, r1, c0, c1) = self._window(lat, lon, outer)
+        if r1 <= r0 or c1 <= c0:
+            return result
+        n_cells = (r1 - r0) * (c1 - c0)
+
+        widths = np.diff(np.concatenate(([0.0], radii)))
+        widths = widths[widths > 0]
+        target_km = min(widths.min() / SAMPLES_PER_RING_WIDTH, outer / SAMPLES_PER_RADIUS)
+        cell_km = self.cell_deg * KM_PER_DEGREE
+        counts = self._read(r0, r1, c0, c1)
+
+        budget_limited = False
+        if cell_km <= target_km:
+            # Fine raster, wide rings: use cell centers, summing f x f blocks
+            f = max(int(min(target_km / cell_km, math.sqrt(n_cells))), 1)
+            if f > 1:
+                pad_r = -counts.shape[0] % f
+                pad_c = -counts.shape[1] % f
+                counts = np.pad(counts, ((0, pad_r), (0, pad_c)))
+                counts = counts.reshape(counts.shape[0] // f, f, counts.shape[1] // f, f).sum(axis=(1, 3))
+            step = self.cell_deg * f
+            lat_c = self.north - r0 * self.cell_deg - (np.arange(counts.shape[0]) + 0.5) * step
+            lon_c = self.west + c0 * self.cell_deg + (np.arange(counts.shape[1]) + 0.5) * step
+        else:
+            # Coarse raster, narrow rings: sample the circle's bounding box on
+            # a finer grid, each sample carrying its share of the parent cell
+            lat_step = target_km / KM_PER_DEGREE
+            lon_step = lat_step / max(math.cos(math.radians(lat)), 1e-6)
+            n_lat = max(int(math.ceil((lat_hi - lat_lo) / lat_step)), 1)
+            n_lon = max(int(math.ceil((lon_hi - lon_lo) / lon_step)), 1)
+            budget_limited = n_lat * n_lon > SAMPLE_BUDGET
+            if budget_limited:
+                scale = math.sqrt(n_lat * n_lon / SAMPLE_BUDGET)
+                n_lat = max(int(n_lat / scale), 1)
+                n_lon = max(int(n_lon / scale), 1)
+            lat_step = (lat_hi - lat_lo) / n_lat
+            lon_step = (lon_hi - lon_lo) / n_lon
+            lat_c = lat_hi - (np.arange(n_lat) + 0.5) * lat_step
+            lon_c = lon_lo + (np.arange(n_lon) + 0.5) * lon_step
+            rows = np.floor((self.north - lat_c) / self.cell_deg).astype(np.int64) - r0
+            cols = np.floor((lon_c - self.west) / self.cell_deg).astype(np.int64) - c0
+            # Samples past a regional raster's edge carry no population
+            row_ok = (rows >= 0) & (rows < counts.shape[0])
+            col_ok = (cols >= 0) & (cols < counts.shape[1])
+            share = (lat_step * lon_step) / (self.cell_deg * self.cell_deg)
+            counts = counts[
+                np.clip(rows, 0, counts.shape[0] - 1)[:, None],
+                np.clip(cols, 0, counts.shape[1] - 1)[None, :]
+            ] * (share * (row_ok[:, None] & col_ok[None, :]))
+
+        phi0 = math.radians(lat)
+        phi = np.radians(lat_c)
+        row_a = np.sin((phi - phi0) / 2) ** 2
+        row_b = math.cos(phi0) * np.cos(phi)
+        col_c = np.sin(np.radians(lon_c - lon) / 2) ** 2
+        hav = row_a[:, None] + row_b[:, None] * col_c[None, :]
+
+        thresholds = np.sin(np.minimum(radii, math.pi * EARTH_RADIUS_KM) / (2 * EARTH_RADIUS_KM)) ** 2
+        ring = np.searchsorted(thresholds, hav.ravel(), side="right")
+        totals = np.bincount(ring, weights=counts.ravel(), minlength=len(radii) + 1)
+        if budget_limited and len(radii) > 1:
+            # Too coarse for the inner rings: resolve them on their own, smaller window
+            totals[:len(radii) - 1] = self.ring_populations(lat, lon, radii[:-1])
+        return totals[:len(radii)]
+
+    def disc_populations(self, lat, lons, radius_km):
+        """
+        Population within radius_km of each of many points on one parallel.
+
+        The vectorized counterpart of ring_populations for sweeps. Each
+        raster row crossing the disc contributes the span between the
+        disc's edges at that latitude, read from the row's running sum
+        (population taken as uniform within a cell). Discs smaller than a
+        cell get the density of the cell they are in times their area.
+
+        Args:
+            lat (float): Latitude of the points.
+            lons (array-like): Longitudes of the points.
+            radius_km (float): Disc radius.
+
+        Returns:
+            numpy.ndarray: People within the disc around each point.
+        """
+        lons = np.asarray(lons, dtype=np.float64)
+        cell_km = self.cell_deg * KM_PER_DEGREE
+        if not radius_km > 0:
+            return np.zeros(lons.shape)
+        if radius_km < cell_km:
+            rows, cols, inside = self.cell_index(np.full(lons.shape, lat), lons)
+            counts = np.asarray(self.grid[rows, cols], dtype=np.float64)
+            counts = np.where(inside & (counts > 0), counts, 0.0)
+            cell_area = cell_km * cell_km * max(math.cos(math.radians(lat)), 1e-6)
+            return counts * (math.pi * radius_km ** 2 / cell_area)
+
+        _, (r0, r1, _, _) = self._window(lat, 0.0, radius_km)
+        if r1 <= r0:
+            return np.zeros(lons.shape)
+        counts = self._read(r0, r1, 0, self.cols)
+        running = np.concatenate((np.zeros((r1 - r0, 1)), np.cumsum(counts, axis=1)), axis=1)
+
+        # Half-width in longitude of the disc at a few latitudes per row
+        n_sub = max(int(math.ceil(SUBROWS_PER_CELL * cell_km / radius_km)), 1)
+        sub_lat = self.north - (r0 + np.arange(r1 - r0)[:, None] + (np.arange(n_sub) + 0.5) / n_sub) * self.cell_deg
+        phi0 = math.radians(lat)
+        phi = np.radians(sub_lat)
+        delta = min(radius_km / EARTH_RADIUS_KM, math.pi)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cos_half = (math.cos(delta) - math.sin(phi0) * np.sin(phi)) / (math.cos(phi0) * np.cos(phi))
+        half = np.degrees(np.arccos(np.clip(np.nan_to_num(cos_half, nan=-1.0), -1, 1)))
+
+        def running_at(position):
+            # Running sum of each row up to a fractional column, wrapping on global rasters
+            if self.wraps:
+                turns = np.floor(position / self.cols)
+                position = position - turns * self.cols
+            else:
+                turns = 0.0
+                position = np.clip(position, 0, self.cols)
+            col = np.minimum(position.astype(np.int64), self.cols - 1)
+            row = np.arange(r1 - r0)[:, None, None]
+            return turns * running[row, -1] + running[row, col] + (position - col) * counts[row, col]
+
+        start = (lons[None, None, :] - half[:, :, None] - self.west) / self.cell_deg
+        stop = (lons[None, None, :] + half[:, :, None] - self.west) / self.cell_deg
+        return (running_at(stop) - running_at(start)).sum(axis=(0, 1)) / n_sub
+
+    def coarsened(self, cell_deg):
+        """
+        In-memory copy block-summed to about cell_deg, or self if already that coarse.
+
+        Read in bands of rows, so a fine global raster never has to fit in
+        memory as float64.
+        """
+        f = int(cell_deg / self.cell_deg + 1e-9)
+        if f <= 1:
+            return self
+        pad_c = -self.cols % f
+        blocks = []
+        for r0 in range(0, self.rows, f):
+            band = self._read(r0, min(r0 + f, self.rows), 0, self.cols)
+            band = np.pad(band, ((0, 0), (0, pad_c)))
+            blocks.append(band.reshape(band.shape[0], -1, f).sum(axis=(0, 2)))
+        return PopulationRaster(np.array(blocks), self.west, self.north, self.cell_deg * f, self.name)
+
+
+def estimate_exposure(raster, lat, lon, damage_radii_km, casualty_rates=CASUALTY_RATES):
+    """
+    Population and casualty bands in each damage ring of an impact.
+
+    Args:
+        raster (PopulationRaster): Population grid.
+        damage_radii_km (dict): Output of calculate_damage_radii.
+
+    Returns:
+        dict: Per-zone population and casualty bands, plus totals.
+    """
+    zones = _exposure_zones(damage_radii_km)
+    populations = raster.ring_populations(lat, lon, [radius for _, radius in zones])
+    results = []
+    inner = 0.0
+    total = low = high = 0.0
+    for (zone, outer), population in zip(zones, populations):
+        rate_low, rate_high = casualty_rates[zone]
+        results.append({
+            "zone": zone,
+            "inner_km": inner,
+            "outer_km": outer,
+            "population": round(float(population)),
+            "casualties_low": round(float(population) * rate_low),
+            "casualties_high": round(float(population) * rate_high)
+        })
+        total += population
+        low += population * rate_low
+        high += population * rate_high
+        inner = outer
+    return {
+        "source": raster.name,
+        "resolution_deg": raster.cell_deg,
+        "zones": results,
+        "total_population": round(total),
+        "casualties_low": round(low),
+        "casualties_high": round(high)
+    }
+
+
+def exposure_along_parallel(raster, lat, lons, damage_radii_km, casualty_rates=CASUALTY_RATES):
+    """
+    Exposed population and mid-band casualties of impacts at many points on one parallel.
+
+    The vectorized counterpart of estimate_exposure, for sweeps (see
+    PopulationRaster.disc_populations).
+
+    Returns:
+        tuple: (population, casualties) arrays, one value per longitude.
+    """
+    lons = np.asarray(lons, dtype=np.float64)
+    population = np.zeros(lons.shape)
+    casualties = np.zeros(lons.shape)
+    inner = np.zeros(lons.shape)
+    for zone, radius in _exposure_zones(damage_radii_km):
+        outer = raster.disc_populations(lat, lons, radius)
+        rate_low, rate_high = casualty_rates[zone]
+        casualties += np.maximum(outer - inner, 0) * (rate_low + rate_high) / 2
+        population = np.maximum(population, outer)
+        inner = outer
+    return population, casualties
+
+
+def _exposure_zones(damage_radii_km):
+    zones = []
+    for zone, key in EXPOSURE_ZONES:
+        radius = damage_radii_km.get(key)
+        if isinstance(radius, (int, float)) and math.isfinite(radius) and radius > 0:
+            zones.append((zone, float(radius)))
+    # Rings must nest; keep the ordering robust to odd radii
+    zones.sort(key=lambda item: item[1])
+    return zones
+
+
+def write_raster(path, grid, west, north, cell_deg, name=None):
+    """Save a population grid as .npy plus its .json sidecar."""
+    write_grid(path, grid, west, north, cell_deg, name)
+
+
+def convert_geotiff(tif_path, npy_path):
+    """
+    Convert a north-up GeoTIFF population count raster to .npy + .json.
+
+    Needs rasterio, which is only required for this one-off conversion.
+    """
+    convert_grid(tif_path, npy_path, fill=0)
+
+
+_population_raster = None
+_population_raster_lock = threading.Lock()
+
+
+def get_population_raster(path=None):
+    """
+    Return the process-wide raster, or None when POPULATION_RASTER_PATH is unset.
+    """
+    global _population_raster
+    path = path or os.getenv("POPULATION_RASTER_PATH")
+    if not path:
+        return None
+    if _population_raster is None:
+        with _population_raster_lock:
+            if _population_raster is None:
+                _population_raster = PopulationRaster.load(path)
+    return _population_raster
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Prepare population rasters for exposure estimates.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help="convert a GeoTIFF to a memory-mappable .npy grid")
+    convert_parser.add_argument("tif")
+    convert_parser.add_argument("npy")
+    query_parser = subparsers.add_parser("query", help="population within radii of a point")
+    query_parser.add_argument("npy")
+    query_parser.add_argument("lat", type=float)
+    query_parser.add_argument("lon", type=float)
+    query_parser.add_argument("radii_km", type=float, nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        convert_geotiff(args.tif, args.npy)
+        print(f"Wrote {args.npy}")
+    else:
+        population_raster = PopulationRaster.load(args.npy)
+        radii = sorted(args.radii_km)
+        for radius, population in zip(radii, population_raster.ring_populations(args.lat, args.lon, radii)):
+            print(f"  ring to {radius:8.2f} km: {population:14,.0f}")
@@ -0,0 +1,269 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from cache import LRUCache
+
+DEFAULT_STORE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "geocode_cache.sqlite"
+)
+DEFAULT_WARM_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "warm_points.csv"
+)
+
+# Geohash precision 7 is a ~153 m x 153 m cell at the equator: nearby
+# clicks share an answer without smearing land/ocean across coastlines.
+DEFAULT_PRECISION = 7
+DEFAULT_MEMORY_ENTRIES = 100_000
+# Stored answers are {"is_ocean": ...} JSON text, well under this size
+MEMORY_ENTRY_BYTES = 64
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat, lon, precision=DEFAULT_PRECISION):
+    """
+    Encode a coordinate as a geohash string of the given length.
+
+    Args:
+        lat (float): Latitude in degrees.
+        lon (float): Longitude in degrees.
+        precision (int): Number of base32 characters (5 bits each).
+
+    Returns:
+        str: Geohash of the cell containing the point.
+    """
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = value * 2 + 1
+                lon_lo = mid
+            else:
+                value = value * 2
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = value * 2 + 1
+                lat_lo = mid
+            else:
+                value = value * 2
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def cell_size(precision=DEFAULT_PRECISION):
+    """Return the (lat, lon) size in degrees of a geohash cell."""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+class GeocodeStore():
+    """
+    Persistent land/ocean answers keyed on a geohash grid.
+
+    Lookups hit an in-memory LRU first, then a SQLite file in WAL mode, so
+    answers survive restarts and several worker processes can share one
+    file. Only conclusive answers (ones with an ``is_ocean`` key) are stored.
+
+    Args:
+        path (str): SQLite file, created if missing.
+        precision (int): Geohash length used as the cell key.
+        memory_entries (int): Cells kept in the in-memory LRU.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, precision=DEFAULT_PRECISION, memory_entries=DEFAULT_MEMORY_ENTRIES):
+        self.path = path
+        self.precision = precision
+        # Holds the stored JSON text, so len() is the entry's size
+        self.memory = LRUCache(max_bytes=memory_entries * MEMORY_ENTRY_BYTES, max_entries=memory_entries)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS geocode ("
+                " cell TEXT PRIMARY KEY,"
+                " result TEXT NOT NULL,"
+                " stored_at REAL NOT NULL"
+                ")"
+            )
+
+    def _connect(self):
+        # sqlite3 connections must stay on the thread that opened them
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def cell(self, lat, lon):
+        return geohash(lat, lon, self.precision)
+
+    def get(self, lat, lon):
+        """
+        Stored answer for the cell containing (lat, lon), or None.
+
+        Returns:
+            dict: A copy of the stored result, with "source" set to
+            "geocode_cache".
+        """
+        cell = self.cell(lat, lon)
+        text = self.memory.get(cell)
+        if text is None:
+            row = self._connect().execute(
+                "SELECT result FROM geocode WHERE cell = ?", (cell,)
+            ).fetchone()
+            if row is None:
+                return None
+            text = row[0]
+            self.memory.set(cell, text)
+        return {**json.loads(text), "source": "geocode_cache"}
+
+    def put(self, lat, lon, result):
+        """Store a conclusive result for the cell containing (lat, lon)."""
+        if "is_ocean" not in result:
+            return False
+        self.put_many([(self.cell(lat, lon), result)])
+        return True
+
+    def put_many(self, items):
+        """Store (cell, result) pairs in one transaction."""
+        rows = []
+        now = time.time()
+        for cell, result in items:
+            text = json.dumps({"is_ocean": bool(result["is_ocean"])})
+            self.memory.set(cell, text)
+            rows.append((cell, text, now))
+        with self._connect() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO geocode (cell, result, stored_at) VALUES (?, ?, ?)", rows
+            )
+
+    def contains_cell(self, cell):
+        return self._connect().execute(
+            "SELECT 1 FROM geocode WHERE cell = ?", (cell,)
+        ).fetchone() is not None
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+
+    def warm(self, points, resolver, neighbors=0, delay=0.0):
+        """
+        Pre-populate the store around a list of points.
+
+        Args:
+            points (iterable): (lat, lon) pairs.
+            resolver (callable): resolver(lat, lon) -> result dict, e.g. the
+                remote geocoder or LandMask.check.
+            neighbors (int): Also fill this many rings of adjacent cells.
+            delay (float): Seconds to sleep between resolver calls, to stay
+                within an upstream rate limit.
+
+        Returns:
+            dict: Counts of cells "stored", "skipped" (already present) and
+            "failed" (inconclusive or raised).
+        """
+        d_lat, d_lon = cell_size(self.precision)
+        counts = {"stored": 0, "skipped": 0, "failed": 0}
+        seen = set()
+        for lat, lon in points:
+            for i in range(-neighbors, neighbors + 1):
+                for j in range(-neighbors, neighbors + 1):
+                    p_lat = min(max(lat + i * d_lat, -90.0), 90.0)
+                    p_lon = (lon + j * d_lon + 180.0) % 360.0 - 180.0
+                    cell = self.cell(p_lat, p_lon)
+                    if cell in seen:
+                        continue
+                    seen.add(cell)
+                    if self.contains_cell(cell):
+                        counts["skipped"] += 1
+                        continue
+                    try:
+                        result = resolver(p_lat, p_lon)
+                    except Exception as e:
+                        print(f"Warning: Could not resolve {p_lat:.4f}, {p_lon:.4f}: {str(e)}")
+                        result = {}
+                    if "is_ocean" in result:
+                        self.put_many([(cell, result)])
+                        counts["stored"] += 1
+                    else:
+                        counts["failed"] += 1
+                    if delay:
+                        time.sleep(delay)
+        return counts
+
+
+def read_points(path):
+    """Read (lat, lon) pairs from a CSV file with "lat" and "lon" columns."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return [(float(row["lat"]), float(row["lon"])) for row in csv.DictReader(f)]
+
+
+_geocode_store = None
+_geocode_store_lock = threading.Lock()
+
+
+def get_geocode_store(path=None):
+    """Return the process-wide GeocodeStore, opening it on first use."""
+    global _geocode_store
+    if _geocode_store is None:
+        with _geocode_store_lock:
+            if _geocode_store is None:
+                _geocode_store = GeocodeStore(
+                    path or os.getenv("GEOCODE_CACHE_PATH") or DEFAULT_STORE_PATH,
+                    precision=int(os.getenv("GEOCODE_CACHE_PRECISION", DEFAULT_PRECISION)),
+                    memory_entries=int(os.getenv("GEOCODE_CACHE_MEMORY", DEFAULT_MEMORY_ENTRIES))
+                )
+    return _geocode_store
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Manage the persistent geocode store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    warm_parser = subparsers.add_parser("warm", help="pre-populate cells around points from a CSV file")
+    warm_parser.add_argument("file", nargs="?", default=DEFAULT_WARM_FILE)
+    # Only remote (OpenCage) mode reads the store, so that is what to warm it with
+    warm_parser.add_argument("--source", choices=("landmask", "opencage"), default="opencage")
+    warm_parser.add_argument("--neighbors", type=int, default=1, help="rings of adjacent cells to fill")
+    warm_parser.add_argument("--delay", type=float, default=None,
+                             help="seconds between lookups (default 1.0 for opencage, 0 for landmask)")
+    subparsers.add_parser("stats", help="print the number of stored cells")
+    args = parser.parse_args()
+
+    store = get_geocode_store()
+    if args.command == "stats":
+        print(f"{store.path}: {len(store)} cells at precision {store.precision}")
+    else:
+        if args.source == "landmask":
+            from landmask import get_land_mask
+
+            resolver = get_land_mask().check
+        else:
+            from app import Api, api_key
+
+            api = Api()
+            resolver = lambda lat, lon: api.check_land_or_water_remote(lat, lon, api_key)
+        delay = args.delay if args.delay is not None else (1.0 if args.source == "opencage" else 0.0)
+        counts = store.warm(read_points(args.file), resolver, neighbors=args.neighbors, delay=delay)
+        print(f"Warmed {store.path}: {counts}")
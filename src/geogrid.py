@@ -0,0 +1,123 @@
+import json
+import math
+import os
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+class GeoGrid():
+    """
+    Memory-mappable grid on a regular lat/lon raster.
+
+    Row 0 is the northern edge. Stored as a .npy array plus a .json sidecar
+    holding west, north and cell_deg, so the data products in src/data
+    (population, bathymetry) can be memory-mapped at any resolution.
+
+    Args:
+        grid (numpy.ndarray): (rows, cols) cell values.
+        west (float): Longitude of the western edge of column 0.
+        north (float): Latitude of the northern edge of row 0.
+        cell_deg (float): Cell size in degrees (square cells).
+        name (str): Label reported with the results.
+    """
+
+    def __init__(self, grid, west, north, cell_deg, name=None):
+        self.grid = grid
+        self.west = float(west)
+        self.north = float(north)
+        self.cell_deg = float(cell_deg)
+        self.name = name
+        self.rows, self.cols = grid.shape
+        # Global rasters wrap across the antimeridian
+        self.wraps = abs(self.cols * self.cell_deg - 360.0) < 1e-6
+
+    @classmethod
+    def load(cls, path):
+        """
+        Memory-map a .npy grid; its .json sidecar holds west, north and cell_deg.
+        """
+        with open(os.path.splitext(path)[0] + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        grid = np.load(path, mmap_mode="r")
+        return cls(grid, meta["west"], meta["north"], meta["cell_deg"], meta.get("name") or os.path.basename(path))
+
+    def _window(self, lat, lon, radius_km):
+        """
+        Bounding box of a circle, in degrees and as raster index ranges.
+
+        Returns:
+            tuple: ((lat_lo, lat_hi, lon_lo, lon_hi), (r0, r1, c0, c1)).
+            Column indices may run past the raster edge on global rasters.
+        """
+        delta = radius_km / EARTH_RADIUS_KM
+        lat_lo = max(lat - math.degrees(delta), -90.0)
+        lat_hi = min(lat + math.degrees(delta), 90.0)
+        r0 = max(int(math.floor((self.north - lat_hi) / self.cell_deg)), 0)
+        r1 = min(int(math.ceil((self.north - lat_lo) / self.cell_deg)), self.rows)
+
+        ratio = math.sin(delta) / max(math.cos(math.radians(lat)), 1e-12)
+        if lat_hi >= 90 or lat_lo <= -90 or delta >= math.pi / 2 or ratio >= 1:
+            # The circle reaches a pole: every longitude is in range
+            bounds = (lat_lo, lat_hi, self.west, self.west + self.cols * self.cell_deg)
+            return bounds, (r0, r1, 0, self.cols)
+        dlon = math.degrees(math.asin(ratio))
+        lon_lo, lon_hi = lon - dlon, lon + dlon
+        c0 = int(math.floor((lon_lo - self.west) / self.cell_deg))
+        c1 = int(math.ceil((lon_hi - self.west) / self.cell_deg))
+        if not self.wraps:
+            c0, c1 = max(c0, 0), min(c1, self.cols)
+        elif c1 - c0 >= self.cols:
+            c0, c1 = 0, self.cols
+        return (lat_lo, lat_hi, lon_lo, lon_hi), (r0, r1, c0, c1)
+
+    def cell_index(self, lat, lon):
+        """
+        Row and column of the cells holding each point.
+
+        Returns:
+            tuple: (rows, cols, inside) arrays; rows/cols are clipped into
+            the grid and inside marks the points that really fall in it.
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        rows = np.floor((self.north - lat) / self.cell_deg).astype(np.int64)
+        cols = np.floor((lon - self.west) / self.cell_deg).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.rows)
+        if self.wraps:
+            cols %= self.cols
+        else:
+            inside &= (cols >= 0) & (cols < self.cols)
+        return np.clip(rows, 0, self.rows - 1), np.clip(cols, 0, self.cols - 1), inside
+
+    def sample(self, lat, lon):
+        """Nearest-cell values at the given points; NaN outside the grid."""
+        rows, cols, inside = self.cell_index(lat, lon)
+        values = np.asarray(self.grid[rows, cols], dtype=np.float64)
+        return np.where(inside, values, np.nan)
+
+
+def write_grid(path, grid, west, north, cell_deg, name=None, dtype=np.float32):
+    """Save a grid as .npy plus its .json sidecar."""
+    np.save(path, np.asarray(grid, dtype=dtype))
+    with open(os.path.splitext(path)[0] + ".json", "w", encoding="utf-8") as f:
+        json.dump({"west": west, "north": north, "cell_deg": cell_deg, "name": name}, f, indent=2)
+
+
+def convert_geotiff(tif_path, npy_path, fill=0, dtype=np.float32):
+    """
+    Convert a north-up, square-cell GeoTIFF to .npy + .json.
+
+    Needs rasterio, which is only required for this one-off conversion.
+    Masked (no-data) cells are written as ``fill``.
+    """
+    import rasterio
+
+    with rasterio.open(tif_path) as src:
+        transform = src.transform
+        if transform.b != 0 or transform.d != 0 or abs(transform.a + transform.e) > 1e-9:
+            raise ValueError("Only north-up rasters with square cells are supported")
+        grid = src.read(1, masked=True).astype(np.float64).filled(fill)
+        write_grid(npy_path, grid, transform.c, transform.f, transform.a, os.path.basename(tif_path), dtype=dtype)
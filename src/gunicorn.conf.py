@@ -0,0 +1,47 @@
+# Production server settings: gunicorn -c gunicorn.conf.py run:app (from src/)
+# Every setting reads an environment variable; gunicorn CLI flags override them.
+import multiprocessing
+import os
+import tempfile
+
+bind = os.getenv("BIND") or f"{os.getenv('HOST', '127.0.0.1')}:{os.getenv('PORT', '5000')}"
+
+# Pre-fork workers, each with a thread pool. Requests are mostly short
+# NumPy/map work plus upstream waits, which threads overlap well.
+workers = int(os.getenv("WEB_WORKERS", str(multiprocessing.cpu_count())))
+threads = int(os.getenv("WEB_THREADS", "4"))
+worker_class = "gthread"
+
+keepalive = int(os.getenv("KEEPALIVE_TIMEOUT", "5"))
+# Hard limit per request; Monte Carlo runs are the slowest route
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))
+# On reload (SIGHUP) or shutdown (SIGTERM) old workers stop accepting and
+# get this long to finish in-flight requests before they are killed
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "120"))
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("WEB_MAX_REQUESTS_JITTER", "0"))
+
+# Workers import the app themselves so SIGHUP picks up new code
+preload_app = False
+
+accesslog = os.getenv("WEB_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("WEB_LOG_LEVEL", "info")
+
+# One cache file shared by every worker (asteroid list, rendered maps);
+# geocode answers already live in their own shared SQLite store
+os.environ.setdefault(
+    "SHARED_CACHE_PATH", os.path.join(tempfile.gettempdir(), "meteor-madness-shared-cache.sqlite")
+)
+
+
+def on_starting(server):
+    from shared_cache import get_shared_store
+
+    store = get_shared_store()
+    store.purge()
+    server.log.info("Shared cache at %s", store.path)
+
+
+def worker_int(worker):
+    worker.log.info("Worker %s interrupted", worker.pid)
@@ -0,0 +1,431 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from calculations import DEFAULT_OCEAN_DEPTH_M, batch_impact_calculation, full_impact_calculation
+from exposure import exposure_along_parallel, get_population_raster
+from tsunami import get_bathymetry
+
+DEFAULT_HEATMAP_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "heatmaps"
+)
+
+# Bump when the sweep or the rendering changes, so old tile sets are not reused
+HEATMAP_VERSION = 1
+
+TILE_SIZE = 256
+DEFAULT_CELL_DEG = 1.0
+MIN_CELL_DEG = 0.25
+DEFAULT_MAX_ZOOM = 4
+MAX_ZOOM_LIMIT = 6
+# Exposure is averaged over SUBCELLS x SUBCELLS impact points per cell,
+# on the population raster block-summed to that spacing
+SUBCELLS = 2
+# Sweep rows per process-pool task
+ROWS_PER_CHUNK = 4
+
+# Layers drawn from the sweep; the first two need a population raster
+LAYERS = ("casualties", "exposed_population", "tsunami_height_m")
+# Colors are spread over this many decades below the layer maximum
+LOG_DECADES = 4
+# Yellow to dark red; alpha ramps up with the value
+COLOR_STOPS = np.array([
+    (255, 255, 178, 90),
+    (254, 204, 92, 140),
+    (253, 141, 60, 170),
+    (240, 59, 32, 200),
+    (189, 0, 38, 230),
+], dtype=np.float64)
+
+
+def heatmap_key(diameter_m, velocity_ms, cell_deg, max_zoom, sources):
+    """
+    Cache key of a tile set: impactor, sweep grid, zoom and data sources.
+
+    Diameter and velocity are rounded to 6 significant digits so values
+    that differ only in float noise share a tile set.
+    """
+    canonical = {
+        "version": HEATMAP_VERSION,
+        "diameter_m": float(f"{diameter_m:.6g}"),
+        "velocity_ms": float(f"{velocity_ms:.6g}"),
+        "cell_deg": float(cell_deg),
+        "max_zoom": int(max_zoom),
+        "sources": sources
+    }
+    digest = hashlib.sha1(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()
+    return digest[:16], canonical
+
+
+def data_sources():
+    """Names of the configured data sets, which change what a sweep computes."""
+    raster = get_population_raster()
+    bathymetry = get_bathymetry()
+    return {
+        "landmask": os.path.basename(os.getenv("LANDMASK_PATH") or "ne_110m_land.geojson"),
+        "population": raster.name if raster is not None else None,
+        "bathymetry": bathymetry.name if bathymetry is not None else None
+    }
+
+
+_sweep_raster = None
+
+
+def _init_sweep_worker(raster):
+    global _sweep_raster
+    _sweep_raster = raster
+
+
+def _sweep_chunk(args):
+    """Sweep a band of grid rows (worker entry point)."""
+    from landmask import get_land_mask
+
+    row_start, row_stop, cell_deg, diameter_m, velocity_ms, damage_radii_km = args
+    lat = 90 - (np.arange(row_start, row_stop) + 0.5) * cell_deg
+    lon = -180 + (np.arange(int(round(360 / cell_deg))) + 0.5) * cell_deg
+    lats, lons = np.meshgrid(lat, lon, indexing="ij")
+
+    is_ocean = ~get_land_mask().is_land_many(lats, lons).reshape(lats.shape)
+    ocean_depth = np.full(lats.shape, np.nan)
+    bathymetry = get_bathymetry()
+    if bathymetry is not None:
+        elevation = bathymetry.sample(lats, lons)
+        ocean_depth = np.where(elevation < 0, -elevation, np.nan)
+    physics = batch_impact_calculation(
+        diameter_m,
+        velocity_ms,
+        is_ocean,
+        ocean_depth_m=np.where(np.isnan(ocean_depth), DEFAULT_OCEAN_DEPTH_M, ocean_depth)
+    )
+    fields = {
+        "is_ocean": is_ocean,
+        "ocean_depth_m": ocean_depth,
+        "tsunami_height_m": physics["tsunami_height_m"].reshape(lats.shape).astype(np.float64)
+    }
+
+    if _sweep_raster is not None:
+        # Expected exposure of an impact anywhere in the cell, not just at its center
+        step = cell_deg / SUBCELLS
+        sub_lons = -180 + (np.arange(lons.shape[1] * SUBCELLS) + 0.5) * step
+        population = np.zeros((len(lat) * SUBCELLS, len(sub_lons)))
+        casualties = np.zeros_like(population)
+        for i in range(population.shape[0]):
+            sub_lat = 90 - (row_start * SUBCELLS + i + 0.5) * step
+            population[i], casualties[i] = exposure_along_parallel(_sweep_raster, sub_lat, sub_lons, damage_radii_km)
+        shape = (len(lat), SUBCELLS, lons.shape[1], SUBCELLS)
+        fields["exposed_population"] = population.reshape(shape).mean(axis=(1, 3))
+        fields["casualties"] = casualties.reshape(shape).mean(axis=(1, 3))
+    return row_start, fields
+
+
+def sweep(diameter_m, velocity_ms, cell_deg=DEFAULT_CELL_DEG, workers=None, progress=None):
+    """
+    Evaluate one impactor at every cell center of a global lat/lon grid.
+
+    Land/ocean comes from the bundled landmask, water depth from the
+    bathymetry grid and exposure from the population raster when they are
+    configured. The damage radii do not depend on the location, so only
+    the surface-dependent terms and the exposure are evaluated per cell,
+    the exposure one parallel at a time. Bands of ROWS_PER_CHUNK rows are
+    spread over a process pool; workers get the block-summed raster once.
+    ``progress(fraction, message)`` is called as bands complete.
+
+    Returns:
+        dict: (rows, cols) arrays per field, row 0 at the north edge.
+    """
+    rows = int(round(180 / cell_deg))
+    damage_radii_km = full_impact_calculation(diameter_m, velocity_ms)["damage_radii_km"]
+    tasks = [
+        (start, min(start + ROWS_PER_CHUNK, rows), cell_deg, diameter_m, velocity_ms, damage_radii_km)
+        for start in range(0, rows, ROWS_PER_CHUNK)
+    ]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(tasks)))
+
+    raster = get_population_raster()
+    if raster is not None:
+        raster = raster.coarsened(cell_deg / SUBCELLS)
+    parts = []
+
+    def collect(part):
+        parts.append(part)
+        if progress is not None:
+            progress(len(parts) / len(tasks), f"Swept {len(parts)} of {len(tasks)} bands")
+
+    if workers == 1:
+        _init_sweep_worker(raster)
+        try:
+            for task in tasks:
+                collect(_sweep_chunk(task))
+        finally:
+            _init_sweep_worker(None)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep_worker, initargs=(raster,)) as pool:
+            for part in pool.map(_sweep_chunk, tasks):
+                collect(part)
+    parts.sort(key=lambda part: part[0])
+    return {name: np.concatenate([fields[name] for _, fields in parts]) for name in parts[0][1]}
+
+
+def color_scale(values):
+    """Log color range of a layer: LOG_DECADES below its largest finite value."""
+    finite = values[np.isfinite(values) & (values > 0)]
+    if not finite.size:
+        return None
+    vmax = float(finite.max())
+    return {"scale": "log", "vmin": vmax / 10 ** LOG_DECADES, "vmax": vmax}
+
+
+def colorize(values, scale):
+    """RGBA pixels for a value array; zero, NaN and below-range values are transparent."""
+    rgba = np.zeros(values.shape + (4,), dtype=np.uint8)
+    visible = np.isfinite(values) & (values >= scale["vmin"])
+    if not visible.any():
+        return rgba
+    position = np.log10(values[visible] / scale["vmin"]) / math.log10(scale["vmax"] / scale["vmin"])
+    position = np.clip(position, 0, 1) * (len(COLOR_STOPS) - 1)
+    lower = np.minimum(position.astype(np.int64), len(COLOR_STOPS) - 2)
+    weight = (position - lower)[:, np.newaxis]
+    rgba[visible] = np.round(COLOR_STOPS[lower] * (1 - weight) + COLOR_STOPS[lower + 1] * weight)
+    return rgba
+
+
+def encode_png(rgba):
+    """Minimal RGBA PNG encoder, so tiles need nothing beyond NumPy and zlib."""
+    height, width, _ = rgba.shape
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+def tile_lat_lon(z, x, y):
+    """Latitudes of the pixel rows and longitudes of the pixel columns of an XYZ tile."""
+    world = TILE_SIZE * 2 ** z
+    pixels = np.arange(TILE_SIZE) + 0.5
+    lon = (x * TILE_SIZE + pixels) / world * 360 - 180
+    mercator_y = math.pi * (1 - 2 * (y * TILE_SIZE + pixels) / world)
+    lat = np.degrees(np.arctan(np.sinh(mercator_y)))
+    return lat, lon
+
+
+def _render_tiles(args):
+    """Write one column of PNG tiles for every layer (worker entry point).
+
+    Layers arrive as colored sweep grids; tile pixels take the color of the
+    cell they fall in.
+    """
+    z, x, layers, cell_deg, out_dir = args
+    written = 0
+    for y in range(2 ** z):
+        lat, lon = tile_lat_lon(z, x, y)
+        rows = np.clip(((90 - lat) / cell_deg).astype(np.int64), 0, int(round(180 / cell_deg)) - 1)
+        cols = np.clip(((lon + 180) / cell_deg).astype(np.int64), 0, int(round(360 / cell_deg)) - 1)
+        for name, colors in layers.items():
+            rgba = colors[rows][:, cols]
+            if not rgba[..., 3].any():
+                # Fully transparent tiles are left out; clients treat a 404 as empty
+                continue
+            path = os.path.join(out_dir, name, str(z), str(x))
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, f"{y}.png"), "wb") as f:
+                f.write(encode_png(rgba))
+            written += 1
+    return written
+
+
+_build_lock = threading.Lock()
+# Scratch directory of an in-progress build: .<key>.<pid>.tmp
+SCRATCH_NAME = re.compile(r"^\.[0-9a-f]+\.(\d+)\.tmp$")
+
+
+def build_heatmap(diameter_m, velocity_ms, cell_deg=DEFAULT_CELL_DEG, max_zoom=DEFAULT_MAX_ZOOM,
+                  heatmap_dir=None, workers=None, progress=None):
+    """
+    Sweep an impactor over the globe and write its tile pyramid to the cache.
+
+    The tile set goes to <heatmap_dir>/<key>/<layer>/{z}/{x}/{y}.png with a
+    manifest.json next to the layers, and the sweep arrays in sweep.npz.
+    It is built in a scratch directory and renamed into place, so readers
+    never see a partial set. An existing set with the same key is reused.
+    ``progress(fraction, message)``, if given, follows the sweep (first
+    half) and the tile rendering (second half).
+
+    Returns:
+        dict: The manifest.
+    """
+    heatmap_dir = heatmap_dir or get_heatmap_dir()
+    key, canonical = heatmap_key(diameter_m, velocity_ms, cell_deg, max_zoom, data_sources())
+    manifest = load_manifest(key, heatmap_dir)
+    if manifest is not None:
+        return manifest
+    # Builds use every core already; run one at a time per process
+    with _build_lock:
+        manifest = load_manifest(key, heatmap_dir)
+        if manifest is not None:
+            return manifest
+        _remove_stale_scratch(heatmap_dir)
+        return _build(key, canonical, diameter_m, velocity_ms, cell_deg, max_zoom, heatmap_dir, workers, progress)
+
+
+def _remove_stale_scratch(heatmap_dir):
+    """
+    Delete scratch directories left by builds whose process was killed
+    (e.g. a cancelled or timed-out job). Builds are serialized per
+    process, so this process's own scratch directories are stale too.
+    """
+    if not os.path.isdir(heatmap_dir):
+        return
+    for entry in os.listdir(heatmap_dir):
+        match = SCRATCH_NAME.match(entry)
+        if match is None:
+            continue
+        pid = int(match.group(1))
+        if pid != os.getpid() and _pid_alive(pid):
+            continue
+        shutil.rmtree(os.path.join(heatmap_dir, entry), ignore_errors=True)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _build(key, canonical, diameter_m, velocity_ms, cell_deg, max_zoom, heatmap_dir, workers, progress=None):
+    def report(start, end):
+        if progress is None:
+            return None
+        return lambda fraction, message: progress(start + (end - start) * fraction, message)
+
+    start = time.perf_counter()
+    fields = sweep(diameter_m, velocity_ms, cell_deg, workers, report(0.0, 0.5))
+    sweep_s = time.perf_counter() - start
+
+    layers = {}
+    for name in LAYERS:
+        if name in fields:
+            scale = color_scale(fields[name])
+            if scale is not None:
+                layers[name] = (colorize(fields[name], scale), scale)
+
+    scratch = os.path.join(heatmap_dir, f".{key}.{os.getpid()}.tmp")
+    shutil.rmtree(scratch, ignore_errors=True)
+    os.makedirs(scratch)
+    try:
+        colors = {name: rgba for name, (rgba, _) in layers.items()}
+        tasks = [(z, x, colors, cell_deg, scratch) for z in range(max_zoom + 1) for x in range(2 ** z)]
+        workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+        render_progress = report(0.5, 1.0)
+        tiles = 0
+        done = 0
+
+        def collect(count):
+            nonlocal tiles, done
+            tiles += count
+            done += 1
+            if render_progress is not None:
+                render_progress(done / len(tasks), f"Rendered {done} of {len(tasks)} tile columns")
+
+        if workers == 1:
+            for task in tasks:
+                collect(_render_tiles(task))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for count in pool.map(_render_tiles, tasks):
+                    collect(count)
+        np.savez_compressed(os.path.join(scratch, "sweep.npz"), **fields)
+        manifest = {
+            "key": key,
+            **canonical,
+            "layers": {name: scale for name, (_, scale) in layers.items()},
+            "tiles": tiles,
+            "sweep_seconds": round(sweep_s, 2),
+            "build_seconds": round(time.perf_counter() - start, 2),
+            "created_at": time.time()
+        }
+        with open(os.path.join(scratch, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        try:
+            os.replace(scratch, os.path.join(heatmap_dir, key))
+        except OSError:
+            # Another process finished the same tile set first
+            existing = load_manifest(key, heatmap_dir)
+            if existing is None:
+                raise
+            return existing
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return manifest
+
+
+def load_manifest(key, heatmap_dir=None):
+    """Manifest of a finished tile set, or None if it has not been built."""
+    path = os.path.join(heatmap_dir or get_heatmap_dir(), key, "manifest.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def find_heatmap(diameter_m, velocity_ms, cell_deg=DEFAULT_CELL_DEG, max_zoom=DEFAULT_MAX_ZOOM, heatmap_dir=None):
+    """Key of an impactor's tile set, and its manifest if it has been built."""
+    key, _ = heatmap_key(diameter_m, velocity_ms, cell_deg, max_zoom, data_sources())
+    return key, load_manifest(key, heatmap_dir)
+
+
+def get_heatmap_dir():
+    """Tile cache directory (HEATMAP_DIR, default src/data/heatmaps)."""
+    return os.getenv("HEATMAP_DIR") or DEFAULT_HEATMAP_DIR
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build and list impact-risk heatmap tile sets.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="sweep an impactor over the globe and write its tiles")
+    build_parser.add_argument("--diameter", type=float, required=True, help="impactor diameter in meters")
+    build_parser.add_argument("--velocity", type=float, required=True, help="km/s")
+    build_parser.add_argument("--resolution", type=float, default=DEFAULT_CELL_DEG, help="sweep cell size in degrees")
+    build_parser.add_argument("--max-zoom", type=int, default=DEFAULT_MAX_ZOOM)
+    build_parser.add_argument("--workers", type=int, default=None)
+    subparsers.add_parser("list", help="list the cached tile sets")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        result = build_heatmap(args.diameter, args.velocity * 1000, args.resolution, args.max_zoom, workers=args.workers)
+        print(f"{result['key']}: {result['tiles']} tiles, sweep {result['sweep_seconds']} s, "
+              f"total {result['build_seconds']} s")
+        for name, scale in result["layers"].items():
+            print(f"  {name}: {scale['vmin']:.3g} .. {scale['vmax']:.3g}")
+    else:
+        heatmap_dir = get_heatmap_dir()
+        for key in sorted(os.listdir(heatmap_dir)) if os.path.isdir(heatmap_dir) else []:
+            manifest = load_manifest(key, heatmap_dir)
+            if manifest is not None:
+                print(f"{key}  {manifest['diameter_m']:g} m  {manifest['velocity_ms'] / 1000:g} km/s  "
+                      f"{manifest['cell_deg']:g} deg  z0-{manifest['max_zoom']}  {', '.join(manifest['layers'])}")
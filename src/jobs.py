@@ -0,0 +1,692 @@
+import atexit
+import json
+import multiprocessing
+import os
+import random
+import signal
+import sqlite3
+import threading
+import time
+import uuid
+
+DEFAULT_JOB_STORE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "jobs.sqlite"
+)
+
+# Jobs running at once, machine-wide (every web worker shares the store).
+# Batch jobs may not take the last JOB_RESERVED_INTERACTIVE of them, so an
+# interactive job never waits behind a queue of sweeps.
+job_workers = max(1, int(os.getenv("JOB_WORKERS", "2")))
+job_reserved_interactive = min(
+    job_workers - 1, int(os.getenv("JOB_RESERVED_INTERACTIVE", "1" if job_workers > 1 else "0"))
+)
+# Process pools inside one job (Monte Carlo, heatmap sweeps) get this many
+# processes, so all jobs together leave a core for the web workers
+job_processes = int(os.getenv("JOB_PROCESSES_PER_JOB") or max(1, ((os.cpu_count() or 1) - 1) // job_workers))
+# Job processes run at lower CPU priority than the request handlers
+job_nice = int(os.getenv("JOB_NICE", "10"))
+job_default_timeout = float(os.getenv("JOB_DEFAULT_TIMEOUT", "600"))
+job_max_timeout = float(os.getenv("JOB_MAX_TIMEOUT", "3600"))
+job_max_queued = int(os.getenv("JOB_MAX_QUEUED", "200"))
+# Finished jobs and their results are kept this long
+job_retention = float(os.getenv("JOB_RETENTION", str(7 * 86400)))
+# An idle job process is stopped after this long; the next job starts a new one
+job_worker_idle = float(os.getenv("JOB_WORKER_IDLE", "300"))
+# Blocking (WSGI) event streams per web worker; each holds a request thread
+job_max_event_streams = int(os.getenv("JOB_MAX_EVENT_STREAMS", "2"))
+_event_stream_slots = threading.BoundedSemaphore(max(1, job_max_event_streams))
+
+LANES = ("interactive", "batch")
+QUEUED, RUNNING = "queued", "running"
+SUCCEEDED, FAILED, CANCELLED, TIMED_OUT = "succeeded", "failed", "cancelled", "timed_out"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED, TIMED_OUT)
+
+# Supervisor timing: how often a running job's process is checked for
+# messages, cancellation and its time limit, and how often its liveness is
+# recorded. A running job whose heartbeat is older than STALE_AFTER_S lost
+# its process (e.g. the web worker was killed) and is marked failed.
+POLL_S = 0.25
+IDLE_POLL_S = 1.0
+HEARTBEAT_S = 5.0
+STALE_AFTER_S = 30.0
+PROGRESS_WRITE_S = 0.5
+SSE_POLL_S = 0.5
+SSE_KEEPALIVE_S = 15.0
+PURGE_PROBABILITY = 0.01
+
+# Job kinds: the Api method a job runs, the parameters it accepts, its
+# default lane, parameters that are always set, and whether the method
+# reports progress through a ``progress`` callback
+JOB_KINDS = {
+    "simulation": {
+        "method": "run_simulation",
+        "params": ("asteroid_name", "diameter", "velocity", "lat", "long", "h_value", "response_mode"),
+        "lane": "interactive"
+    },
+    "scenarios": {
+        "method": "run_scenarios",
+        "params": ("variants", "base", "response_mode"),
+        "lane": "batch"
+    },
+    "monte_carlo": {
+        "method": "run_monte_carlo",
+        "params": ("asteroid_name", "diameter", "velocity", "lat", "long", "h_value", "trials", "seed"),
+        "lane": "batch",
+        "progress": True
+    },
+    "deflection_sweep": {
+        "method": "deflection_sweep",
+        "params": ("asteroid_name", "diameter", "velocity", "h_value", "v_inf_value", "nominal_miss", "steps"),
+        "lane": "batch"
+    },
+    "heatmap": {
+        "method": "get_heatmap",
+        "params": ("asteroid_name", "diameter", "velocity", "h_value", "v_inf_value", "resolution", "max_zoom"),
+        "fixed": {"build": True},
+        "lane": "batch",
+        "progress": True
+    },
+    "score_catalog": {
+        "method": "score_asteroid_catalog",
+        "params": ("sort", "page", "per_page", "is_ocean", "include_map", "lat", "long"),
+        "lane": "batch"
+    }
+}
+
+_JOB_COLUMNS = (
+    "id, kind, lane, params, timeout_s, state, progress, message, error,"
+    " submitted_at, started_at, finished_at"
+)
+
+
+class JobError(Exception):
+    """A job request was invalid or the queue can't take it."""
+
+
+class JobStore():
+    """
+    Jobs, their progress and their results on a local SQLite file.
+
+    The store is the queue: every web worker process submits to it and
+    claims from it, so the JOB_WORKERS limit holds machine-wide and any
+    worker can answer status, result and cancel requests for any job.
+
+    Args:
+        path (str): SQLite file, created if missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = self._connect()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " id TEXT NOT NULL UNIQUE,"
+            " kind TEXT NOT NULL,"
+            " lane TEXT NOT NULL,"
+            " params TEXT NOT NULL,"
+            " timeout_s REAL NOT NULL,"
+            " state TEXT NOT NULL,"
+            " progress REAL,"
+            " message TEXT,"
+            " error TEXT,"
+            " result BLOB,"
+            " submitted_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL,"
+            " heartbeat_at REAL,"
+            " owner TEXT,"
+            " cancel_requested INTEGER NOT NULL DEFAULT 0"
+            ")"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lane, seq)")
+
+    def _connect(self):
+        # One autocommit connection per thread; sqlite3 objects can't be shared
+        db = getattr(self._local, "db", None)
+        if db is None or getattr(self._local, "pid", None) != os.getpid():
+            db = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def _transaction(self, body):
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            result = body(db)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return result
+
+    def add(self, kind, lane, params, timeout_s, max_queued):
+        """Queue a job and return its id; JobError if max_queued are already waiting."""
+        job_id = uuid.uuid4().hex
+
+        def insert(db):
+            queued = db.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)).fetchone()[0]
+            if queued >= max_queued:
+                raise JobError(f"The job queue is full ({max_queued} jobs waiting); try again later")
+            db.execute(
+                "INSERT INTO jobs (id, kind, lane, params, timeout_s, state, progress, submitted_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, 0, ?)",
+                (job_id, kind, lane, json.dumps(params), timeout_s, QUEUED, time.time())
+            )
+
+        self._transaction(insert)
+        if random.random() < PURGE_PROBABILITY:
+            self.purge(job_retention)
+        return job_id
+
+    def get(self, job_id):
+        row = self._connect().execute(
+            f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return _job_record(row) if row is not None else None
+
+    def list(self, state=None, limit=50):
+        """Most recently submitted jobs first, optionally only those in one state."""
+        where, args = ("WHERE state = ?", (state,)) if state else ("", ())
+        rows = self._connect().execute(
+            f"SELECT {_JOB_COLUMNS} FROM jobs {where} ORDER BY seq DESC LIMIT ?", args + (limit,)
+        ).fetchall()
+        return [_job_record(row) for row in rows]
+
+    def result(self, job_id):
+        """Return (state, result bytes or None), or None for an unknown job."""
+        return self._connect().execute(
+            "SELECT state, result FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+
+    def has_queued(self):
+        return self._connect().execute(
+            "SELECT 1 FROM jobs WHERE state = ? LIMIT 1", (QUEUED,)
+        ).fetchone() is not None
+
+    def claim(self, owner, workers, reserved_interactive):
+        """
+        Move the next runnable job to running and return it, or None.
+
+        Interactive jobs go first, then batch jobs, each oldest first. Nothing
+        is claimed once ``workers`` jobs are running, and batch jobs only while
+        fewer than workers - reserved_interactive batch jobs are running.
+        """
+        def claim_next(db):
+            now = time.time()
+            self._fail_stale(db, now)
+            running = dict(db.execute(
+                "SELECT lane, COUNT(*) FROM jobs WHERE state = ? GROUP BY lane", (RUNNING,)
+            ).fetchall())
+            if sum(running.values()) >= workers:
+                return None
+            lanes = LANES if running.get("batch", 0) < workers - reserved_interactive else ("interactive",)
+            row = db.execute(
+                f"SELECT {_JOB_COLUMNS} FROM jobs WHERE state = ? AND lane IN ({','.join('?' * len(lanes))})"
+                " ORDER BY CASE lane WHEN 'interactive' THEN 0 ELSE 1 END, seq LIMIT 1",
+                (QUEUED,) + lanes
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET state = ?, started_at = ?, heartbeat_at = ?, owner = ?, message = ? WHERE id = ?",
+                (RUNNING, now, now, owner, "Starting", row[0])
+            )
+            job = _job_record(row)
+            job.update(state=RUNNING, started_at=now, message="Starting")
+            return job
+
+        return self._transaction(claim_next)
+
+    def fail_stale(self):
+        self._transaction(lambda db: self._fail_stale(db, time.time()))
+
+    def _fail_stale(self, db, now):
+        db.execute(
+            "UPDATE jobs SET state = ?, error = ?, finished_at = ? WHERE state = ? AND heartbeat_at < ?",
+            (FAILED, "Interrupted: the process running this job stopped", now, RUNNING, now - STALE_AFTER_S)
+        )
+
+    def heartbeat(self, job_id, progress=None, message=None):
+        """Record that a running job is alive; returns True if cancellation was requested."""
+        db = self._connect()
+        if progress is None:
+            db.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+        else:
+            db.execute(
+                "UPDATE jobs SET heartbeat_at = ?, progress = ?, message = ? WHERE id = ?",
+                (time.time(), progress, message, job_id)
+            )
+        return self.cancel_requested(job_id)
+
+    def cancel_requested(self, job_id):
+        row = self._connect().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def cancel(self, job_id):
+        """
+        Cancel a job: a queued one at once, a running one by flagging it for
+        its supervisor. Returns the job's state after the request, or None
+        for an unknown job.
+        """
+        def request_cancel(db):
+            row = db.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row[0] == QUEUED:
+                db.execute(
+                    "UPDATE jobs SET state = ?, finished_at = ?, message = ? WHERE id = ?",
+                    (CANCELLED, time.time(), "Cancelled before it started", job_id)
+                )
+                return CANCELLED
+            if row[0] == RUNNING:
+                db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            return row[0]
+
+        return self._transaction(request_cancel)
+
+    def finish(self, job_id, state, result=None, error=None, message=None):
+        self._connect().execute(
+            "UPDATE jobs SET state = ?, result = ?, error = ?, message = COALESCE(?, message), finished_at = ?,"
+            " progress = CASE WHEN ? = ? THEN 1 ELSE progress END WHERE id = ? AND state = ?",
+            (state, sqlite3.Binary(result) if result is not None else None, error, message, time.time(),
+             state, SUCCEEDED, job_id, RUNNING)
+        )
+
+    def purge(self, retention):
+        self._connect().execute(
+            "DELETE FROM jobs WHERE state IN (?, ?, ?, ?) AND finished_at < ?",
+            FINISHED_STATES + (time.time() - retention,)
+        )
+
+
+def _job_record(row):
+    keys = ("id", "kind", "lane", "params", "timeout_s", "state", "progress", "message", "error",
+            "submitted_at", "started_at", "finished_at")
+    job = dict(zip(keys, row))
+    job["params"] = json.loads(job["params"])
+    job["result_url"] = f"/api/jobs/{job['id']}/result"
+    job["events_url"] = f"/api/jobs/{job['id']}/events"
+    return job
+
+
+def _worker_main(conn, processes):
+    """
+    Job process entry point: run one job at a time until told to stop.
+
+    The process leads its own process group, so a cancelled or timed-out
+    job is stopped together with any process pool it started.
+    """
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+    if job_nice and hasattr(os, "nice"):
+        os.nice(job_nice)
+    import app
+
+    # app may already have been imported with the web settings (spawn
+    # re-imports the parent's __main__), so set the pool sizes directly.
+    # Heatmap jobs build in this process instead of queueing another job.
+    app.monte_carlo_workers = processes
+    app.heatmap_workers = processes
+    app.heatmap_build_on_request = True
+    api = app.Api()
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        kind, params = message
+        spec = JOB_KINDS[kind]
+        args = {**params, **spec.get("fixed", {})}
+        if spec.get("progress"):
+            args["progress"] = lambda fraction, text=None: conn.send(("progress", fraction, text))
+        try:
+            conn.send(("done", getattr(api, spec["method"])(**args)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {str(e)}"))
+
+
+class _JobProcess():
+    """One persistent job process and the pipe to it."""
+
+    def __init__(self):
+        # Spawned, not forked: the web process is multi-threaded
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, job_processes), name="job-worker")
+        self.process.start()
+        child_conn.close()
+        self.idle_since = time.monotonic()
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def stop(self, kill=False):
+        if kill:
+            self._signal(signal.SIGTERM)
+            self.process.join(2.0)
+            if self.process.is_alive():
+                self._signal(signal.SIGKILL)
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(5.0)
+        if self.process.is_alive():
+            self._signal(signal.SIGKILL)
+            self.process.join()
+        self.conn.close()
+
+    def _signal(self, signum):
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(self.process.pid, signum)
+            else:
+                self.process.terminate()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+class JobManager():
+    """
+    Runs queued jobs from a JobStore on supervised job processes.
+
+    Each of the ``workers`` slot threads claims a job from the store, hands
+    it to its own persistent job process and supervises it: progress goes
+    to the store, the time limit and cancellation requests are enforced by
+    killing the process (a new one is started for the next job), and the
+    result is stored when it finishes. Job processes run niced and with
+    JOB_PROCESSES_PER_JOB processes for their own pools, so request
+    handlers keep CPU time while batch jobs fill the rest.
+    """
+
+    def __init__(self, store, workers=None, reserved_interactive=None):
+        self.store = store
+        self.workers = workers or job_workers
+        self.reserved_interactive = job_reserved_interactive if reserved_interactive is None else reserved_interactive
+        self.pid = os.getpid()
+        self._wake = threading.Condition()
+        self._closed = False
+        self._slots = []
+        self._processes = []
+        self._exit_hook = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._slots:
+                return self
+            self.store.fail_stale()
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run_slot, name=f"job-slot-{index}", daemon=True)
+                self._slots.append(thread)
+                thread.start()
+        return self
+
+    def submit(self, kind, params=None, priority=None, timeout_s=None):
+        """
+        Validate and queue a job.
+
+        Args:
+            kind (str): One of JOB_KINDS.
+            params (dict): Arguments for the job's Api method; unknown keys
+                are rejected, values are validated when the job runs.
+            priority (str): "interactive" or "batch"; defaults to the kind's lane.
+            timeout_s (float): Time limit, at most JOB_MAX_TIMEOUT.
+
+        Returns:
+            dict: The job record.
+        """
+        spec = JOB_KINDS.get(kind)
+        if spec is None:
+            raise JobError(f"Unknown job kind {kind!r}. Use one of: {', '.join(JOB_KINDS)}")
+        params = params if params is not None else {}
+        if not isinstance(params, dict):
+            raise JobError("params must be an object")
+        unknown = sorted(set(params) - set(spec["params"]))
+        if unknown:
+            raise JobError(f"Unknown {kind} parameters: {', '.join(unknown)}")
+        lane = priority or spec["lane"]
+        if lane not in LANES:
+            raise JobError(f"priority must be one of: {', '.join(LANES)}")
+        timeout_s = float(timeout_s) if timeout_s not in (None, "") else job_default_timeout
+        if not (0 < timeout_s <= job_max_timeout):
+            raise JobError(f"timeout_s must be between 0 and {job_max_timeout:g}")
+
+        job_id = self.store.add(kind, lane, params, timeout_s, job_max_queued)
+        with self._wake:
+            self._wake.notify_all()
+        return self.store.get(job_id)
+
+    def shutdown(self):
+        self._closed = True
+        with self._wake:
+            self._wake.notify_all()
+        for process in list(self._processes):
+            process.stop()
+
+    def _next_job(self, process):
+        """Wait for a job to claim; returns (job, process), job None once shut down."""
+        owner = f"{os.getpid()}:{threading.current_thread().name}"
+        while not self._closed:
+            if self.store.has_queued():
+                job = self.store.claim(owner, self.workers, self.reserved_interactive)
+                if job is not None:
+                    return job, process
+            if process is not None and time.monotonic() - process.idle_since > job_worker_idle:
+                self._stop_process(process)
+                process = None
+            with self._wake:
+                self._wake.wait(IDLE_POLL_S)
+        return None, process
+
+    def _run_slot(self):
+        process = None
+        while True:
+            job, process = self._next_job(process)
+            if job is None:
+                return
+            if process is None or not process.alive():
+                process = self._start_process()
+            if not self._supervise(job, process):
+                self._stop_process(process, kill=True)
+                process = None
+            else:
+                process.idle_since = time.monotonic()
+            # The finished job may have been the one holding back the queue
+            with self._wake:
+                self._wake.notify_all()
+
+    def _supervise(self, job, process):
+        """Run one job to completion; returns False if its process had to be stopped."""
+        job_id = job["id"]
+        process.conn.send((job["kind"], job["params"]))
+        deadline = time.monotonic() + job["timeout_s"]
+        last_beat = last_check = time.monotonic()
+        progress = None
+        while True:
+            if process.conn.poll(POLL_S):
+                try:
+                    message = process.conn.recv()
+                except (EOFError, OSError):
+                    self.store.finish(job_id, FAILED, error="The job process exited unexpectedly")
+                    return False
+                if message[0] == "progress":
+                    progress = message[1:]
+                elif message[0] == "done":
+                    body = message[1].encode("utf-8") if isinstance(message[1], str) else message[1]
+                    error = _result_error(body)
+                    self.store.finish(job_id, FAILED if error else SUCCEEDED, body, error, "Finished")
+                    return True
+                else:
+                    self.store.finish(job_id, FAILED, error=message[1])
+                    return True
+            now = time.monotonic()
+            if now >= deadline:
+                self.store.finish(job_id, TIMED_OUT, error=f"Time limit of {job['timeout_s']:g} s exceeded")
+                return False
+            if not process.alive():
+                self.store.finish(job_id, FAILED, error="The job process exited unexpectedly")
+                return False
+            # Progress is written at most every PROGRESS_WRITE_S, cancellation
+            # checked every POLL_S, however fast the job reports
+            if now - last_check < POLL_S:
+                continue
+            last_check = now
+            if (progress is not None and now - last_beat >= PROGRESS_WRITE_S) or now - last_beat >= HEARTBEAT_S:
+                cancelled = self.store.heartbeat(job_id, *(progress or ()))
+                last_beat, progress = now, None
+            else:
+                cancelled = self.store.cancel_requested(job_id)
+            if cancelled:
+                self.store.finish(job_id, CANCELLED, message="Cancelled while running")
+                return False
+
+    def _start_process(self):
+        process = _JobProcess()
+        with self._lock:
+            self._processes.append(process)
+            if not self._exit_hook:
+                # Registered after multiprocessing's own exit hook, so it runs
+                # first and that hook doesn't wait on idle job processes
+                atexit.register(self.shutdown)
+                self._exit_hook = True
+        return process
+
+    def _stop_process(self, process, kill=False):
+        with self._lock:
+            if process in self._processes:
+                self._processes.remove(process)
+        process.stop(kill=kill)
+
+
+def _result_error(body):
+    """The top-level "error" of an Api JSON result, or None."""
+    try:
+        result = json.loads(body)
+    except ValueError:
+        return "The job returned an invalid result"
+    return result.get("error") if isinstance(result, dict) else None
+
+
+class JobEvents():
+    """
+    Server-sent events for one job until it finishes.
+
+    A "progress" event carries the job record each time its state,
+    progress or message changes; the final one is a "done" event. Comment
+    lines keep idle connections open. poll() is called every SSE_POLL_S by
+    the blocking stream (job_events) or the asyncio one (asgi.py).
+    """
+
+    RETRY = b"retry: 2000\n\n"
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+        self.last = None
+        self.last_sent = time.monotonic()
+        self.event_id = 0
+
+    def poll(self):
+        """Return (message bytes or None, finished)."""
+        job = self.store.get(self.job_id)
+        if job is None:
+            return _sse("error", {"error": f"Unknown job {self.job_id}"}), True
+        snapshot = (job["state"], job["progress"], job["message"])
+        if snapshot != self.last:
+            self.last = snapshot
+            self.event_id += 1
+            self.last_sent = time.monotonic()
+            finished = job["state"] in FINISHED_STATES
+            return _sse("done" if finished else "progress", job, self.event_id), finished
+        if time.monotonic() - self.last_sent >= SSE_KEEPALIVE_S:
+            self.last_sent = time.monotonic()
+            return b": keep-alive\n\n", False
+        return None, False
+
+
+def job_events(store, job_id):
+    """
+    Blocking JobEvents stream for WSGI servers.
+
+    Yields:
+        bytes: Encoded SSE messages.
+    """
+    events = JobEvents(store, job_id)
+    yield JobEvents.RETRY
+    while True:
+        message, finished = events.poll()
+        if message is not None:
+            yield message
+        if finished:
+            return
+        time.sleep(SSE_POLL_S)
+
+
+class _EventStream():
+    """A job_events iterable holding one event-stream slot until the server closes it."""
+
+    def __init__(self, store, job_id):
+        self._events = job_events(store, job_id)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._events)
+
+    def close(self):
+        if self._events is not None:
+            self._events.close()
+            self._events = None
+            _event_stream_slots.release()
+
+
+def open_event_stream(store, job_id):
+    """
+    Blocking event stream for a job, or None when this process already
+    serves JOB_MAX_EVENT_STREAMS of them.
+
+    Each blocking stream occupies a request thread for as long as the job
+    runs, so they are capped; the asyncio server (asgi.py) serves streams
+    without a thread each and needs no cap.
+    """
+    if not _event_stream_slots.acquire(blocking=False):
+        return None
+    return _EventStream(store, job_id)
+
+
+def _sse(event, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """
+    Return this process's JobManager on the JOB_STORE_PATH store.
+
+    Created and started on first use, and again after a fork, so
+    pre-forked web workers each supervise their own job processes; the
+    store they share keeps the JOB_WORKERS limit for all of them. Job
+    processes are only spawned once a job is claimed.
+    """
+    global _job_manager
+    if _job_manager is None or _job_manager.pid != os.getpid():
+        with _job_manager_lock:
+            if _job_manager is None or _job_manager.pid != os.getpid():
+                path = os.getenv("JOB_STORE_PATH") or DEFAULT_JOB_STORE_PATH
+                _job_manager = JobManager(JobStore(path)).start()
+    return _job_manager
@@ -0,0 +1,125 @@
+import json
+import os
+
+import shapely
+from shapely.geometry import shape, Point
+from shapely.strtree import STRtree
+
+# Natural Earth 1:110m land polygons (public domain), bundled with the app so
+# land/ocean checks never need the network.
+DEFAULT_LANDMASK_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "ne_110m_land.geojson"
+)
+
+# The 1:110m coastline is off by up to ~0.5 degrees (bays, harbours and
+# peninsulas are smoothed away), so answers this close to it are only a
+# guess; callers with a remote geocoder ask it instead (0 disables)
+COASTAL_BUFFER_DEG = float(os.getenv("LANDMASK_COASTAL_DEG", "0.5"))
+
+
+class LandMask():
+    """
+    Offline land/ocean classifier backed by an STRtree over land polygons.
+
+    The dataset is read once; every query afterwards is a tree lookup plus a
+    point-in-polygon test against the (prepared) candidate polygons only.
+    """
+
+    def __init__(self, polygons, coastal_deg=COASTAL_BUFFER_DEG):
+        self.polygons = list(polygons)
+        for polygon in self.polygons:
+            shapely.prepare(polygon)
+        self.tree = STRtree(self.polygons)
+        self.coastal_deg = coastal_deg
+        self.coast_tree = STRtree([polygon.boundary for polygon in self.polygons])
+
+    @classmethod
+    def load(cls, path=DEFAULT_LANDMASK_PATH):
+        """
+        Load land polygons from a GeoJSON FeatureCollection.
+
+        Args:
+            path (str): Path to the GeoJSON file.
+
+        Returns:
+            LandMask: Classifier ready for point queries.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            collection = json.load(f)
+
+        polygons = []
+        for feature in collection.get("features", []):
+            geometry = shape(feature["geometry"])
+            # Split multipolygons so each tree entry has a tight bounding box
+            polygons.extend(getattr(geometry, "geoms", [geometry]))
+        return cls(polygons)
+
+    def is_land(self, lat, lon):
+        """
+        Check whether a single coordinate falls on land.
+
+        Args:
+            lat (float): Latitude in degrees.
+            lon (float): Longitude in degrees.
+
+        Returns:
+            bool: True for land, False for ocean.
+        """
+        hits = self.tree.query(Point(lon, lat), predicate="intersects")
+        return len(hits) > 0
+
+    def is_coastal(self, lat, lon):
+        """True if (lat, lon) is within coastal_deg of the bundled coastline."""
+        if not self.coastal_deg:
+            return False
+        hits = self.coast_tree.query(Point(lon, lat), predicate="dwithin", distance=self.coastal_deg)
+        return len(hits) > 0
+
+    def is_land_many(self, lats, lons):
+        """
+        Vectorized land check for many coordinates at once.
+
+        Args:
+            lats (array-like): Latitudes in degrees.
+            lons (array-like): Longitudes in degrees.
+
+        Returns:
+            numpy.ndarray: Boolean array, True where the point is on land.
+        """
+        import numpy as np
+
+        lats = np.asarray(lats, dtype=float).ravel()
+        lons = np.asarray(lons, dtype=float).ravel()
+        mask = np.zeros(lats.shape, dtype=bool)
+        if lats.size == 0:
+            return mask
+        pts = shapely.points(lons, lats)
+        point_idx, _ = self.tree.query(pts, predicate="intersects")
+        mask[point_idx] = True
+        return mask
+
+    def check(self, lat, lon):
+        """
+        Classify a coordinate in the same shape as Api.check_land_or_water.
+
+        Points near the coastline also get "coastal": True, meaning the
+        answer is a guess at this resolution.
+        """
+        result = {
+            "is_ocean": not self.is_land(lat, lon),
+            "source": "landmask"
+        }
+        if self.is_coastal(lat, lon):
+            result["coastal"] = True
+        return result
+
+
+_land_mask = None
+
+
+def get_land_mask(path=None):
+    """Return the process-wide LandMask, loading it on first use."""
+    global _land_mask
+    if _land_mask is None:
+        _land_mask = LandMask.load(path or os.getenv("LANDMASK_PATH") or DEFAULT_LANDMASK_PATH)
+    return _land_mask
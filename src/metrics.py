@@ -0,0 +1,296 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter as _StackCounter
+from contextlib import contextmanager
+
+# Latency buckets in seconds: sub-millisecond physics up to slow upstreams
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+# Payload size buckets in bytes: 256 B to 16 MiB
+SIZE_BUCKETS = tuple(256 * 4 ** k for k in range(9))
+
+# Per-request profiling is opt-in for the whole process
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "").strip().lower() in ("1", "true", "yes")
+PROFILE_INTERVAL_S = float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "meteor-profiles")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric():
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic counter, one value per label combination."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram in the Prometheus exposition format."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        lines = self.header()
+        for key, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, bucket_counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', _format_value(float(bound))),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry():
+    """
+    Holds metrics and renders them as Prometheus text.
+
+    Collectors are callables run at scrape time that return
+    (name, kind, help, [(labels dict, value), ...]) tuples, for values that
+    already live elsewhere, such as cache statistics.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Warning: metrics collector failed: {str(e)}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram(
+    "meteor_stage_duration_seconds",
+    "Time spent in each stage of an API handler.",
+    ("route", "stage")
+)
+stage_errors = registry.counter(
+    "meteor_stage_errors_total",
+    "Exceptions raised inside an API handler stage, by exception type.",
+    ("route", "stage", "error")
+)
+request_seconds = registry.histogram(
+    "meteor_http_request_duration_seconds",
+    "End-to-end HTTP request latency.",
+    ("route", "method", "status")
+)
+response_bytes = registry.histogram(
+    "meteor_http_response_size_bytes",
+    "HTTP response body size.",
+    ("route",),
+    SIZE_BUCKETS
+)
+upstream_requests = registry.counter(
+    "meteor_upstream_requests_total",
+    "Calls to JPL and OpenCage by HTTP status ('error' when no response).",
+    ("upstream", "status")
+)
+upstream_seconds = registry.histogram(
+    "meteor_upstream_request_duration_seconds",
+    "Latency of calls to JPL and OpenCage.",
+    ("upstream",)
+)
+cache_lookups = registry.counter(
+    "meteor_cache_lookups_total",
+    "Cache lookups by cache and result (fresh/stale/miss for TTL caches, hit/miss otherwise).",
+    ("cache", "result")
+)
+
+
+@contextmanager
+def stage(route, name):
+    """
+    Time a handler stage into meteor_stage_duration_seconds.
+
+    Exceptions are counted in meteor_stage_errors_total and re-raised, so
+    the handler's own error handling is unchanged.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        stage_errors.inc(route=route, stage=name, error=type(e).__name__)
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, route=route, stage=name)
+
+
+def record_upstream(upstream, status, seconds):
+    upstream_requests.inc(upstream=upstream, status=status)
+    upstream_seconds.observe(seconds, upstream=upstream)
+
+
+def lru_cache_collector(name, cache):
+    """Collector exposing an LRUCache's stats() under the given cache name."""
+
+    def collect():
+        stats = cache.stats()
+        labels = {"cache": name}
+        return [
+            ("meteor_lru_cache_hits_total", "counter", "LRU cache hits.", [(labels, stats["hits"])]),
+            ("meteor_lru_cache_misses_total", "counter", "LRU cache misses.", [(labels, stats["misses"])]),
+            ("meteor_lru_cache_evictions_total", "counter", "LRU cache evictions.", [(labels, stats["evictions"])]),
+            ("meteor_lru_cache_bytes", "gauge", "Bytes held by the LRU cache.", [(labels, stats["bytes"])]),
+            ("meteor_lru_cache_entries", "gauge", "Entries held by the LRU cache.", [(labels, stats["entries"])]),
+        ]
+
+    return collect
+
+
+class SamplingProfiler():
+    """
+    Samples one thread's stack at a fixed interval while a request runs.
+
+    The result is in the collapsed-stack format ("outer;inner count" per
+    line) read by flamegraph.pl and speedscope.
+
+    Args:
+        thread_id (int): Thread to sample, usually threading.get_ident() of
+            the request thread.
+        interval (float): Seconds between samples.
+    """
+
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL_S):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = _StackCounter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def save(self, label):
+        """Write the collapsed stacks to PROFILE_DIR and return the path."""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}-{self.thread_id}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        return path
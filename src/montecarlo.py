@@ -0,0 +1,294 @@
+import atexit
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from calculations import DEFAULT_OCEAN_DEPTH_M, batch_impact_calculation
+
+# Default input uncertainties. Albedo and density are log-normal around the
+# nominal values used by the deterministic model; velocity and a directly
+# supplied diameter get a relative normal spread.
+DEFAULT_UNCERTAINTY = {
+    "albedo_median": 0.15,
+    "albedo_sigma_log": 0.5,       # natural-log sigma
+    "albedo_range": (0.02, 0.7),
+    "density_median": 2600,
+    "density_sigma_log": 0.25,
+    "density_range": (1000, 8000),
+    "velocity_rel_sigma": 0.10,
+    "diameter_rel_sigma": 0.10,
+}
+
+# Outcome columns summarized by the Monte Carlo run
+MC_METRICS = (
+    "energy_joules",
+    "megatons_tnt",
+    "crater_diameter_km",
+    "earthquake_magnitude",
+    "tsunami_height_m",
+    "total_destruction_km",
+    "severe_damage_km",
+    "moderate_damage_km",
+    "window_breakage_km",
+)
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Percentiles are read from merged histograms so memory stays flat no matter
+# how many trials run. Positive metrics are binned in log10 space, so the
+# relative error of any reported percentile is below 10**LOG_BIN_WIDTH - 1
+# (about 0.12%); magnitudes are binned linearly with MAG_BIN_WIDTH.
+LOG_RANGE = (-12.0, 32.0)
+LOG_BIN_WIDTH = 0.0005
+MAG_RANGE = (-20.0, 20.0)
+MAG_BIN_WIDTH = 0.001
+
+DEFAULT_CHUNK_SIZE = 250_000
+
+# One pool per process, shared by every run. Spawned, not forked: runs start
+# from request threads, and forking a multi-threaded process can copy held
+# locks into the child.
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    """The process-wide pool, (re)created with at least ``workers`` processes."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers < workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _discard_pool(pool):
+    """Drop a broken pool so the next run starts a fresh one."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_workers = None, 0
+    pool.shutdown(wait=False)
+
+
+@atexit.register
+def shutdown_pool():
+    global _pool, _pool_workers
+    with _pool_lock:
+        pool, _pool, _pool_workers = _pool, None, 0
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _metric_bins(metric):
+    if metric == "earthquake_magnitude":
+        lo, hi = MAG_RANGE
+        return lo, hi, int(round((hi - lo) / MAG_BIN_WIDTH)), False
+    lo, hi = LOG_RANGE
+    return lo, hi, int(round((hi - lo) / LOG_BIN_WIDTH)), True
+
+
+def sample_inputs(rng, n, velocity_ms, h_magnitude=None, diameter_m=None, uncertainty=None):
+    """
+    Draw n sets of uncertain impact inputs.
+
+    Args:
+        rng (numpy.random.Generator): Source of randomness.
+        n (int): Number of samples.
+        velocity_ms (float): Nominal impact velocity in m/s.
+        h_magnitude (float): Absolute magnitude; diameter is derived from it
+            with a sampled albedo. Takes precedence over diameter_m.
+        diameter_m (float): Nominal diameter in meters.
+        uncertainty (dict): Overrides for DEFAULT_UNCERTAINTY.
+
+    Returns:
+        dict: Arrays "diameter_m", "velocity_ms", "density_kg_m3", "albedo".
+    """
+    u = {**DEFAULT_UNCERTAINTY, **(uncertainty or {})}
+
+    albedo = np.clip(
+        u["albedo_median"] * np.exp(rng.normal(0.0, u["albedo_sigma_log"], n)),
+        *u["albedo_range"]
+    )
+    if h_magnitude is not None:
+        # Same relation as estimate_diameter_from_magnitude, in meters
+        diameter = 1329 / np.sqrt(albedo) * (10 ** (-0.2 * h_magnitude)) * 1000
+    else:
+        diameter = diameter_m * (1 + rng.normal(0.0, u["diameter_rel_sigma"], n))
+        np.maximum(diameter, 0.0, out=diameter)
+
+    density = np.clip(
+        u["density_median"] * np.exp(rng.normal(0.0, u["density_sigma_log"], n)),
+        *u["density_range"]
+    )
+    velocity = velocity_ms * (1 + rng.normal(0.0, u["velocity_rel_sigma"], n))
+    np.maximum(velocity, 0.0, out=velocity)
+
+    return {
+        "diameter_m": diameter,
+        "velocity_ms": velocity,
+        "density_kg_m3": density,
+        "albedo": albedo,
+    }
+
+
+def _run_chunk(args):
+    """Run one chunk of trials and return mergeable histograms (worker entry point)."""
+    seed_seq, n, velocity_ms, h_magnitude, diameter_m, is_ocean, ocean_depth_m, uncertainty = args
+    rng = np.random.default_rng(seed_seq)
+    inputs = sample_inputs(rng, n, velocity_ms, h_magnitude, diameter_m, uncertainty)
+    results = batch_impact_calculation(
+        inputs["diameter_m"],
+        inputs["velocity_ms"],
+        is_ocean,
+        density_kg_m3=inputs["density_kg_m3"],
+        ocean_depth_m=ocean_depth_m
+    )
+
+    summary = {}
+    for metric in MC_METRICS:
+        values = results[metric]
+        values = values[np.isfinite(values)]
+        lo, hi, bins, use_log = _metric_bins(metric)
+        if use_log:
+            values = values[values > 0]
+            binned = np.log10(values)
+        else:
+            binned = values
+        counts, _ = np.histogram(np.clip(binned, lo, hi), bins=bins, range=(lo, hi))
+        summary[metric] = {
+            "counts": counts,
+            "n": int(values.size),
+            "sum": float(values.sum()),
+            "min": float(values.min()) if values.size else math.nan,
+            "max": float(values.max()) if values.size else math.nan,
+        }
+    return summary
+
+
+def _merge(total, part):
+    if total is None:
+        return part
+    for metric, stats in part.items():
+        acc = total[metric]
+        if stats["n"]:
+            acc["min"] = min(acc["min"], stats["min"]) if acc["n"] else stats["min"]
+            acc["max"] = max(acc["max"], stats["max"]) if acc["n"] else stats["max"]
+        acc["counts"] += stats["counts"]
+        acc["n"] += stats["n"]
+        acc["sum"] += stats["sum"]
+    return total
+
+
+def _percentiles_from_histogram(metric, counts, percentiles):
+    lo, hi, bins, use_log = _metric_bins(metric)
+    width = (hi - lo) / bins
+    cumulative = np.cumsum(counts)
+    total = cumulative[-1]
+    out = {}
+    for p in percentiles:
+        target = total * p / 100.0
+        idx = int(np.searchsorted(cumulative, target, side="left"))
+        idx = min(idx, bins - 1)
+        before = cumulative[idx - 1] if idx > 0 else 0
+        in_bin = counts[idx]
+        frac = (target - before) / in_bin if in_bin else 0.5
+        value = lo + (idx + frac) * width
+        out[f"p{p:g}"] = float(10 ** value) if use_log else float(value)
+    return out
+
+
+def run_monte_carlo(velocity_ms, h_magnitude=None, diameter_m=None, is_ocean=False,
+                    ocean_depth_m=DEFAULT_OCEAN_DEPTH_M, n_trials=100_000, seed=0, percentiles=DEFAULT_PERCENTILES,
+                    uncertainty=None, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Monte Carlo uncertainty bands for the impact model.
+
+    Trials are split into fixed-size chunks, each with its own child of
+    SeedSequence(seed), so results are identical for a given seed and
+    chunk_size regardless of how many worker processes run them.
+
+    Args:
+        velocity_ms (float): Nominal impact velocity in m/s.
+        h_magnitude (float): Absolute magnitude (diameter sampled via albedo).
+        diameter_m (float): Nominal diameter in meters, used when no H is given.
+        is_ocean (bool): True if the impact is in an ocean.
+        ocean_depth_m (float): Water depth at the impact point.
+        n_trials (int): Number of trials.
+        seed (int): Seed for reproducible sampling.
+        percentiles (iterable): Percentiles to report (0-100).
+        uncertainty (dict): Overrides for DEFAULT_UNCERTAINTY.
+        workers (int): Processes in the shared pool; 1 runs inline, None uses all cores.
+        chunk_size (int): Trials per chunk.
+        progress (callable): Optional progress(fraction, message), called
+            as chunks complete.
+
+    Returns:
+        dict: Per-metric percentile bands plus mean/min/max and run metadata.
+    """
+    if h_magnitude is None and diameter_m is None:
+        raise ValueError("Need either h_magnitude or diameter_m")
+    n_trials = int(n_trials)
+    if n_trials <= 0:
+        raise ValueError("n_trials must be positive")
+
+    n_chunks = math.ceil(n_trials / chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    tasks = []
+    for i, seed_seq in enumerate(seeds):
+        n = min(chunk_size, n_trials - i * chunk_size)
+        tasks.append((seed_seq, n, velocity_ms, h_magnitude, diameter_m, bool(is_ocean), ocean_depth_m, uncertainty))
+
+    pool_size = max(1, workers if workers is not None else os.cpu_count() or 1)
+    workers = min(pool_size, n_chunks)
+
+    total = None
+    done = 0
+
+    def merge(part, task):
+        nonlocal total, done
+        total = _merge(total, part)
+        done += task[1]
+        if progress is not None:
+            progress(done / n_trials, f"{done} of {n_trials} trials")
+
+    if workers == 1:
+        for task in tasks:
+            merge(_run_chunk(task), task)
+    else:
+        pool = _get_pool(pool_size)
+        try:
+            for part, task in zip(pool.map(_run_chunk, tasks), tasks):
+                merge(part, task)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            raise
+
+    bands = {}
+    for metric in MC_METRICS:
+        stats = total[metric]
+        if stats["n"] == 0:
+            bands[metric] = None
+            continue
+        bands[metric] = {
+            **_percentiles_from_histogram(metric, stats["counts"], percentiles),
+            "mean": stats["sum"] / stats["n"],
+            "min": stats["min"],
+            "max": stats["max"],
+        }
+
+    return {
+        "n_trials": n_trials,
+        "seed": seed,
+        "is_ocean": bool(is_ocean),
+        "percentiles": list(percentiles),
+        "bands": bands,
+    }
@@ -1,7 +1,14 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, g, send_file, send_from_directory, stream_with_context, abort
 from flask_cors import CORS
+import app as app_module
 from app import Api
+import metrics
+from streaming import NDJSON_MIMETYPE
+from heatmap import get_heatmap_dir
+import encoding
+import static_assets
 import os
+import time
 
 # Get the directory where flask_app.py is located (src/)
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -16,29 +23,288 @@ app = Flask(__name__,
 CORS(app)
 api_handler = Api()
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profiler = None
+    # Opt-in per request with "X-Profile: 1" when PROFILING_ENABLED is set
+    if metrics.PROFILING_ENABLED and request.headers.get('X-Profile') == '1':
+        g.profiler = metrics.SamplingProfiler().start()
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if 'request_start' in g:
+        metrics.request_seconds.observe(
+            time.perf_counter() - g.request_start,
+            route=route,
+            method=request.method,
+            status=response.status_code
+        )
+    if response.content_length is not None:
+        metrics.response_bytes.observe(response.content_length, route=route)
+    if g.get('profiler') is not None:
+        response.headers['X-Profile-File'] = g.profiler.stop().save(request.endpoint or 'unmatched')
+    return response
+
+# Registered after record_request_metrics so it runs first and the metrics see the encoded size
+@app.after_request
+def negotiate_encoding(response):
+    if (response.mimetype != 'application/json' or response.status_code in (204, 304)
+            or response.is_streamed or response.direct_passthrough or 'Content-Encoding' in response.headers):
+        return response
+    data = response.get_data()
+    body, headers = encoding.negotiate(
+        data,
+        request.headers.get('Accept'),
+        request.headers.get('Accept-Encoding'),
+        g.get('encoding_variants')
+    )
+    response.vary.update(value.strip() for value in headers.pop('Vary').split(','))
+    if body is not data:
+        response.set_data(body)
+        response.headers.update(headers)
+        if 'ETag' in response.headers:
+            response.headers['ETag'] = encoding.weak_etag(response.headers['ETag'])
+    return response
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # Healthy as soon as the app is importable; "warm" reports the preload
+    return jsonify({
+        'status': 'ok',
+        'warm': api_handler.warm.is_set(),
+        'remote_geocoding': bool(app_module.api_key)
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return metrics.registry.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+def send_built(filename, cache_control):
+    """Serve a file from the static build, precompressed if the client accepts it."""
+    found = static_assets.find_file(filename, request.headers.get('Accept-Encoding'))
+    if found is None:
+        abort(404)
+    path, mimetype, coding = found
+    # conditional=True answers If-None-Match and Range (206) requests
+    response = send_file(path, mimetype=mimetype, conditional=True)
+    if coding is not None:
+        response.headers['Content-Encoding'] = coding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_control
+    return response
+
 @app.route('/')
 def index():
+    # The built page points at fingerprinted assets; fall back to the sources
+    if static_assets.has_build():
+        return send_built('index.html', 'no-cache')
     return render_template('index.html')
 
+@app.route('/assets/<path:filename>', methods=['GET'])
+def asset(filename):
+    # Fingerprinted names change with the content, so they never need revalidating
+    if filename == static_assets.MANIFEST_NAME or filename in static_assets.PAGES:
+        abort(404)
+    return send_built(filename, f'public, max-age={static_assets.IMMUTABLE_MAX_AGE}, immutable')
+
 @app.route('/api/get_asteroid_list', methods=['GET'])
 def get_asteroid_list():
-    result = api_handler.get_asteroid_list()
-    return result, 200, {'Content-Type': 'application/json'}
+    payload = api_handler.get_asteroid_list_payload()
+    headers = {
+        'Content-Type': 'application/json',
+        'ETag': payload.etag,
+        'Cache-Control': 'no-cache'
+    }
+    if request.if_none_match.contains_weak(payload.etag.strip('"')):
+        return '', 304, headers
+    g.encoding_variants = payload.variants
+    return payload.body, 200, headers
 
 @app.route('/api/run_simulation', methods=['POST'])
 def run_simulation():
     data = request.json
-    result = api_handler.run_simulation(
+    result, cache_status = api_handler.run_simulation_cached(
+        asteroid_name=data.get('asteroid_name'),
+        diameter=data.get('diameter'),
+        velocity=data.get('velocity'),
+        lat=data.get('lat'),
+        long=data.get('long'),
+        h_value=data.get('h_value'),
+        response_mode=data.get('response_mode')
+    )
+    return result, 200, {'Content-Type': 'application/json', 'X-Cache': cache_status.upper()}
+
+@app.route('/api/run_scenarios', methods=['POST'])
+def run_scenarios():
+    data = request.json
+    result = api_handler.run_scenarios(
+        variants=data.get('variants'),
+        base=data.get('base'),
+        response_mode=data.get('response_mode')
+    )
+    return result, 200, {'Content-Type': 'application/json'}
+
+@app.route('/api/score_catalog', methods=['GET'])
+def score_catalog():
+    args = request.args
+    wants_stream = args.get('format') == 'ndjson' or request.accept_mimetypes.best_match(
+        ['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+    if wants_stream:
+        lines = api_handler.stream_asteroid_catalog(
+            sort=args.get('sort'),
+            is_ocean=args.get('is_ocean', '').lower() in ('1', 'true', 'yes'),
+            include_map=args.get('include_map', '').lower() in ('1', 'true', 'yes'),
+            lat=args.get('lat'),
+            long=args.get('long')
+        )
+        return Response(
+            stream_with_context(lines),
+            mimetype=NDJSON_MIMETYPE,
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    result = api_handler.score_asteroid_catalog(
+        sort=args.get('sort'),
+        page=args.get('page'),
+        per_page=args.get('per_page'),
+        is_ocean=args.get('is_ocean', '').lower() in ('1', 'true', 'yes'),
+        include_map=args.get('include_map', '').lower() in ('1', 'true', 'yes'),
+        lat=args.get('lat'),
+        long=args.get('long')
+    )
+    return result, 200, {'Content-Type': 'application/json'}
+
+@app.route('/api/quick_estimate', methods=['GET'])
+def quick_estimate():
+    args = request.args
+    result = api_handler.quick_estimate(
+        diameter=args.get('diameter'),
+        velocity=args.get('velocity'),
+        h_value=args.get('h_value'),
+        is_ocean=args.get('is_ocean', '').lower() in ('1', 'true', 'yes')
+    )
+    return result, 200, {'Content-Type': 'application/json'}
+
+@app.route('/api/catalog', methods=['GET'])
+def catalog():
+    args = request.args
+    result = api_handler.query_catalog(
+        top=args.get('top'),
+        min_diameter_m=args.get('min_diameter_m'),
+        max_diameter_m=args.get('max_diameter_m'),
+        prefix=args.get('prefix'),
+        limit=args.get('limit')
+    )
+    return result, 200, {'Content-Type': 'application/json'}
+
+@app.route('/api/run_monte_carlo', methods=['POST'])
+def run_monte_carlo():
+    data = request.json
+    result = api_handler.run_monte_carlo(
         asteroid_name=data.get('asteroid_name'),
         diameter=data.get('diameter'),
         velocity=data.get('velocity'),
         lat=data.get('lat'),
         long=data.get('long'),
         h_value=data.get('h_value'),
-        v_inf_value=data.get('v_inf_value')
+        trials=data.get('trials'),
+        seed=data.get('seed')
     )
     return result, 200, {'Content-Type': 'application/json'}
 
+@app.route('/api/run_deflection', methods=['POST'])
+def run_deflection():
+    data = request.json
+    result = api_handler.run_deflection(
+        asteroid_name=data.get('asteroid_name'),
+        diameter=data.get('diameter'),
+        velocity=data.get('velocity'),
+        h_value=data.get('h_value'),
+        v_inf_value=data.get('v_inf_value'),
+        delta_v=data.get('delta_v'),
+        lead_time=data.get('lead_time'),
+        impactor_mass=data.get('impactor_mass'),
+        impactor_speed=data.get('impactor_speed'),
+        beta=data.get('beta'),
+        nominal_miss=data.get('nominal_miss')
+    )
+    return result, 200, {'Content-Type': 'application/json'}
+
+@app.route('/api/deflection_sweep', methods=['POST'])
+def deflection_sweep():
+    data = request.json
+    result = api_handler.deflection_sweep(
+        asteroid_name=data.get('asteroid_name'),
+        diameter=data.get('diameter'),
+        velocity=data.get('velocity'),
+        h_value=data.get('h_value'),
+        v_inf_value=data.get('v_inf_value'),
+        nominal_miss=data.get('nominal_miss'),
+        steps=data.get('steps')
+    )
+    return result, 200, {'Content-Type': 'application/json'}
+
+@app.route('/api/heatmap', methods=['POST'])
+def heatmap():
+    data = request.json
+    result = api_handler.get_heatmap(
+        asteroid_name=data.get('asteroid_name'),
+        diameter=data.get('diameter'),
+        velocity=data.get('velocity'),
+        h_value=data.get('h_value'),
+        v_inf_value=data.get('v_inf_value'),
+        resolution=data.get('resolution'),
+        max_zoom=data.get('max_zoom'),
+        build=bool(data.get('build'))
+    )
+    return result, 200, {'Content-Type': 'application/json'}
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    data = request.json
+    result = api_handler.submit_job(
+        kind=data.get('kind'),
+        params=data.get('params'),
+        priority=data.get('priority'),
+        timeout_s=data.get('timeout_s')
+    )
+    return result, 200, {'Content-Type': 'application/json'}
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    result = api_handler.list_jobs(state=request.args.get('state'), limit=request.args.get('limit'))
+    return result, 200, {'Content-Type': 'application/json'}
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    return api_handler.get_job(job_id), 200, {'Content-Type': 'application/json'}
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    return api_handler.cancel_job(job_id), 200, {'Content-Type': 'application/json'}
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    return api_handler.get_job_result(job_id), 200, {'Content-Type': 'application/json'}
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    events = api_handler.stream_job_events(job_id)
+    if events is None:
+        # Every stream holds a request thread; the ASGI server has no such limit
+        return jsonify({'error': f'Too many event streams; poll /api/jobs/{job_id} instead'}), 503, {'Retry-After': '5'}
+    return Response(
+        events,
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/heatmaps/<path:filename>', methods=['GET'])
+def heatmap_tile(filename):
+    # Tile sets never change once built (the key covers every input)
+    return send_from_directory(get_heatmap_dir(), filename, max_age=31536000)
+
 if __name__ == '__main__':
     print("=" * 60)
     print("🚀 Meteor Madness Flask Server Starting...")
@@ -0,0 +1,18 @@
+"""
+Production entry point: python serve.py [gunicorn options]
+
+Runs run:app under gunicorn with gunicorn.conf.py, e.g.
+    python serve.py --workers 8 --threads 4 --bind 0.0.0.0:8000
+Reload gracefully with `kill -HUP <master pid>`.
+"""
+import os
+import sys
+
+from gunicorn.app.wsgiapp import run
+
+if __name__ == '__main__':
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    # gunicorn resolves run:app and the config relative to the working directory
+    os.chdir(src_dir)
+    sys.argv = [sys.argv[0], "-c", os.path.join(src_dir, "gunicorn.conf.py"), *sys.argv[1:], "run:app"]
+    sys.exit(run())
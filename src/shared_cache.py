@@ -0,0 +1,192 @@
+import itertools
+import os
+import sqlite3
+import threading
+import time
+
+# Raised when the store itself (not a loader) fails
+StoreError = sqlite3.Error
+
+# Size bounds, enforced by a sweep every PURGE_EVERY_WRITES writes in each
+# process (expired rows first, then the oldest), so the file stays bounded
+# without a separate janitor process
+MAX_ROWS = int(os.getenv("SHARED_CACHE_MAX_ROWS", "20000"))
+MAX_BYTES = int(os.getenv("SHARED_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+PURGE_EVERY_WRITES = 256
+
+
+class SharedStore():
+    """
+    Cross-process key/value cache on a local SQLite file.
+
+    Meant for values that are expensive to compute and identical in every
+    worker (the asteroid list, rendered maps): the first worker to compute
+    one stores it, the others read it instead of warming their own copy.
+    WAL mode lets readers proceed while one worker writes.
+
+    Values are bytes. Each entry has an expiry; expired entries are never
+    returned. Every PURGE_EVERY_WRITES writes, expired entries are deleted,
+    then the oldest ones until both bounds hold.
+
+    Args:
+        path (str): SQLite file, created if missing.
+        max_rows (int): Most entries kept.
+        max_bytes (int): Most value bytes kept.
+    """
+
+    def __init__(self, path, max_rows=MAX_ROWS, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self._writes = itertools.count(1)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = self._connect()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value BLOB NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key)"
+            ")"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at)")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " name TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " expires_at REAL NOT NULL"
+            ")"
+        )
+
+    def _connect(self):
+        # One autocommit connection per thread; sqlite3 objects can't be shared
+        db = getattr(self._local, "db", None)
+        if db is None or getattr(self._local, "pid", None) != os.getpid():
+            db = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def get(self, namespace, key):
+        """Return the stored bytes for (namespace, key), or None if missing or expired."""
+        row = self._connect().execute(
+            "SELECT value FROM entries WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, time.time())
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def set(self, namespace, key, value, ttl):
+        now = time.time()
+        db = self._connect()
+        db.execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, value, stored_at, expires_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, sqlite3.Binary(value), now, now + ttl)
+        )
+        if next(self._writes) % PURGE_EVERY_WRITES == 0:
+            self.purge()
+
+    def delete(self, namespace, key=None):
+        if key is None:
+            self._connect().execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+        else:
+            self._connect().execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def purge_expired(self):
+        now = time.time()
+        db = self._connect()
+        db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        db.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+
+    def purge(self):
+        """Delete expired entries, then the oldest ones until max_rows and max_bytes hold."""
+        self.purge_expired()
+        db = self._connect()
+        rows, size = db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM entries").fetchone()
+        if rows <= self.max_rows and size <= self.max_bytes:
+            return
+        evict = []
+        for rowid, length in db.execute("SELECT rowid, LENGTH(value) FROM entries ORDER BY stored_at"):
+            if rows <= self.max_rows and size <= self.max_bytes:
+                break
+            evict.append((rowid,))
+            rows -= 1
+            size -= length
+        db.executemany("DELETE FROM entries WHERE rowid = ?", evict)
+
+    def _acquire_lease(self, name, lease_s):
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        now = time.time()
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM leases WHERE name = ? AND expires_at <= ?", (name, now))
+            acquired = db.execute(
+                "INSERT OR IGNORE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                (name, owner, now + lease_s)
+            ).rowcount == 1
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return acquired
+
+    def _release_lease(self, name):
+        self._connect().execute("DELETE FROM leases WHERE name = ?", (name,))
+
+    def get_or_load(self, namespace, key, loader, ttl, lease_s=30.0, poll_s=0.05):
+        """
+        Return the stored value, running loader() in at most one process.
+
+        The process that takes the lease calls loader() and stores the
+        result; the others poll for it. If the holder dies or takes longer
+        than lease_s, the lease expires and a waiting process takes over.
+        Loader exceptions propagate to the caller that ran it only.
+
+        Args:
+            loader (callable): Zero-argument function returning bytes.
+            ttl (float): Seconds the loaded value stays valid.
+        """
+        value = self.get(namespace, key)
+        if value is not None:
+            return value
+        name = f"{namespace}\x00{key}"
+        while True:
+            if self._acquire_lease(name, lease_s):
+                try:
+                    value = loader()
+                    self.set(namespace, key, value, ttl)
+                    return value
+                finally:
+                    self._release_lease(name)
+            time.sleep(poll_s)
+            value = self.get(namespace, key)
+            if value is not None:
+                return value
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_shared_store():
+    """
+    Return the process-wide SharedStore, or None when SHARED_CACHE_PATH is unset.
+
+    The single-process dev server leaves it unset; the production entry
+    point (gunicorn.conf.py) points every worker at the same file.
+    """
+    global _shared_store
+    path = os.getenv("SHARED_CACHE_PATH")
+    if not path:
+        return None
+    if _shared_store is None or _shared_store.path != path:
+        with _shared_store_lock:
+            if _shared_store is None or _shared_store.path != path:
+                _shared_store = SharedStore(path)
+    return _shared_store
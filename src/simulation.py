@@ -1,5 +1,14 @@
-import folium
-from folium import plugins
+import json
+import os
+import threading
+import zlib
+from html import escape
+
+from cache import LRUCache
+from shared_cache import get_shared_store
+
+# folium (and its pandas/branca/jinja stack) is imported by the functions
+# that render maps, so importing this module stays cheap for the server.
 
 
 def generate_map_html(latitude, longitude, damage_radius_km):
@@ -14,6 +23,9 @@ def generate_map_html(latitude, longitude, damage_radius_km):
     Returns:
         str: HTML string of the generated map
     """
+    import folium
+    from folium import plugins
+
     try:
         # If damage_radius_km is a dict, extract the moderate damage value
         if isinstance(damage_radius_km, dict):
@@ -88,131 +100,358 @@ def calculate_earthquake_decay_radius(magnitude, target_magnitude):
     # Simple logarithmic decay model - adjust coefficients as needed
     return 10 ** ((magnitude - target_magnitude) * 0.5) * 10  # in km
 
+# Damage zones drawn on top of the danger zones, outermost first
+DAMAGE_ZONES = [
+    ('window_breakage_km', 'Window Breakage', 'yellow', 0.1),
+    ('moderate_damage_km', 'Moderate Damage', 'orange', 0.2),
+    ('severe_damage_km', 'Severe Damage', 'red', 0.4),
+    ('total_destruction_km', 'Total Destruction', 'darkred', 0.6)
+]
+
+EARTHQUAKE_MAGNITUDES_TO_SHOW = [6.0, 5.0, 4.0]
+
+
+def build_impact_geometry(latitude, longitude, damage_radii_dict, earthquake_magnitude=7.0):
+    """
+    Describe every shape of the detailed impact map as plain data.
+
+    This is what generate_detailed_map_html draws, without folium: the
+    client can render it on its own Leaflet map, and the payload is a few
+    hundred bytes instead of a full HTML document.
+
+    Args:
+        latitude (float): Impact location latitude
+        longitude (float): Impact location longitude
+        damage_radii_dict (dict): Output of calculate_damage_radii
+        earthquake_magnitude (float): Earthquake magnitude at the impact point
+
+    Returns:
+        dict: center, marker, zones and earthquake_rings. Zones are listed in
+        drawing order; radii are in meters and styles use Leaflet path options.
+    """
+    zones = []
+
+    # Danger, wind and moderate impact zones derived from the severe radius
+    danger_radius_km = (damage_radii_dict.get('severe_damage_km') or 0) * 1.5
+    if danger_radius_km > 0:
+        wind_radius_km = danger_radius_km * 1.8
+        mod_radius_km = danger_radius_km * 0.7
+        zones.append({
+            "kind": "danger",
+            "label": "DANGER ZONE",
+            "radius_m": danger_radius_km * 1000,
+            "popup": (
+                f'<b>DANGER ZONE</b><br>'
+                f'<b>Earthquake Magnitude:</b> {earthquake_magnitude:.1f} Richter<br>'
+                f'<b>Radius:</b> {danger_radius_km:.1f} km<br>'
+                f'<b>Effects:</b> Severe structural damage, potential collapses'
+            ),
+            "tooltip": 'Extreme Danger Area - Evacuation Recommended',
+            "style": {"color": '#ff0000', "fillColor": '#ff0000', "fillOpacity": 0.15, "weight": 3}
+        })
+        zones.append({
+            "kind": "wind",
+            "label": "HIGH WIND ZONE",
+            "radius_m": wind_radius_km * 1000,
+            "popup": (
+                f'<b>HIGH WIND ZONE</b><br>'
+                f'<b>Wind Speed:</b> 200+ km/h<br>'
+                f'<b>Effects:</b> Widespread damage, uprooted trees, structural damage'
+            ),
+            "tooltip": 'High Wind Zone',
+            "style": {"color": '#ffa500', "fillColor": '#ffa500', "fillOpacity": 0.1, "weight": 2, "dashArray": '5, 5'}
+        })
+        zones.append({
+            "kind": "moderate_impact",
+            "label": "MODERATE IMPACT ZONE",
+            "radius_m": mod_radius_km * 1000,
+            "popup": (
+                f'<b>MODERATE IMPACT ZONE</b><br>'
+                f'<b>Effects:</b> Partial building collapse, fires, severe injuries likely'
+            ),
+            "tooltip": 'Moderate Impact Zone',
+            "style": {"color": '#ff4500', "fillColor": '#ff4500', "fillOpacity": 0.25, "weight": 2}
+        })
+
+    # Earthquake decay circles
+    earthquake_rings = []
+    for mag in EARTHQUAKE_MAGNITUDES_TO_SHOW:
+        if mag < earthquake_magnitude:
+            radius_km = calculate_earthquake_decay_radius(earthquake_magnitude, mag)
+            earthquake_rings.append({
+                "magnitude": mag,
+                "radius_m": radius_km * 1000,
+                "popup": f"Magnitude: {mag:.1f} Richter",
+                "tooltip": f"Magnitude: {mag:.1f} Richter",
+                "style": {"color": 'purple', "fillColor": 'purple', "fillOpacity": 0.2, "weight": 1}
+            })
+
+    # Damage zones, innermost first
+    damage_zones = []
+    for key, label, color, opacity in reversed(DAMAGE_ZONES):
+        radius_km = damage_radii_dict.get(key)
+        if isinstance(radius_km, (int, float)) and radius_km > 0:
+            damage_zones.append({
+                "kind": key,
+                "label": label,
+                "radius_m": radius_km * 1000,
+                "popup": f'<b>{label}</b><br>Radius: {radius_km:.2f} km',
+                "tooltip": f'{label}: {radius_km:.2f} km',
+                "style": {"color": color, "fillColor": color, "fillOpacity": opacity, "weight": 2}
+            })
+
+    return {
+        "center": [latitude, longitude],
+        "marker": {
+            "popup": f'<b>Impact Point</b><br>Lat: {latitude}<br>Lon: {longitude}',
+            "tooltip": 'Asteroid Impact Location'
+        },
+        "zones": zones,
+        "earthquake_rings": earthquake_rings,
+        "damage_zones": damage_zones
+    }
+
+
+# Rendered maps are memoized on quantized inputs. Quantization is applied to
+# the inputs themselves, so a cached document is exactly what a fresh render
+# of the same key would produce.
+MAP_CACHE_MAX_BYTES = int(os.getenv("MAP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+MAP_COORD_DECIMALS = 5      # ~1 m
+MAP_RADIUS_DECIMALS = 3     # 1 m, radii are in km
+MAP_MAGNITUDE_DECIMALS = 3
+
+map_render_cache = LRUCache(max_bytes=MAP_CACHE_MAX_BYTES)
+
+# Lifetime of maps in the cross-worker store (see shared_cache.py)
+SHARED_MAP_TTL = float(os.getenv("SHARED_MAP_TTL", "86400"))
+
+# Placeholders baked into the skeleton document and replaced per impact
+_SKELETON_CENTER = [12.3456789, 98.7654321]
+_SKELETON_LAYERS = "/*__IMPACT_LAYERS__*/"
+
+_skeleton = None
+_skeleton_lock = threading.Lock()
+
+
+def _map_skeleton():
+    """
+    Render the static part of the detailed map once.
+
+    Returns:
+        tuple: (map variable name, document parts). The parts are joined
+        around the JS center literal and the per-impact layer script.
+    """
+    global _skeleton
+    if _skeleton is None:
+        with _skeleton_lock:
+            if _skeleton is None:
+                import folium
+                from branca.element import MacroElement
+                from folium import plugins
+                from jinja2 import Template
+
+                class _LayersPlaceholder(MacroElement):
+                    """Marks where the per-impact circles and marker go in the map script."""
+
+                    _template = Template(
+                        "{% macro script(this, kwargs) %}" + _SKELETON_LAYERS + "{% endmacro %}"
+                    )
+
+                impact_map = folium.Map(location=_SKELETON_CENTER, zoom_start=8, tiles='OpenStreetMap')
+                _LayersPlaceholder().add_to(impact_map)
+                folium.LayerControl().add_to(impact_map)
+                plugins.Fullscreen(position='topright').add_to(impact_map)
+                plugins.MousePosition().add_to(impact_map)
+                plugins.MeasureControl(
+                    position='topleft',
+                    primary_length_unit='kilometers',
+                    secondary_length_unit='miles'
+                ).add_to(impact_map)
+
+                html = impact_map.get_root().render()
+                center_literal = f"[{_SKELETON_CENTER[0]}, {_SKELETON_CENTER[1]}]"
+                head, rest = html.split(center_literal, 1)
+                middle, tail = rest.split(_SKELETON_LAYERS, 1)
+                _skeleton = (impact_map.get_name(), (head, middle, tail))
+    return _skeleton
+
+
+def warm_up():
+    """Import folium and render the map skeleton ahead of the first request."""
+    _map_skeleton()
+
+
+def _circle_js(map_name, var_name, center, shape):
+    style = shape["style"]
+    options = {
+        "radius": shape["radius_m"],
+        "color": style["color"],
+        "fill": True,
+        "fillColor": style["fillColor"],
+        "fillOpacity": style["fillOpacity"],
+        "weight": style["weight"]
+    }
+    if "dashArray" in style:
+        options["dashArray"] = style["dashArray"]
+    return (
+        f"var {var_name} = L.circle({json.dumps(center)}, {json.dumps(options)}).addTo({map_name});\n"
+        f"{var_name}.bindPopup({json.dumps(shape['popup'])}, {{\"maxWidth\": \"100%\"}});\n"
+        f"{var_name}.bindTooltip({json.dumps(shape['tooltip'])}, {{\"sticky\": true}});\n"
+    )
+
+
+def _marker_js(map_name, center, marker, var_name="impact_marker"):
+    icon = {
+        "markerColor": "black",
+        "iconColor": "white",
+        "icon": "warning-sign",
+        "prefix": "glyphicon",
+        "extraClasses": "fa-rotate-0"
+    }
+    return (
+        f"var {var_name} = L.marker({json.dumps(center)}, {{}}).addTo({map_name});\n"
+        f"{var_name}.setIcon(L.AwesomeMarkers.icon({json.dumps(icon)}));\n"
+        f"{var_name}.bindPopup({json.dumps(marker['popup'])}, {{\"maxWidth\": \"100%\"}});\n"
+        f"{var_name}.bindTooltip({json.dumps(marker['tooltip'])}, {{\"sticky\": true}});\n"
+    )
+
+
+def _render_detailed_map(latitude, longitude, damage_radii_dict, earthquake_magnitude):
+    map_name, (head, middle, tail) = _map_skeleton()
+    geometry = build_impact_geometry(latitude, longitude, damage_radii_dict, earthquake_magnitude)
+    center = geometry["center"]
+
+    # Danger zones, earthquake decay circles, impact marker, damage zones
+    layers = []
+    shapes = geometry["zones"] + geometry["earthquake_rings"]
+    for i, shape in enumerate(shapes):
+        layers.append(_circle_js(map_name, f"impact_circle_{i}", center, shape))
+    layers.append(_marker_js(map_name, center, geometry["marker"]))
+    for i, shape in enumerate(geometry["damage_zones"], start=len(shapes)):
+        layers.append(_circle_js(map_name, f"impact_circle_{i}", center, shape))
+
+    center_literal = f"[{latitude}, {longitude}]"
+    return "".join((head, center_literal, middle, "".join(layers), tail))
+
+
+def _shared_or_render(key, latitude, longitude, radii, earthquake_magnitude):
+    """
+    Render a map, going through the cross-worker store when one is configured.
+
+    Maps are stored zlib-compressed; inflating one is still cheaper than
+    rendering it, and the file holds about four times as many.
+    """
+    store = get_shared_store()
+    if store is None:
+        return _render_detailed_map(latitude, longitude, radii, earthquake_magnitude)
+    try:
+        stored = store.get("map_html", repr(key))
+        if stored is not None:
+            return zlib.decompress(stored).decode("utf-8")
+    except Exception as e:
+        print(f"Warning: Shared map cache read failed: {str(e)}")
+    html = _render_detailed_map(latitude, longitude, radii, earthquake_magnitude)
+    try:
+        store.set("map_html", repr(key), zlib.compress(html.encode("utf-8"), 6), SHARED_MAP_TTL)
+    except Exception as e:
+        print(f"Warning: Shared map cache write failed: {str(e)}")
+    return html
+
+
+def _quantize_map_inputs(latitude, longitude, damage_radii_dict, earthquake_magnitude):
+    radii = {
+        key: round(value, MAP_RADIUS_DECIMALS) if isinstance(value, (int, float)) else value
+        for key, value in damage_radii_dict.items()
+    }
+    return (
+        round(float(latitude), MAP_COORD_DECIMALS),
+        round(float(longitude), MAP_COORD_DECIMALS),
+        radii,
+        round(float(earthquake_magnitude), MAP_MAGNITUDE_DECIMALS)
+    )
+
+
 def generate_detailed_map_html(latitude, longitude, damage_radii_dict, earthquake_magnitude=7.0):
     try:
         if not isinstance(damage_radii_dict, dict):
             print(f"Warning: damage_radii_dict is not a dict, got {type(damage_radii_dict)}")
             return generate_map_html(latitude, longitude, 0)
 
-        # Create map with OpenStreetMap base layer
-        impact_map = folium.Map(location=[latitude, longitude], zoom_start=8, tiles='OpenStreetMap')
-        
-        # Add the main red danger zone (most prominent feature)
-        danger_radius_km = damage_radii_dict.get('severe_damage_km', 0) * 1.5
-        if danger_radius_km > 0:
-            # Main danger zone (red)
-            folium.Circle(
-                location=[latitude, longitude],
-                radius=danger_radius_km * 1000,  # Convert km to meters
-                popup=(
-                    f'<b>DANGER ZONE</b><br>'
-                    f'<b>Earthquake Magnitude:</b> {earthquake_magnitude:.1f} Richter<br>'
-                    f'<b>Radius:</b> {danger_radius_km:.1f} km<br>'
-                    f'<b>Effects:</b> Severe structural damage, potential collapses'
-                ),
-                tooltip='Extreme Danger Area - Evacuation Recommended',
-                color='#ff0000',  # Bright red
-                fill=True,
-                fill_color='#ff0000',
-                fill_opacity=0.15,
-                weight=3
-            ).add_to(impact_map)
-            
-            # Add wind intensity zones
-            wind_radius_km = danger_radius_km * 1.8
-            folium.Circle(
-                location=[latitude, longitude],
-                radius=wind_radius_km * 1000,
-                popup=(
-                    f'<b>HIGH WIND ZONE</b><br>'
-                    f'<b>Wind Speed:</b> 200+ km/h<br>'
-                    f'<b>Effects:</b> Widespread damage, uprooted trees, structural damage'
-                ),
-                tooltip='High Wind Zone',
-                color='#ffa500',  # Orange
-                fill=True,
-                fill_color='#ffa500',
-                fill_opacity=0.1,
-                weight=2,
-                dash_array='5, 5'
-            ).add_to(impact_map)
-            
-            # Add moderate impact zone
-            mod_radius_km = danger_radius_km * 0.7
-            folium.Circle(
-                location=[latitude, longitude],
-                radius=mod_radius_km * 1000,
-                popup=(
-                    f'<b>MODERATE IMPACT ZONE</b><br>'
-                    f'<b>Effects:</b> Partial building collapse, fires, severe injuries likely'
-                ),
-                tooltip='Moderate Impact Zone',
-                color='#ff4500',  # OrangeRed
-                fill=True,
-                fill_color='#ff4500',
-                fill_opacity=0.25,
-                weight=2
-            ).add_to(impact_map)
+        # Quantize the inputs and use them as the cache key
+        latitude, longitude, radii, earthquake_magnitude = _quantize_map_inputs(
+            latitude, longitude, damage_radii_dict, earthquake_magnitude
+        )
+        key = (latitude, longitude, earthquake_magnitude, tuple(sorted(radii.items())))
 
-        # Earthquake decay circles
-        earthquake_magnitudes_to_show = [6.0, 5.0, 4.0]
-        for mag in earthquake_magnitudes_to_show:
-            if mag < earthquake_magnitude:
-                radius_km = calculate_earthquake_decay_radius(earthquake_magnitude, mag)
-                folium.Circle(
-                    radius=radius_km * 1000,
-                    location=[latitude, longitude],
-                    popup=f"Magnitude: {mag:.1f} Richter",
-                    tooltip=f"Magnitude: {mag:.1f} Richter",
-                    color='purple',
-                    fill=True,
-                    fillColor='purple',
-                    fillOpacity=0.2,
-                    weight=1
-                ).add_to(impact_map)
+        return map_render_cache.get_or_compute(
+            key,
+            lambda: _shared_or_render(key, latitude, longitude, radii, earthquake_magnitude)
+        )
 
-        # Impact marker
-        folium.Marker(
-            location=[latitude, longitude],
-            popup=f'<b>Impact Point</b><br>Lat: {latitude}<br>Lon: {longitude}',
-            tooltip='Asteroid Impact Location',
-            icon=folium.Icon(color='black', icon='warning-sign')
-        ).add_to(impact_map)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return f"<p>Error generating map: {str(e)}</p>"
 
-        # Damage zones
-        damage_zones = [
-            ('window_breakage_km', 'Window Breakage', 'yellow', 0.1),
-            ('moderate_damage_km', 'Moderate Damage', 'orange', 0.2),
-            ('severe_damage_km', 'Severe Damage', 'red', 0.4),
-            ('total_destruction_km', 'Total Destruction', 'darkred', 0.6)
-        ]
-
-        for key, label, color, opacity in reversed(damage_zones):
-            if key in damage_radii_dict:
-                radius_km = damage_radii_dict[key]
-                if isinstance(radius_km, (int, float)) and radius_km > 0:
-                    folium.Circle(
-                        location=[latitude, longitude],
-                        radius=radius_km * 1000,
-                        popup=f'<b>{label}</b><br>Radius: {radius_km:.2f} km',
-                        tooltip=f'{label}: {radius_km:.2f} km',
-                        color=color,
-                        fill=True,
-                        fillColor=color,
-                        fillOpacity=opacity,
-                        weight=2
-                    ).add_to(impact_map)
-
-        folium.LayerControl().add_to(impact_map)
-        plugins.Fullscreen(position='topright').add_to(impact_map)
-        plugins.MousePosition().add_to(impact_map)
-        plugins.MeasureControl(
-            position='topleft',
-            primary_length_unit='kilometers',
-            secondary_length_unit='miles'
-        ).add_to(impact_map)
 
-        return impact_map.get_root().render()
+def _render_overlay_map(scenarios):
+    map_name, (head, middle, tail) = _map_skeleton()
+    layers = []
+    circles = []
+    for s, (label, latitude, longitude, radii, earthquake_magnitude) in enumerate(scenarios):
+        geometry = build_impact_geometry(latitude, longitude, radii, earthquake_magnitude)
+        center = geometry["center"]
+        label = escape(label)
+        marker = {
+            "popup": f'<b>{label}</b><br>Lat: {latitude}<br>Lon: {longitude}',
+            "tooltip": label
+        }
+        layers.append(_marker_js(map_name, center, marker, var_name=f"scenario_marker_{s}"))
+        for i, shape in enumerate(geometry["damage_zones"]):
+            shape = {**shape, "popup": f'<b>{label}</b><br>' + shape["popup"], "tooltip": f'{label} - ' + shape["tooltip"]}
+            var_name = f"scenario_{s}_circle_{i}"
+            layers.append(_circle_js(map_name, var_name, center, shape))
+            circles.append(var_name)
+    if circles:
+        layers.append(f"{map_name}.fitBounds(L.featureGroup([{', '.join(circles)}]).getBounds());\n")
+
+    _, latitude, longitude, _, _ = scenarios[0]
+    center_literal = f"[{latitude}, {longitude}]"
+    return "".join((head, center_literal, middle, "".join(layers), tail))
+
+
+def generate_overlay_map_html(scenarios):
+    """
+    Draw several impacts on one map, for comparing scenarios.
+
+    Only the damage zones and a labelled marker are drawn per impact (the
+    danger, wind and earthquake rings of the detailed map would bury each
+    other), and the view is fitted to all of them.
+
+    Args:
+        scenarios (list): dicts with label, latitude, longitude,
+            damage_radii_dict and earthquake_magnitude.
+
+    Returns:
+        str: HTML string of the generated map
+    """
+    try:
+        quantized = []
+        for scenario in scenarios:
+            latitude, longitude, radii, earthquake_magnitude = _quantize_map_inputs(
+                scenario["latitude"],
+                scenario["longitude"],
+                scenario["damage_radii_dict"],
+                scenario.get("earthquake_magnitude") or 0
+            )
+            quantized.append((str(scenario["label"]), latitude, longitude, radii, earthquake_magnitude))
+        if not quantized:
+            return generate_map_html(0.0, 0.0, 0)
+        key = ("overlay",) + tuple(
+            (label, latitude, longitude, earthquake_magnitude, tuple(sorted(radii.items())))
+            for label, latitude, longitude, radii, earthquake_magnitude in quantized
+        )
+        return map_render_cache.get_or_compute(key, lambda: _render_overlay_map(quantized))
 
     except Exception as e:
         import traceback
@@ -230,8 +469,12 @@ def calculate_affected_area(damage_radius_km):
 
 def estimate_population_impact(latitude, longitude, damage_radius_km):
     """
-    Placeholder function for estimating population impact.
-    
+    Estimate the population within a damage radius.
+
+    Uses the gridded population raster when one is configured
+    (POPULATION_RASTER_PATH, see exposure.py), otherwise an average global
+    density.
+
     Args:
         latitude (float): Impact location latitude
         longitude (float): Impact location longitude
@@ -240,8 +483,19 @@ def estimate_population_impact(latitude, longitude, damage_radius_km):
     Returns:
         dict: Estimated impact information
     """
+    from exposure import get_population_raster
+
     affected_area_km2 = calculate_affected_area(damage_radius_km)
-    
+
+    raster = get_population_raster()
+    if raster is not None and affected_area_km2 > 0:
+        estimated_affected = int(raster.ring_populations(latitude, longitude, [damage_radius_km])[0])
+        return {
+            "affected_area_km2": round(affected_area_km2, 2),
+            "estimated_affected_population": estimated_affected,
+            "note": f"Summed from the population raster {raster.name}"
+        }
+
     # Average global population density
     avg_pop_density = 60  # people per km²
     estimated_affected = int(affected_area_km2 * avg_pop_density)
@@ -250,4 +504,4 @@ def estimate_population_impact(latitude, longitude, damage_radius_km):
         "affected_area_km2": round(affected_area_km2, 2),
         "estimated_affected_population": estimated_affected,
         "note": "This is a rough estimate based on average global population density"
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,217 @@
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import time
+from urllib.parse import quote, unquote
+
+from werkzeug.http import parse_accept_header
+from werkzeug.security import safe_join
+
+import encoding
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEB_DIR = os.path.join(ROOT_DIR, "web")
+DEFAULT_BUILD_DIR = os.path.join(ROOT_DIR, "build", "web")
+
+# Fingerprinted files are served from here, forever cacheable
+ASSET_URL_PREFIX = "/assets/"
+MANIFEST_NAME = "asset-manifest.json"
+IMMUTABLE_MAX_AGE = 31536000
+
+# Pages keep their URL and are revalidated; sources are not served
+PAGES = ("index.html",)
+SOURCE_SUFFIXES = (".ts",)
+# Text files whose references to other assets are rewritten, in build order
+# so that a file is fingerprinted after everything it points to
+REWRITE_ORDER = (".css", ".js", ".html")
+COMPRESSIBLE_SUFFIXES = (".css", ".js", ".map", ".html", ".svg", ".json", ".txt", ".ttf", ".otf", ".xml")
+# Precompressed copies are kept only if they save at least this share
+MIN_SAVING = 0.1
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")\s]+)\1\s*\)""")
+HTML_ATTR = re.compile(r"""\b(src|href)=(["'])([^"']+)\2""")
+# Root- or dot-relative string literals, e.g. "./assit/videos/EarthSave.mp4"
+JS_PATH = re.compile(r"""(["'])(\.{0,2}/[^"'\n]+)\1""")
+SOURCE_MAP = re.compile(r"""(sourceMappingURL=)(\S+?)(\s*\*/|\s*$)""", re.MULTILINE)
+
+
+def _fingerprint(rel_path, data):
+    stem, suffix = os.path.splitext(rel_path)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{suffix}"
+
+
+def _resolve(ref, base_url, urls):
+    """Fingerprinted URL for a reference, or None if it isn't a local asset."""
+    if re.match(r"^[a-z][a-z0-9+.-]*:|^//|^#", ref, re.IGNORECASE):
+        return None
+    path = unquote(ref.split("#", 1)[0].split("?", 1)[0])
+    target = posixpath.normpath(posixpath.join(base_url, path))
+    return urls.get(target)
+
+
+def rewrite_references(text, suffix, file_url, urls):
+    """
+    Point a CSS, JS or HTML file's references at the fingerprinted URLs.
+
+    CSS url() and HTML src/href resolve against the file itself; path
+    literals in scripts resolve against the page (the site root), except
+    the source map comment, which resolves against the script.
+    """
+    base = posixpath.dirname(file_url)
+
+    def source_map(match):
+        url = _resolve(match.group(2), base, urls)
+        return match.group(1) + url + match.group(3) if url else match.group(0)
+
+    if suffix == ".css":
+        text = CSS_URL.sub(
+            lambda m: f'url("{url}")' if (url := _resolve(m.group(2), base, urls)) else m.group(0), text
+        )
+        return SOURCE_MAP.sub(source_map, text)
+    if suffix == ".js":
+        text = JS_PATH.sub(
+            lambda m: m.group(1) + url + m.group(1) if (url := _resolve(m.group(2), "/", urls)) else m.group(0), text
+        )
+        return SOURCE_MAP.sub(source_map, text)
+    return HTML_ATTR.sub(
+        lambda m: f'{m.group(1)}={m.group(2)}{url}{m.group(2)}' if (url := _resolve(m.group(3), base, urls)) else m.group(0),
+        text
+    )
+
+
+def _precompress(path, data):
+    """Write .gz (and .br when brotli is installed) next to a compressible file."""
+    if not path.endswith(COMPRESSIBLE_SUFFIXES):
+        return 0
+    variants = [(".gz", lambda: gzip.compress(data, 9, mtime=0))]
+    if encoding.brotli is not None:
+        variants.append((".br", lambda: encoding.brotli.compress(data, quality=11)))
+    written = 0
+    for extension, compress in variants:
+        compressed = compress()
+        if len(compressed) <= len(data) * (1 - MIN_SAVING):
+            with open(path + extension, "wb") as f:
+                f.write(compressed)
+            written += 1
+    return written
+
+
+def build_static(web_dir=WEB_DIR, build_dir=None):
+    """
+    Fingerprint, rewrite and precompress the web assets.
+
+    Every file under web_dir except the pages and sources is copied to
+    build_dir as name.<content hash>.ext, served under ASSET_URL_PREFIX with
+    immutable cache headers. References in CSS, JS and the pages are
+    rewritten to the fingerprinted URLs, and compressible files get .gz and
+    .br siblings. asset-manifest.json maps original URLs to fingerprinted
+    ones. The new build replaces the old one with a rename.
+
+    Returns:
+        dict: The manifest.
+    """
+    build_dir = build_dir or get_build_dir()
+    start = time.perf_counter()
+    scratch = build_dir + ".tmp"
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    sources = []
+    build_root = os.path.abspath(build_dir)
+    for dirpath, dirnames, filenames in os.walk(web_dir):
+        # Never pick up a build placed inside web/
+        dirnames[:] = [d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) not in (build_root, scratch)]
+        for filename in filenames:
+            rel_path = os.path.relpath(os.path.join(dirpath, filename), web_dir).replace(os.sep, "/")
+            if rel_path in PAGES or rel_path.endswith(SOURCE_SUFFIXES):
+                continue
+            sources.append(rel_path)
+
+    def order(rel_path):
+        suffix = os.path.splitext(rel_path)[1]
+        return REWRITE_ORDER.index(suffix) + 1 if suffix in REWRITE_ORDER else 0
+
+    urls = {}
+    stats = {"files": 0, "bytes": 0, "precompressed": 0}
+    for rel_path in sorted(sources, key=order) + list(PAGES):
+        source = os.path.join(web_dir, rel_path)
+        if not os.path.isfile(source):
+            continue
+        suffix = os.path.splitext(rel_path)[1]
+        with open(source, "rb") as f:
+            data = f.read()
+        if suffix in REWRITE_ORDER:
+            text = rewrite_references(data.decode("utf-8"), suffix, "/" + rel_path, urls)
+            data = text.encode("utf-8")
+        out_rel = rel_path if rel_path in PAGES else _fingerprint(rel_path, data)
+        out_path = os.path.join(scratch, out_rel)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(out_path, "wb") as f:
+            f.write(data)
+        if rel_path not in PAGES:
+            urls["/" + rel_path] = ASSET_URL_PREFIX + quote(out_rel)
+        stats["files"] += 1
+        stats["bytes"] += len(data)
+        stats["precompressed"] += _precompress(out_path, data)
+
+    manifest = {
+        "assets": urls,
+        "pages": list(PAGES),
+        **stats,
+        "build_seconds": round(time.perf_counter() - start, 2),
+        "created_at": time.time()
+    }
+    with open(os.path.join(scratch, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    previous = build_dir + ".old"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.isdir(build_dir):
+        os.replace(build_dir, previous)
+    os.replace(scratch, build_dir)
+    shutil.rmtree(previous, ignore_errors=True)
+    return manifest
+
+
+def find_file(filename, accept_encoding=None, build_dir=None):
+    """
+    Locate a built file and its best precompressed variant.
+
+    Returns:
+        tuple: (path, mimetype, content_coding) or None if there is no such
+        file; content_coding is None when the plain file is served.
+    """
+    path = safe_join(build_dir or get_build_dir(), filename)
+    if path is None or not os.path.isfile(path) or path.endswith((".gz", ".br")):
+        return None
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    # Precompressed .br copies don't need brotli installed to be served
+    accepted = parse_accept_header(accept_encoding or "")
+    for coding, extension in (("br", ".br"), ("gzip", ".gz")):
+        if accepted[coding] and os.path.isfile(path + extension):
+            return path + extension, mimetype, coding
+    return path, mimetype, None
+
+
+def has_build(build_dir=None):
+    return os.path.isfile(os.path.join(build_dir or get_build_dir(), MANIFEST_NAME))
+
+
+def get_build_dir():
+    """Static build directory (STATIC_BUILD_DIR, default build/web)."""
+    return os.getenv("STATIC_BUILD_DIR") or DEFAULT_BUILD_DIR
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress the web assets.")
+    parser.add_argument("command", choices=("build",))
+    parser.add_argument("--out", default=None, help="build directory (default STATIC_BUILD_DIR or build/web)")
+    args = parser.parse_args()
+    result = build_static(build_dir=args.out)
+    print(f"{result['files']} files, {result['bytes'] / 1e6:.1f} MB, {result['precompressed']} precompressed copies "
+          f"in {result['build_seconds']} s")
@@ -0,0 +1,92 @@
+import json
+import math
+import time
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+class StreamSummary():
+    """
+    Running statistics for a record stream, reported in its trailer.
+
+    Args:
+        numeric_fields (tuple): Record fields to track min/max/mean for;
+            None values are skipped.
+        count_fields (tuple): Record fields whose distinct values are counted
+            (e.g. risk_level).
+    """
+
+    def __init__(self, numeric_fields=(), count_fields=()):
+        self.started = time.perf_counter()
+        self.first_record_s = None
+        self.count = 0
+        self.errors = 0
+        self.numeric = {field: {"n": 0, "sum": 0.0, "min": None, "max": None} for field in numeric_fields}
+        self.counts = {field: {} for field in count_fields}
+
+    def add(self, record):
+        if self.first_record_s is None:
+            self.first_record_s = time.perf_counter() - self.started
+        self.count += 1
+        for field, acc in self.numeric.items():
+            value = record.get(field)
+            if value is None or not math.isfinite(value):
+                continue
+            acc["n"] += 1
+            acc["sum"] += value
+            acc["min"] = value if acc["min"] is None else min(acc["min"], value)
+            acc["max"] = value if acc["max"] is None else max(acc["max"], value)
+        for field, counts in self.counts.items():
+            key = str(record.get(field))
+            counts[key] = counts.get(key, 0) + 1
+
+    def trailer(self, status):
+        stats = {
+            field: {
+                "min": acc["min"],
+                "max": acc["max"],
+                "mean": acc["sum"] / acc["n"] if acc["n"] else None
+            }
+            for field, acc in self.numeric.items()
+        }
+        return {
+            "type": "summary",
+            "count": self.count,
+            "errors": self.errors,
+            "elapsed_s": time.perf_counter() - self.started,
+            "first_record_s": self.first_record_s,
+            "stats": stats,
+            "counts": self.counts,
+            "status": status
+        }
+
+
+def ndjson_stream(records, summary=None):
+    """
+    Encode an iterable of record dicts as newline-delimited JSON.
+
+    Each record is emitted as {"type": "result", ...} as soon as the
+    iterable produces it, so nothing is buffered beyond one line. Being a
+    plain generator, the WSGI/ASGI server only asks for the next record
+    once the previous line has been handed to the socket, which is the
+    backpressure: a slow client stalls the evaluation rather than growing
+    a queue.
+
+    An exception ends the stream with an {"type": "error"} record. The
+    last line is always a {"type": "summary"} trailer with the counts and
+    the statistics collected by ``summary``.
+
+    Yields:
+        bytes: One encoded line per record.
+    """
+    summary = summary or StreamSummary()
+    status = "success"
+    try:
+        for record in records:
+            summary.add(record)
+            yield (json.dumps({"type": "result", **record}) + "\n").encode("utf-8")
+    except Exception as e:
+        summary.errors += 1
+        status = "error"
+        yield (json.dumps({"type": "error", "error": str(e)}) + "\n").encode("utf-8")
+    yield (json.dumps(summary.trailer(status)) + "\n").encode("utf-8")
@@ -0,0 +1,313 @@
+import argparse
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from geogrid import EARTH_RADIUS_KM, KM_PER_DEGREE, GeoGrid, convert_geotiff
+
+GRAVITY = 9.81
+
+# Impact tsunamis are short-wavelength and dispersive, so their amplitude
+# falls off close to 1/r away from the cavity (Ward & Asphaug 2000), not
+# the 1/sqrt(r) of a long-wave source
+SPREADING_EXPONENT = 1.0
+# Transient cavity depth/diameter; the initial wave is half the cavity
+# depth, and never more than the water depth
+CAVITY_DEPTH_RATIO = 1 / 3
+
+# Propagation stops once the deep-water amplitude drops below this
+MIN_AMPLITUDE_M = 0.1
+# Rays per run and the most samples along one ray
+DEFAULT_AZIMUTHS = 720
+MAX_STEPS = 4000
+# Rays processed together; bounds the temporary arrays to a few MB
+RAY_TILE = 32
+
+# Waves break once they reach this fraction of the water depth
+BREAKING_RATIO = 0.78
+# Run-up on a plane beach of slope 1:BEACH_SLOPE_COT (Synolakis 1987) and
+# inland reach for Manning roughness MANNING_N (Hills & Mader 1997)
+BEACH_SLOPE_COT = 20.0
+MANNING_N = 0.03
+
+# Run-up levels drawn as inundation rings, highest first
+INUNDATION_LEVELS_M = (
+    (10.0, "Major run-up", "#08306b", 0.25),
+    (3.0, "Damaging run-up", "#2171b5", 0.15),
+    (1.0, "Minor run-up", "#6baed6", 0.08),
+)
+# Coastline points returned, highest run-up first
+MAX_COAST_POINTS = 200
+
+
+class BathymetryGrid(GeoGrid):
+    """
+    Memory-mapped elevation grid (meters, negative below sea level).
+
+    Any GEBCO/ETOPO-style relief product works once converted with
+    ``python tsunami.py convert``. NaN marks no-data. See geogrid.GeoGrid for
+    the arguments.
+    """
+
+    def depth_at(self, lat, lon):
+        """Water depth in meters at a point, or None on land or off the grid."""
+        elevation = float(self.sample(lat, lon))
+        return -elevation if elevation < 0 else None
+
+
+def source_wave(depth_m, crater_diameter_km):
+    """
+    Initial amplitude (m) and radius (km) of the impact wave.
+
+    The transient cavity is taken to be the model's crater; the wave starts
+    at its rim with half the cavity depth, limited by the water depth.
+    """
+    radius_km = crater_diameter_km / 2
+    amplitude_m = min(crater_diameter_km * 1000 * CAVITY_DEPTH_RATIO / 2, depth_m)
+    return amplitude_m, radius_km
+
+
+def runup_m(amplitude_m, depth_m):
+    """
+    Solitary-wave run-up on a plane beach (Synolakis 1987).
+
+    Waves steeper than the breaking limit for the beach slope use the
+    breaking-wave law; the amplitude is capped at BREAKING_RATIO of the depth.
+    """
+    ratio = np.minimum(np.asarray(amplitude_m) / depth_m, BREAKING_RATIO)
+    breaking = ratio > 0.818 * BEACH_SLOPE_COT ** (-10 / 9)
+    relative = np.where(
+        breaking,
+        0.918 * ratio ** 0.606,
+        2.831 * math.sqrt(BEACH_SLOPE_COT) * ratio ** 1.25
+    )
+    return relative * depth_m
+
+
+def inundation_km(runup):
+    """Inland reach of a run-up over terrain of roughness MANNING_N."""
+    return 0.06 * np.asarray(runup) ** (4 / 3) / MANNING_N ** 2 / 1000
+
+
+def _destinations(lat, lon, bearings, distances_km):
+    """Great-circle destinations, (bearings, distances) arrays in degrees."""
+    phi1 = math.radians(lat)
+    delta = distances_km[np.newaxis, :] / EARTH_RADIUS_KM
+    theta = bearings[:, np.newaxis]
+    sin_phi2 = math.sin(phi1) * np.cos(delta) + math.cos(phi1) * np.sin(delta) * np.cos(theta)
+    phi2 = np.arcsin(np.clip(sin_phi2, -1, 1))
+    lam2 = math.radians(lon) + np.arctan2(
+        np.sin(theta) * np.sin(delta) * math.cos(phi1),
+        np.cos(delta) - math.sin(phi1) * sin_phi2
+    )
+    return np.degrees(phi2), (np.degrees(lam2) + 540) % 360 - 180
+
+
+def propagate(grid, lat, lon, amplitude_m, radius_km, azimuths=DEFAULT_AZIMUTHS):
+    """
+    March the wave outward along great-circle rays over the bathymetry.
+
+    Amplitude on each ray follows geometric spreading from the source rim,
+    and Green's law (h^-1/4) for the change in depth; arrival time is the
+    integral of ds / sqrt(g h). A ray ends at the first dry cell (a
+    coastline hit, where run-up is estimated from the last wet sample), on
+    leaving the grid, or once the deep-water amplitude is below
+    MIN_AMPLITUDE_M. Islands shadow what lies behind them; diffraction is
+    ignored. Rays are processed RAY_TILE at a time as flat NumPy arrays.
+
+    Args:
+        grid (BathymetryGrid): Elevation grid.
+        amplitude_m (float): Source amplitude (see source_wave).
+        radius_km (float): Source radius.
+        azimuths (int): Number of rays.
+
+    Returns:
+        dict: max_range_km, step_km, and per coastline hit the arrays lat,
+        lon, distance_km, arrival_s, amplitude_m (offshore), depth_m and
+        runup_m, inundation_km.
+    """
+    source_depth = grid.depth_at(lat, lon)
+    cell_km = grid.cell_deg * KM_PER_DEGREE
+    radius_km = max(radius_km, cell_km / 2)
+    max_range = radius_km * (amplitude_m / MIN_AMPLITUDE_M) ** (1 / SPREADING_EXPONENT)
+    max_range = min(max(max_range, radius_km), math.pi * EARTH_RADIUS_KM * 0.999)
+    step = max(cell_km / 2, (max_range - radius_km) / MAX_STEPS)
+    distances = np.arange(radius_km, max_range + step, step)
+    spreading = amplitude_m * (radius_km / distances) ** SPREADING_EXPONENT
+
+    hits = {name: [] for name in ("lat", "lon", "distance_km", "arrival_s", "amplitude_m", "depth_m")}
+    bearings = np.radians(np.arange(azimuths) * 360.0 / azimuths)
+    for start in range(0, azimuths, RAY_TILE):
+        tile = bearings[start:start + RAY_TILE]
+        ray_lat, ray_lon = _destinations(lat, lon, tile, distances)
+        elevation = grid.sample(ray_lat, ray_lon)
+        wet = elevation < 0
+        # Samples reached before the first dry or off-grid one
+        reached = np.logical_and.accumulate(wet, axis=1)
+        n_wet = reached.sum(axis=1)
+
+        depth = np.where(reached, -elevation, 1.0)
+        depth = np.maximum(depth, 1.0)
+        arrival = np.cumsum(step * 1000 / np.sqrt(GRAVITY * depth), axis=1)
+        amplitude = spreading[np.newaxis, :] * (source_depth / depth) ** 0.25
+
+        # A coastline hit is a dry sample right after the wet run
+        stop = np.minimum(n_wet, len(distances) - 1)
+        rows = np.arange(len(tile))
+        coast = (n_wet < len(distances)) & ~np.isnan(elevation[rows, stop])
+        last = np.maximum(stop - 1, 0)
+        coast &= n_wet > 0
+        coast &= spreading[stop] >= MIN_AMPLITUDE_M
+        rows, stop, last = rows[coast], stop[coast], last[coast]
+        hits["lat"].append(ray_lat[rows, stop])
+        hits["lon"].append(ray_lon[rows, stop])
+        hits["distance_km"].append(distances[stop])
+        hits["arrival_s"].append(arrival[rows, last])
+        hits["amplitude_m"].append(np.minimum(amplitude[rows, last], depth[rows, last]))
+        hits["depth_m"].append(depth[rows, last])
+
+    hits = {name: np.concatenate(values) for name, values in hits.items()}
+    hits["runup_m"] = runup_m(hits["amplitude_m"], hits["depth_m"])
+    hits["inundation_km"] = inundation_km(hits["runup_m"])
+    return {"max_range_km": float(max_range), "step_km": float(step), **hits}
+
+
+def _dedupe_cells(grid, hits):
+    """Keep the highest run-up per coastline cell, ordered highest first."""
+    order = np.argsort(-hits["runup_m"], kind="stable")
+    rows, cols, _ = grid.cell_index(hits["lat"][order], hits["lon"][order])
+    _, first = np.unique(rows * grid.cols + cols, return_index=True)
+    keep = order[np.sort(first)]
+    return {name: values[keep] if isinstance(values, np.ndarray) else values for name, values in hits.items()}
+
+
+def inundation_rings(hits, levels=INUNDATION_LEVELS_M):
+    """
+    Map rings bounding the coastline that sees each run-up level.
+
+    Each ring's radius is the farthest coastline hit with at least that
+    run-up. Shapes use the build_impact_geometry schema (radius in meters,
+    Leaflet style options).
+    """
+    rings = []
+    for level, label, color, opacity in levels:
+        reached = hits["distance_km"][hits["runup_m"] >= level]
+        if not len(reached):
+            continue
+        radius_km = float(reached.max())
+        rings.append({
+            "kind": "tsunami",
+            "label": label,
+            "runup_m": level,
+            "radius_m": radius_km * 1000,
+            "popup": f'<b>{label}</b><br>Coasts within {radius_km:.0f} km see run-up above {level:g} m',
+            "tooltip": f'{label}: {level:g} m+ within {radius_km:.0f} km',
+            "style": {"color": color, "fillColor": color, "fillOpacity": opacity, "weight": 2, "dashArray": '8, 4'}
+        })
+    return rings
+
+
+def estimate_tsunami(grid, lat, lon, crater_diameter_km, azimuths=DEFAULT_AZIMUTHS, max_points=MAX_COAST_POINTS):
+    """
+    Tsunami reach, coastline run-up and inundation rings of an ocean impact.
+
+    Args:
+        grid (BathymetryGrid): Elevation grid.
+        crater_diameter_km (float): From calculate_impact_effects.
+
+    Returns:
+        dict: Source depth and wave, coastline run-up (highest first, at
+        most max_points), summary figures and inundation_rings; None if the
+        grid has no water at the impact point.
+    """
+    depth = grid.depth_at(lat, lon)
+    if depth is None or not crater_diameter_km or not math.isfinite(crater_diameter_km):
+        return None
+    amplitude, radius = source_wave(depth, crater_diameter_km)
+    hits = _dedupe_cells(grid, propagate(grid, lat, lon, amplitude, radius, azimuths))
+    points = [
+        {
+            "lat": float(hits["lat"][i]),
+            "lon": float(hits["lon"][i]),
+            "distance_km": float(hits["distance_km"][i]),
+            "arrival_min": float(hits["arrival_s"][i] / 60),
+            "offshore_amplitude_m": float(hits["amplitude_m"][i]),
+            "offshore_depth_m": float(hits["depth_m"][i]),
+            "runup_m": float(hits["runup_m"][i]),
+            "inundation_km": float(hits["inundation_km"][i])
+        }
+        for i in range(min(len(hits["runup_m"]), max_points))
+    ]
+    return {
+        "source": grid.name,
+        "resolution_deg": grid.cell_deg,
+        "source_depth_m": depth,
+        "source_amplitude_m": amplitude,
+        "source_radius_km": radius,
+        "max_range_km": hits["max_range_km"],
+        "coast_cells": int(len(hits["runup_m"])),
+        "max_runup_m": float(hits["runup_m"].max()) if len(hits["runup_m"]) else 0.0,
+        "first_arrival_min": float(hits["arrival_s"].min() / 60) if len(hits["arrival_s"]) else None,
+        "coast_points": points,
+        "inundation_rings": inundation_rings(hits)
+    }
+
+
+_bathymetry = None
+_bathymetry_lock = threading.Lock()
+
+
+def get_bathymetry(path=None):
+    """
+    Return the process-wide grid, or None when BATHYMETRY_PATH is unset.
+    """
+    global _bathymetry
+    path = path or os.getenv("BATHYMETRY_PATH")
+    if not path:
+        return None
+    if _bathymetry is None:
+        with _bathymetry_lock:
+            if _bathymetry is None:
+                _bathymetry = BathymetryGrid.load(path)
+    return _bathymetry
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Prepare bathymetry and run tsunami estimates.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help="convert a GeoTIFF relief grid to a memory-mappable .npy grid")
+    convert_parser.add_argument("tif")
+    convert_parser.add_argument("npy")
+    query_parser = subparsers.add_parser("query", help="tsunami from an impact at a point")
+    query_parser.add_argument("npy")
+    query_parser.add_argument("lat", type=float)
+    query_parser.add_argument("lon", type=float)
+    query_parser.add_argument("--diameter", type=float, default=200.0, help="impactor diameter in meters")
+    query_parser.add_argument("--velocity", type=float, default=20.0, help="km/s")
+    query_parser.add_argument("--azimuths", type=int, default=DEFAULT_AZIMUTHS)
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        convert_geotiff(args.tif, args.npy, fill=np.nan)
+        print(f"Wrote {args.npy}")
+    else:
+        from calculations import full_impact_calculation
+
+        bathymetry = BathymetryGrid.load(args.npy)
+        impact = full_impact_calculation(args.diameter, args.velocity * 1000, is_ocean=True)
+        start = time.perf_counter()
+        result = estimate_tsunami(bathymetry, args.lat, args.lon, impact["crater_diameter_km"], args.azimuths)
+        elapsed = time.perf_counter() - start
+        if result is None:
+            raise SystemExit("No water at the impact point")
+        print(f"{elapsed:.2f} s: depth {result['source_depth_m']:.0f} m, source wave {result['source_amplitude_m']:.0f} m, "
+              f"reach {result['max_range_km']:.0f} km, {result['coast_cells']} coastline cells, "
+              f"max run-up {result['max_runup_m']:.1f} m")
+        for point in result["coast_points"][:10]:
+            print(f"  {point['lat']:8.3f} {point['lon']:9.3f} {point['distance_km']:7.0f} km "
+                  f"{point['arrival_min']:6.0f} min  run-up {point['runup_m']:6.1f} m")
+        for ring in result["inundation_rings"]:
+            print(f"  {ring['label']}: within {ring['radius_m'] / 1000:.0f} km")
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+
+from metrics import record_upstream
+
+# Upstream endpoints; override to point the server at local stubs
+JPL_CAD_URL = os.getenv("JPL_CAD_URL", "https://ssd-api.jpl.nasa.gov/cad.api")
+OPENCAGE_URL = os.getenv("OPENCAGE_URL", "https://api.opencagedata.com/geocode/v1/json")
+
+# Per-upstream timeouts in seconds. JPL responses are large and cached, so
+# they get a longer read budget than the per-request geocode.
+CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3"))
+JPL_TIMEOUT = float(os.getenv("JPL_TIMEOUT", "15"))
+OPENCAGE_TIMEOUT = float(os.getenv("OPENCAGE_TIMEOUT", "3"))
+
+# Keep-alive connections kept open per upstream host
+POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "20"))
+
+CAD_PARAMS = {
+    "dist-min": "0.01",
+    "dist-max": "0.05",
+    "nea": "true",
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Process-wide requests.Session with a pooled keep-alive adapter.
+
+    Returns:
+        requests.Session: Shared session for synchronous upstream calls.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # Imported here so the server can start without paying for it
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get(upstream, url, params, timeout):
+    """
+    GET through the shared session, recording the call in the upstream metrics.
+
+    Args:
+        upstream (str): Metrics label, "jpl" or "opencage".
+
+    Returns:
+        requests.Response: The response, whatever its status code.
+    """
+    start = time.perf_counter()
+    status = "error"
+    try:
+        response = get_session().get(url, params=params, timeout=timeout)
+        status = response.status_code
+        return response
+    finally:
+        record_upstream(upstream, status, time.perf_counter() - start)
+
+
+def jpl_timeout():
+    return (CONNECT_TIMEOUT, JPL_TIMEOUT)
+
+
+def opencage_timeout():
+    return (CONNECT_TIMEOUT, OPENCAGE_TIMEOUT)
+
+
+def opencage_params(lat, lon, api_key):
+    return {"q": f"{lat} {lon}", "key": api_key}
+
+
+class AsyncUpstream():
+    """
+    Pooled asyncio HTTP client for JPL and OpenCage.
+
+    The underlying httpx.AsyncClient is bound to the event loop it is first
+    used on, so create one AsyncUpstream per loop and close it on shutdown.
+    """
+
+    def __init__(self):
+        import httpx
+
+        self._httpx = httpx
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=POOL_SIZE * 2,
+                max_keepalive_connections=POOL_SIZE
+            ),
+            timeout=httpx.Timeout(JPL_TIMEOUT, connect=CONNECT_TIMEOUT)
+        )
+
+    async def _get(self, upstream, url, params, read_timeout):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await self.client.get(
+                url,
+                params=params,
+                timeout=self._httpx.Timeout(read_timeout, connect=CONNECT_TIMEOUT)
+            )
+            status = response.status_code
+            return response.status_code, response.json() if response.status_code == 200 else None
+        finally:
+            record_upstream(upstream, status, time.perf_counter() - start)
+
+    async def fetch_cad(self):
+        """GET the close-approach list; returns (status_code, decoded JSON or None)."""
+        return await self._get("jpl", JPL_CAD_URL, CAD_PARAMS, JPL_TIMEOUT)
+
+    async def geocode(self, lat, lon, api_key):
+        """Reverse-geocode a point; returns (status_code, decoded JSON or None)."""
+        return await self._get("opencage", OPENCAGE_URL, opencage_params(lat, lon, api_key), OPENCAGE_TIMEOUT)
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# The app modules live flat in src/ and import each other by name
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+# Benchmark helpers (stub upstream, startup check) are importable from tests too
+BENCHMARKS_DIR = os.path.join(os.path.dirname(SRC_DIR), "benchmarks")
+if BENCHMARKS_DIR not in sys.path:
+    sys.path.insert(0, BENCHMARKS_DIR)
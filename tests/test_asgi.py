@@ -0,0 +1,83 @@
+"""The natively served ASGI routes, against a local stub of the upstream APIs."""
+import asyncio
+import json
+
+import asgi
+import upstream
+from stub_upstream import StubUpstream
+
+
+async def _request(method, path, payload=None):
+    """Drive asgi.app with one request; returns (status, headers, decoded JSON body)."""
+    body = json.dumps(payload).encode() if payload is not None else b""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "scheme": "http",
+        "method": method, "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "server": ("testserver", 80), "client": ("127.0.0.1", 1),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi.app(scope, receive, send)
+    headers = {k.decode(): v.decode() for k, v in messages[0]["headers"]}
+    return messages[0]["status"], headers, json.loads(b"".join(m.get("body", b"") for m in messages[1:]))
+
+
+def _stubbed(monkeypatch, stub):
+    monkeypatch.delenv("SHARED_CACHE_PATH", raising=False)
+    monkeypatch.setattr(upstream, "JPL_CAD_URL", stub.env()["JPL_CAD_URL"])
+    monkeypatch.setattr(upstream, "OPENCAGE_URL", stub.env()["OPENCAGE_URL"])
+    # A fresh client per test: the pooled one is bound to the loop that made it
+    monkeypatch.setattr(asgi.app.pipeline, "upstream", None)
+    asgi.api_handler.asteroid_cache.invalidate()
+
+
+def test_asteroid_list_is_fetched_once(monkeypatch):
+    stub = StubUpstream(latency_s=0.05, asteroid_count=25).start()
+    try:
+        _stubbed(monkeypatch, stub)
+
+        async def scenario():
+            first = await asyncio.gather(*[_request("GET", "/api/get_asteroid_list") for _ in range(5)])
+            again = await _request("GET", "/api/get_asteroid_list")
+            await asgi.app.pipeline.aclose()
+            return first, again
+
+        first, again = asyncio.run(scenario())
+        for status, headers, asteroids in first + [again]:
+            assert status == 200 and headers["content-type"] == "application/json"
+            assert len(asteroids) == 25 and asteroids[0]["name"] == "2099 T000"
+        assert stub.requests["cad"] == 1
+    finally:
+        stub.stop()
+        asgi.api_handler.asteroid_cache.invalidate()
+
+
+def test_run_simulation_is_served_and_cached(monkeypatch):
+    stub = StubUpstream(latency_s=0.0).start()
+    try:
+        _stubbed(monkeypatch, stub)
+        data = {"diameter": 123.0, "velocity": 17.5, "lat": 48.0, "long": 10.0}
+
+        async def scenario():
+            results = [await _request("POST", "/api/run_simulation", data) for _ in range(2)]
+            results.append(await _request("POST", "/api/run_simulation", ["not", "an", "object"]))
+            await asgi.app.pipeline.aclose()
+            return results
+
+        (status, headers, result), (_, cached_headers, cached), (bad_status, _, error) = asyncio.run(scenario())
+        assert status == 200 and "error" not in result
+        assert result["is_ocean"] is False
+        assert headers["x-cache"] == "MISS" and cached_headers["x-cache"] == "HIT"
+        assert cached == result
+        assert bad_status == 400 and "error" in error
+        # Inland points are settled by the landmask without asking the geocoder
+        assert stub.requests == {"cad": 0, "geocode": 0}
+    finally:
+        stub.stop()
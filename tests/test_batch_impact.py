@@ -0,0 +1,66 @@
+"""batch_impact_calculation must agree with full_impact_calculation field by field."""
+import math
+
+import numpy as np
+import pytest
+
+from calculations import BATCH_COLUMNS, batch_impact_calculation, full_impact_calculation
+
+RADIUS_KEYS = ("total_destruction_km", "severe_damage_km", "moderate_damage_km", "window_breakage_km", "light_damage_km")
+
+
+def _flatten(result):
+    """Scalar result as a flat row keyed like BATCH_COLUMNS, None as NaN."""
+    row = {key: value for key, value in result.items() if key != "damage_radii_km"}
+    for key in RADIUS_KEYS:
+        row[key] = result["damage_radii_km"].get(key)
+    return {key: math.nan if value is None else value for key, value in row.items()}
+
+
+def _random_inputs(seed, n=500):
+    rng = np.random.default_rng(seed)
+    diameter_m = 10 ** rng.uniform(0, 4.5, n)
+    velocity_ms = rng.uniform(1_000, 80_000, n)
+    is_ocean = rng.random(n) < 0.5
+    ocean_depth_m = rng.uniform(50, 8_000, n)
+    return diameter_m, velocity_ms, is_ocean, ocean_depth_m
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_batch_matches_scalar(seed):
+    diameter_m, velocity_ms, is_ocean, ocean_depth_m = _random_inputs(seed)
+    batch = batch_impact_calculation(diameter_m, velocity_ms, is_ocean, ocean_depth_m=ocean_depth_m)
+    assert set(batch) == set(BATCH_COLUMNS)
+
+    for i in range(len(diameter_m)):
+        scalar = _flatten(full_impact_calculation(
+            float(diameter_m[i]), float(velocity_ms[i]), bool(is_ocean[i]), ocean_depth_m=float(ocean_depth_m[i])
+        ))
+        scalar["diameter_m"] = float(diameter_m[i])
+        scalar["velocity_ms"] = float(velocity_ms[i])
+        assert set(scalar) == set(BATCH_COLUMNS)
+        for key in BATCH_COLUMNS:
+            expected, actual = scalar[key], batch[key][i]
+            if key == "is_ocean_impact":
+                assert bool(actual) == expected, key
+            elif math.isnan(expected):
+                assert np.isnan(actual), key
+            else:
+                assert actual == pytest.approx(expected, rel=1e-12), key
+
+
+def test_land_impacts_have_nan_tsunami():
+    diameter_m, velocity_ms, _, _ = _random_inputs(3, n=50)
+    batch = batch_impact_calculation(diameter_m, velocity_ms, False)
+    assert np.isnan(batch["tsunami_height_m"]).all()
+    for d, v in zip(diameter_m[:5], velocity_ms[:5]):
+        assert full_impact_calculation(float(d), float(v), False)["tsunami_height_m"] is None
+
+
+def test_scalar_inputs_broadcast():
+    diameter_m = np.array([50.0, 300.0, 1_000.0])
+    batch = batch_impact_calculation(diameter_m, 20_000, True, ocean_depth_m=1_000)
+    for i, d in enumerate(diameter_m):
+        scalar = full_impact_calculation(float(d), 20_000, True, ocean_depth_m=1_000)
+        assert batch["energy_joules"][i] == pytest.approx(scalar["energy_joules"], rel=1e-12)
+        assert batch["tsunami_height_m"][i] == pytest.approx(scalar["tsunami_height_m"], rel=1e-12)
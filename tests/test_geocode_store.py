@@ -0,0 +1,50 @@
+"""GeocodeStore: geohash cells, the in-memory LRU cap and what gets stored."""
+import os
+import tempfile
+
+from geocode_store import GeocodeStore, cell_size, geohash
+
+
+def _store(**kwargs):
+    return GeocodeStore(os.path.join(tempfile.mkdtemp(), "geocode.sqlite"), **kwargs)
+
+
+def _cell_center(lat, lon, precision):
+    d_lat, d_lon = cell_size(precision)
+    return (-90.0 + (int((lat + 90.0) // d_lat) + 0.5) * d_lat,
+            -180.0 + (int((lon + 180.0) // d_lon) + 0.5) * d_lon)
+
+
+def test_geohash_matches_the_reference_encoding():
+    assert geohash(42.605, -5.603, precision=5) == "ezs42"
+    assert geohash(57.64911, 10.40744, precision=11) == "u4pruydqqvj"
+    d_lat, d_lon = cell_size(7)
+    assert abs(d_lat - 180.0 / 2 ** 17) < 1e-12 and abs(d_lon - 360.0 / 2 ** 18) < 1e-12
+
+
+def test_points_share_an_answer_only_within_one_cell():
+    store = _store(precision=7)
+    d_lat, d_lon = cell_size(7)
+    lat, lon = _cell_center(40.7128, -74.006, 7)
+    assert store.put(lat, lon, {"is_ocean": False, "components": {"city": "New York"}})
+    assert store.get(lat + 0.4 * d_lat, lon - 0.4 * d_lon) == {"is_ocean": False, "source": "geocode_cache"}
+    assert store.get(lat + d_lat, lon) is None
+    assert store.get(lat, lon - d_lon) is None
+
+
+def test_only_conclusive_answers_are_stored():
+    store = _store()
+    assert not store.put(0.0, -150.0, {"status": "error", "message": "API request failed: 500"})
+    assert store.get(0.0, -150.0) is None and len(store) == 0
+
+
+def test_memory_is_capped_and_falls_back_to_sqlite():
+    store = _store(memory_entries=3)
+    points = [(10.0 * i, 20.0 * i) for i in range(5)]
+    for lat, lon in points:
+        store.put(lat, lon, {"is_ocean": bool(lat % 20)})
+    assert store.memory.stats()["entries"] == 3 and len(store) == 5
+    # Evicted from memory, still answered from the file
+    assert store.get(*points[0]) == {"is_ocean": False, "source": "geocode_cache"}
+    assert store.memory.stats()["entries"] == 3
+    assert GeocodeStore(store.path).get(*points[1]) == {"is_ocean": True, "source": "geocode_cache"}
@@ -0,0 +1,90 @@
+"""JobStore claiming and cancellation, and JobManager runs on real job processes."""
+import os
+import tempfile
+import time
+
+import pytest
+
+import jobs
+from jobs import CANCELLED, FINISHED_STATES, RUNNING, SUCCEEDED, TIMED_OUT, JobError, JobManager, JobStore
+
+
+def _store_path(monkeypatch):
+    path = os.path.join(tempfile.mkdtemp(), "jobs.sqlite")
+    monkeypatch.setenv("JOB_STORE_PATH", path)
+    return path
+
+
+def _add(store, lane, kind="simulation"):
+    return store.add(kind, lane, {}, 60.0, max_queued=10)
+
+
+def test_claim_takes_interactive_jobs_first_then_oldest(monkeypatch):
+    store = JobStore(_store_path(monkeypatch))
+    first_batch = _add(store, "batch")
+    interactive = _add(store, "interactive")
+    _add(store, "batch")
+    assert store.claim("test", workers=2, reserved_interactive=0)["id"] == interactive
+    claimed = store.claim("test", workers=2, reserved_interactive=0)
+    assert claimed["id"] == first_batch and claimed["state"] == RUNNING
+    assert store.get(first_batch)["state"] == RUNNING
+    # Every worker is busy
+    assert store.claim("test", workers=2, reserved_interactive=0) is None
+
+
+def test_batch_jobs_leave_the_reserved_slots_to_interactive_ones(monkeypatch):
+    store = JobStore(_store_path(monkeypatch))
+    batch = [_add(store, "batch") for _ in range(3)]
+    assert store.claim("test", workers=3, reserved_interactive=1)["id"] == batch[0]
+    assert store.claim("test", workers=3, reserved_interactive=1)["id"] == batch[1]
+    assert store.claim("test", workers=3, reserved_interactive=1) is None
+    interactive = _add(store, "interactive")
+    assert store.claim("test", workers=3, reserved_interactive=1)["id"] == interactive
+    assert store.get(batch[2])["state"] == "queued"
+
+
+def test_cancel_and_the_queue_limit(monkeypatch):
+    store = JobStore(_store_path(monkeypatch))
+    queued = _add(store, "batch")
+    assert store.cancel(queued) == CANCELLED
+    assert store.get(queued)["state"] == CANCELLED
+    assert store.claim("test", workers=1, reserved_interactive=0) is None
+
+    running = _add(store, "batch")
+    store.claim("test", workers=1, reserved_interactive=0)
+    # A running job is only flagged; its supervisor stops it
+    assert store.cancel(running) == RUNNING and store.cancel_requested(running)
+    assert store.cancel("missing") is None
+
+    store.add("simulation", "batch", {}, 60.0, max_queued=1)
+    with pytest.raises(JobError):
+        store.add("simulation", "batch", {}, 60.0, max_queued=1)
+
+
+def _wait(store, job_id, timeout_s=120.0):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        job = store.get(job_id)
+        if job["state"] in FINISHED_STATES:
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} still {job['state']} after {timeout_s:g} s")
+
+
+def test_manager_runs_jobs_and_enforces_time_limits(monkeypatch):
+    monkeypatch.setenv("STARTUP_WARMUP", "off")
+    monkeypatch.setattr(jobs, "job_processes", 1)
+    manager = JobManager(JobStore(_store_path(monkeypatch)), workers=2, reserved_interactive=1).start()
+    try:
+        with pytest.raises(JobError):
+            manager.submit("simulation", {"radius": 1})
+        simulation = manager.submit("simulation", {"diameter": 150, "velocity": 19, "lat": 48.0, "long": 10.0})
+        slow = manager.submit("monte_carlo", {"diameter": 150, "velocity": 19, "lat": 48.0, "long": 10.0,
+                                              "trials": 10_000_000}, timeout_s=1)
+        job = _wait(manager.store, simulation["id"])
+        assert job["state"] == SUCCEEDED and job["error"] is None
+        assert b'"error"' not in manager.store.result(simulation["id"])[1]
+        job = _wait(manager.store, slow["id"])
+        assert job["state"] == TIMED_OUT and "Time limit" in job["error"]
+    finally:
+        manager.shutdown()
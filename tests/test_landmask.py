@@ -0,0 +1,63 @@
+"""Land/ocean answers from the bundled landmask, and the coastal fallback."""
+import pytest
+
+import app
+from landmask import get_land_mask
+
+INLAND = [(48.0, 10.0), (39.7, -105.0), (-15.8, -47.9), (30.0, 31.2)]
+OPEN_SEA = [(30.0, -40.0), (0.0, -150.0), (-40.0, 80.0), (55.0, 3.0)]
+# Coastal cities and nearby water the 1:110m coastline gets wrong or nearly so
+COASTAL_LAND = [(40.7, -74.0), (40.7128, -74.006), (41.01, 28.98), (1.29, 103.85), (35.68, 139.69), (-33.87, 151.21)]
+COASTAL_SEA = [(40.3, -73.6), (35.5, 139.8), (38.6, -9.6)]
+
+
+def test_inland_and_open_sea_are_certain():
+    mask = get_land_mask()
+    for lat, lon in INLAND:
+        assert mask.check(lat, lon) == {"is_ocean": False, "source": "landmask"}, (lat, lon)
+    for lat, lon in OPEN_SEA:
+        assert mask.check(lat, lon) == {"is_ocean": True, "source": "landmask"}, (lat, lon)
+
+
+def test_coastal_points_are_never_certain_of_the_wrong_answer():
+    mask = get_land_mask()
+    for lat, lon in COASTAL_LAND:
+        result = mask.check(lat, lon)
+        assert not result["is_ocean"] or result.get("coastal"), (lat, lon)
+    for lat, lon in COASTAL_SEA:
+        result = mask.check(lat, lon)
+        assert result["is_ocean"] or result.get("coastal"), (lat, lon)
+
+
+def _api(monkeypatch, remote):
+    monkeypatch.setattr(app, "startup_warmup", "off")
+    monkeypatch.setattr(app, "api_key", "test")
+    api = app.Api()
+    api._land_mask = get_land_mask()
+    api._geocoders_ready = True
+    calls = []
+
+    def check_remote(lat, lon, key):
+        calls.append((lat, lon))
+        return remote(lat, lon)
+
+    monkeypatch.setattr(api, "check_land_or_water_remote", check_remote)
+    return api, calls
+
+
+def test_coastal_points_ask_the_remote_geocoder(monkeypatch):
+    api, calls = _api(monkeypatch, lambda lat, lon: {"is_ocean": False})
+    assert api.check_land_or_water(40.7, -74.0, "test") == {"is_ocean": False}
+    assert api.check_land_or_water(48.0, 10.0, "test")["source"] == "landmask"
+    assert calls == [(40.7, -74.0)]
+
+
+@pytest.mark.parametrize("remote", [
+    lambda lat, lon: {"status": "error", "message": "API request failed: 500"},
+    lambda lat, lon: 1 / 0,
+])
+def test_coastal_points_keep_the_landmask_answer_without_a_remote_one(monkeypatch, remote):
+    api, calls = _api(monkeypatch, remote)
+    result = api.check_land_or_water(40.7, -74.0, "test")
+    assert result["source"] == "landmask" and result["coastal"]
+    assert len(calls) == 1
@@ -0,0 +1,77 @@
+"""SharedStore: size bounds, TTL and the cross-process lease."""
+import os
+import tempfile
+import threading
+import time
+
+from shared_cache import SharedStore
+
+
+def _store(**kwargs):
+    return SharedStore(os.path.join(tempfile.mkdtemp(), "shared.sqlite"), **kwargs)
+
+
+def test_purge_keeps_the_newest_rows_within_the_row_cap():
+    store = _store(max_rows=5)
+    for i in range(12):
+        store.set("maps", str(i), b"x", ttl=60)
+    store.purge()
+    assert [store.get("maps", str(i)) is not None for i in range(12)] == [False] * 7 + [True] * 5
+
+
+def test_purge_enforces_the_byte_cap():
+    store = _store(max_bytes=1000)
+    for i in range(10):
+        store.set("maps", str(i), b"x" * 300, ttl=60)
+    store.purge()
+    kept = [i for i in range(10) if store.get("maps", str(i)) is not None]
+    assert kept == [7, 8, 9]
+
+
+def test_purge_drops_expired_rows_first():
+    store = _store(max_rows=2)
+    store.set("maps", "old", b"x", ttl=60)
+    store.set("maps", "expired", b"x", ttl=-1)
+    store.set("maps", "new", b"x", ttl=60)
+    store.purge()
+    assert store.get("maps", "old") == b"x" and store.get("maps", "new") == b"x"
+
+
+def test_expired_values_are_not_returned():
+    store = _store()
+    store.set("maps", "fresh", b"x", ttl=60)
+    store.set("maps", "expired", b"x", ttl=-1)
+    assert store.get("maps", "fresh") == b"x"
+    assert store.get("maps", "expired") is None
+    assert store.get_or_load("maps", "expired", lambda: b"reloaded", ttl=60) == b"reloaded"
+
+
+def test_get_or_load_runs_the_loader_once_under_the_lease():
+    store = _store()
+    calls = []
+    results = []
+
+    def loader():
+        calls.append(threading.get_ident())
+        time.sleep(0.2)
+        return b"list"
+
+    def worker():
+        results.append(store.get_or_load("asteroids", "cad", loader, ttl=60, poll_s=0.01))
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [b"list"] * 6
+
+
+def test_a_stale_lease_is_taken_over():
+    store = _store()
+    # A holder that died without releasing its lease
+    assert store._acquire_lease("asteroids\x00cad", lease_s=0.2)
+    start = time.monotonic()
+    assert store.get_or_load("asteroids", "cad", lambda: b"list", ttl=60, poll_s=0.01) == b"list"
+    assert 0.15 <= time.monotonic() - start < 2.0
@@ -0,0 +1,34 @@
+"""The server's cold-start budget, as enforced by benchmarks/check_startup.py."""
+import os
+import subprocess
+import sys
+
+import check_startup
+from conftest import SRC_DIR
+
+
+def _slowest_imports(n=10):
+    """Top cumulative times from -X importtime, to explain a failure."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import run"],
+        cwd=SRC_DIR, env={**os.environ, "STARTUP_WARMUP": "off"}, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative), name))
+    return "\n".join(f"{us / 1000:8.1f} ms  {name}" for us, name in sorted(rows, reverse=True)[:n])
+
+
+def test_import_within_budget():
+    budget = float(os.getenv("IMPORT_BUDGET_S", check_startup.DEFAULT_BUDGET_S))
+    times, _ = check_startup.measure(runs=3)
+    best = min(times)
+    assert best <= budget, f"import run took {best * 1000:.0f} ms (budget {budget * 1000:.0f} ms)\n{_slowest_imports()}"
+
+
+def test_no_heavy_modules_at_startup():
+    _, loaded = check_startup.measure(runs=1)
+    assert loaded == [], f"imported at startup: {', '.join(loaded)}"
@@ -0,0 +1,109 @@
+"""TTLCache: singleflight loading, stale-while-revalidate and bounds."""
+import threading
+import time
+
+import pytest
+
+from cache import TTLCache
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(ttl=60)
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return "list"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("cad", loader))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert calls == [1]
+    assert results == [("list", "miss")] * 8
+    assert cache.get_or_load("cad", loader) == ("list", "fresh")
+
+
+def test_load_errors_reach_every_waiter_and_are_not_cached():
+    cache = TTLCache(ttl=60)
+    release = threading.Event()
+
+    def loader():
+        release.wait(5)
+        raise RuntimeError("upstream down")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_load("cad", loader)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert errors == ["upstream down"] * 4
+    assert cache.get("cad") is None
+
+
+def test_stale_entries_are_served_while_one_refresh_runs():
+    cache = TTLCache(ttl=0.05, stale_ttl=60)
+    cache.get_or_load("cad", lambda: "old")
+    time.sleep(0.1)
+    release = threading.Event()
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        release.wait(5)
+        return "new"
+
+    assert cache.get_or_load("cad", refresh) == ("old", "stale")
+    assert cache.get_or_load("cad", refresh) == ("old", "stale")
+    release.set()
+    for _ in range(100):
+        if cache.get_or_load("cad", refresh)[1] == "fresh":
+            break
+        time.sleep(0.01)
+    assert cache.get_or_load("cad", refresh) == ("new", "fresh")
+    assert calls == [1]
+
+
+def test_expired_entries_are_reloaded_synchronously():
+    cache = TTLCache(ttl=0.02, stale_ttl=0.02)
+    cache.get_or_load("cad", lambda: "old")
+    time.sleep(0.06)
+    assert cache.get("cad") is None
+    assert cache.get_or_load("cad", lambda: "new") == ("new", "miss")
+
+
+def test_failed_refresh_keeps_serving_the_stale_value():
+    cache = TTLCache(ttl=0.05, stale_ttl=60)
+    cache.get_or_load("cad", lambda: "old")
+    time.sleep(0.1)
+
+    def broken():
+        raise RuntimeError("upstream down")
+
+    assert cache.get_or_load("cad", broken) == ("old", "stale")
+    time.sleep(0.05)
+    assert cache.get_or_load("cad", broken) == ("old", "stale")
+
+
+@pytest.mark.parametrize("maxsize", [1, 3])
+def test_least_recently_used_keys_are_evicted(maxsize):
+    cache = TTLCache(ttl=60, maxsize=maxsize)
+    for key in range(maxsize + 2):
+        cache.set(key, key)
+    assert [cache.get(key) for key in range(maxsize + 2)] == [None, None] + list(range(2, maxsize + 2))
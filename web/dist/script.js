@@ -15,7 +15,9 @@ const API = {
                     lat: latitude,
                     long: longitude,
                     h_value: h,
-                    v_inf_value: velocity
+                    v_inf_value: velocity,
+                    // Zones come back as data and are drawn with Leaflet below
+                    response_mode: window.L ? 'geometry' : 'html'
                 })
             });
             return await response.text();
@@ -76,6 +78,36 @@ function safeNum(n, decimals = 2) {
         return 'N/A';
     return num.toFixed(decimals);
 }
+// Draw the map_geometry payload from /api/run_simulation on a Leaflet map
+function renderImpactMap(geometry, container) {
+    const L = window.L;
+    const mapDiv = document.createElement('div');
+    mapDiv.classList.add('map-container');
+    mapDiv.style.width = '100%';
+    mapDiv.style.height = '400px';
+    mapDiv.style.borderRadius = '8px';
+    container.appendChild(mapDiv);
+    const center = geometry.center;
+    const map = L.map(mapDiv).setView(center, 8);
+    L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+        maxZoom: 18,
+        attribution: '&copy; OpenStreetMap contributors'
+    }).addTo(map);
+    const addCircle = (shape) => {
+        L.circle(center, { radius: shape.radius_m, fill: true, ...shape.style })
+            .bindPopup(shape.popup)
+            .bindTooltip(shape.tooltip)
+            .addTo(map);
+    };
+    // Same drawing order as the server-rendered folium map
+    (geometry.zones || []).forEach(addCircle);
+    (geometry.earthquake_rings || []).forEach(addCircle);
+    L.marker(center)
+        .bindPopup(geometry.marker.popup)
+        .bindTooltip(geometry.marker.tooltip)
+        .addTo(map);
+    (geometry.damage_zones || []).forEach(addCircle);
+}
 let mainPage;
 let pageFour;
 let isPageFourActive = false;
@@ -240,7 +272,10 @@ function displaySimulationResults(resultData) {
     p8.classList.add("mb-2");
     p8.textContent = "Impact location";
     resultGroup.appendChild(p8);
-    if (resultData.map_html) {
+    if (resultData.map_geometry && window.L) {
+        renderImpactMap(resultData.map_geometry, resultGroup);
+    }
+    else if (resultData.map_html) {
         const iframe = document.createElement('iframe');
         iframe.classList.add('map-container');
         iframe.style.width = '100%';
@@ -599,7 +634,14 @@ function displaySaveScenarioResults(resultData, scenario, container) {
     p5.innerHTML = `<strong>Casualties:</strong> Zero - Mission Success!`;
     impactData.appendChild(p5);
     successCard.appendChild(impactData);
-    if (resultData.map_html) {
+    if (resultData.map_geometry && window.L) {
+        let mapTitle = document.createElement("h3");
+        mapTitle.classList.add("mb-2");
+        mapTitle.textContent = "Saved Location";
+        successCard.appendChild(mapTitle);
+        renderImpactMap(resultData.map_geometry, successCard);
+    }
+    else if (resultData.map_html) {
         let mapTitle = document.createElement("h3");
         mapTitle.classList.add("mb-2");
         mapTitle.textContent = "Saved Location";